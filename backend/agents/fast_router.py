@@ -0,0 +1,142 @@
+"""
+Deterministic pre-router placed in front of the LLM supervisors.
+
+Each supervisor asks its FastRouter first and only spends a structured-output
+LLM call when no rule applies. Rules, in order:
+
+    inner_finish   an inner agent already finished (state["next"] == "FINISH")
+    final_answer   a worker node answered after the latest user message
+    step_limit     steps_taken reached MAX_SUPERVISOR_STEPS
+    intent         the latest user message matches keywords of exactly one target
+                   (a target may require several keyword groups to all match)
+
+Ambiguous messages (no match, or keywords of several targets) go to the LLM.
+Every decision is counted per supervisor and rule; see fast_router_stats().
+
+Configuration (environment variables):
+    FAST_ROUTER_ENABLED        "false" sends every decision to the LLM (default true)
+    FAST_ROUTER_INTENT_RULES   "false" keeps only the termination rules (default true)
+"""
+
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple, Union
+
+from langchain_core.messages import HumanMessage
+
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_ROUTER_INTENT_RULES = os.getenv("FAST_ROUTER_INTENT_RULES", "true").lower() in ("1", "true", "yes")
+
+# The supervisor prompts tell the LLM to finish at this point; the rule makes it certain
+MAX_SUPERVISOR_STEPS = 10
+
+FINISH = "FINISH"
+
+# Top-level domains
+DOCTOR_KEYWORDS = re.compile(
+    r"\b(doctors?|dr\.?|physicians?|consultations?|specialists?|cardiolog\w*|dermatolog\w*|neurolog\w*|"
+    r"pediatric\w*|orthodont\w*|surgeons?|hematolog\w*|general medicine|sports? medicine|doc-[0-9a-f]{8})\b",
+    re.IGNORECASE,
+)
+LAB_KEYWORDS = re.compile(
+    r"\b(labs?|laboratory|tests?|diagnostics?|blood|x-ray|xray|ecg|urine|glucose|thyroid|lipid|"
+    r"liver function|kidney function|vitamin d|prerequisites?|fasting)\b",
+    re.IGNORECASE,
+)
+
+# Sub-agent intents
+# Lab booking references (LAB-...) already match LAB_KEYWORDS; confirm / pay steps are bookings too
+BOOKING_KEYWORDS = re.compile(
+    r"\b(book|booking|reserve|schedule|cancel\w*|reschedul\w*|confirm|payment)\b", re.IGNORECASE
+)
+AVAILABILITY_KEYWORDS = re.compile(
+    r"\b(available|availability|free|slots?|openings?|fees?|costs?|price|prices|how much)\b",
+    re.IGNORECASE,
+)
+LAB_INFO_KEYWORDS = re.compile(
+    r"\b(available|availability|free|slots?|openings?|prerequisites?|fasting|fast|prepare|price|prices|costs?)\b",
+    re.IGNORECASE,
+)
+
+IntentPattern = Union[Pattern, Sequence[Pattern]]
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(scope: str, rule: str) -> None:
+    with _stats_lock:
+        _stats[f"{scope}.{rule}"] += 1
+
+
+def fast_router_stats() -> Dict[str, int]:
+    """How often each rule fired, plus '<scope>.llm' for decisions left to the LLM."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _current_turn(messages: List[Any]) -> Tuple[Optional[str], List[Any]]:
+    """The latest user message and everything that came after it."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index].content, messages[index + 1:]
+    return None, list(messages)
+
+
+def _matches(pattern: IntentPattern, text: str) -> bool:
+    patterns = pattern if isinstance(pattern, (list, tuple)) else (pattern,)
+    return all(p.search(text) for p in patterns)
+
+
+class FastRouter:
+    def __init__(
+        self,
+        scope: str,
+        routing_message_name: str,
+        answer_nodes: Iterable[str],
+        intent_rules: Iterable[Tuple[str, IntentPattern]] = (),
+        max_steps: int = MAX_SUPERVISOR_STEPS,
+    ):
+        self.scope = scope
+        self.routing_message_name = routing_message_name
+        self.answer_nodes = set(answer_nodes)
+        self.intent_rules = list(intent_rules)
+        self.max_steps = max_steps
+
+    def _decision(self, rule: str, next_label: str, reasoning: str, instructions: str = "") -> Dict[str, str]:
+        _count(self.scope, rule)
+        return {"next": next_label, "reasoning": f"[fast-path:{rule}] {reasoning}", "instructions": instructions}
+
+    def route(self, state: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Return a router decision shaped like the LLM's structured output, or None to ask the LLM."""
+        if not FAST_ROUTER_ENABLED:
+            return None
+
+        query, turn = _current_turn(state.get("messages", []))
+
+        if state.get("next") == FINISH:
+            return self._decision("inner_finish", FINISH, "The delegated agent already finished this request.")
+
+        for message in turn:
+            if getattr(message, "name", None) in self.answer_nodes:
+                return self._decision("final_answer", FINISH, f"{message.name} already answered the latest request.")
+
+        if state.get("steps_taken", 0) >= self.max_steps:
+            return self._decision("step_limit", FINISH, f"Reached the limit of {self.max_steps} supervisor steps.")
+
+        # Intent rules only decide this supervisor's first hop of a turn
+        routed_this_turn = any(getattr(message, "name", None) == self.routing_message_name for message in turn)
+        if FAST_ROUTER_INTENT_RULES and query and not routed_this_turn:
+            matches = [target for target, pattern in self.intent_rules if _matches(pattern, query)]
+            if len(matches) == 1:
+                return self._decision(
+                    "intent",
+                    matches[0],
+                    f"The request only matches {matches[0]} keywords.",
+                    "Handle the user's latest request using the conversation and memory context.",
+                )
+
+        _count(self.scope, "llm")
+        return None
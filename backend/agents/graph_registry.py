@@ -0,0 +1,63 @@
+"""
+Registry of compiled LangGraph workflows.
+
+Compiling a StateGraph is comparatively expensive, so every graph is built
+exactly once per process (eagerly via warm_up() at startup, or lazily on the
+first get()) and the compiled app is reused by every request afterwards.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class GraphRegistry:
+    def __init__(self):
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._expected_nodes: Dict[str, tuple] = {}
+        self._graphs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[[], Any], expected_nodes: Iterable[str] = ()) -> None:
+        """Register a builder returning a compiled graph, plus the nodes it must contain."""
+        with self._lock:
+            self._builders[name] = builder
+            self._expected_nodes[name] = tuple(expected_nodes)
+            self._graphs.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """Return the compiled graph, building it once if needed."""
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+
+        with self._lock:
+            graph = self._graphs.get(name)
+            if graph is None:
+                if name not in self._builders:
+                    raise KeyError(f"No graph registered under '{name}'")
+                graph = self._builders[name]()
+                self._graphs[name] = graph
+                logger.info(f"Compiled graph '{name}'")
+        return graph
+
+    def warm_up(self) -> None:
+        """Compile every registered graph up front."""
+        for name in list(self._builders):
+            self.get(name)
+
+    def self_check(self) -> Dict[str, list]:
+        """
+        Verify every registered graph compiles and exposes its expected nodes.
+        Returns the node names per graph; raises RuntimeError on a mismatch.
+        """
+        report: Dict[str, list] = {}
+        for name, expected in self._expected_nodes.items():
+            nodes = list(self.get(name).get_graph().nodes)
+            missing = [node for node in expected if node not in nodes]
+            if missing:
+                raise RuntimeError(f"Graph '{name}' is missing nodes: {missing}")
+            report[name] = nodes
+        return report
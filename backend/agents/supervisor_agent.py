@@ -1,12 +1,36 @@
+import logging
+import os
 from typing import Literal
 from langgraph.types import Command
 from langgraph.graph.message import add_messages
-from langgraph.graph import START, StateGraph, END
+from langgraph.graph import START, StateGraph
 from typing_extensions import TypedDict, Annotated
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage
 from utils.llms import LLMModel
+from utils.metrics import routing_decisions
+from utils.tracing import traced
 from agents.doctor_appointment_agent import DoctorAppointmentAgent
 from agents.lab_agent import LabAndDiagnosticsAgent
+from agents.graph_registry import GraphRegistry
+from db.checkpointer import get_checkpointer
+from utils.message_window import window_messages
+from prompt_library.supervisor_prompt import top_supervisor_prompt, flat_supervisor_prompt
+from prompt_library.context import context_message, with_context
+from agents.fast_router import (
+    AVAILABILITY_KEYWORDS,
+    BOOKING_KEYWORDS,
+    DOCTOR_KEYWORDS,
+    LAB_INFO_KEYWORDS,
+    LAB_KEYWORDS,
+    FastRouter,
+)
+
+# "nested": top supervisor -> doctor/lab supervisor -> worker (default)
+# "flat":   one router picks the worker node directly
+SUPERVISOR_GRAPH_MODE = os.getenv("SUPERVISOR_GRAPH_MODE", "nested").lower()
+GRAPH_MODES = ("nested", "flat")
+
+logger = logging.getLogger(__name__)
 
 
 class TopLevelRouter(TypedDict):
@@ -19,6 +43,18 @@ class TopLevelRouter(TypedDict):
     instructions: str
 
 
+class FlatRouter(TypedDict):
+    next: Literal[
+        "information_node",
+        "booking_node",
+        "lab_booking_node",
+        "lab_availability_and_info_node",
+        "FINISH",
+    ]
+    reasoning: str
+    instructions: str
+
+
 class SupervisorAgentState(TypedDict):
     messages: Annotated[list, add_messages]
     id_number: int
@@ -28,6 +64,8 @@ class SupervisorAgentState(TypedDict):
     current_instructions: str
     steps_taken: int
     memory_context: str
+    # User turns on this conversation thread (1 when checkpointing is off)
+    turn_count: int
 
 
 class SupervisorAgent:
@@ -36,6 +74,52 @@ class SupervisorAgent:
         self.llm_model = llm_model.get_model()
         self.doctor_agent = DoctorAppointmentAgent()
         self.lab_agent = LabAndDiagnosticsAgent()
+        self.fast_router = FastRouter(
+            "top_supervisor",
+            routing_message_name="top_supervisor",
+            answer_nodes=["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node", "closing", "final_response"],
+            intent_rules=[("doctor_appointment_agent", DOCTOR_KEYWORDS), ("lab_diagnostics_agent", LAB_KEYWORDS)],
+        )
+        self.flat_fast_router = FastRouter(
+            "flat_supervisor",
+            routing_message_name="top_supervisor",
+            answer_nodes=["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node"],
+            intent_rules=[
+                ("booking_node", (DOCTOR_KEYWORDS, BOOKING_KEYWORDS)),
+                ("information_node", (DOCTOR_KEYWORDS, AVAILABILITY_KEYWORDS)),
+                ("lab_booking_node", (LAB_KEYWORDS, BOOKING_KEYWORDS)),
+                ("lab_availability_and_info_node", (LAB_KEYWORDS, LAB_INFO_KEYWORDS)),
+            ],
+        )
+
+        # Compiled graphs are built once and shared by every request
+        self.graphs = GraphRegistry()
+        self.graphs.register(
+            "doctor_appointment_agent",
+            self.doctor_agent.workflow,
+            expected_nodes=["supervisor", "information_node", "booking_node"],
+        )
+        self.graphs.register(
+            "lab_diagnostics_agent",
+            self.lab_agent.workflow,
+            expected_nodes=["supervisor", "lab_booking_node", "lab_availability_and_info_node"],
+        )
+        self.graphs.register(
+            "supervisor",
+            self.workflow,
+            expected_nodes=["supervisor", "doctor_appointment_agent", "lab_diagnostics_agent"],
+        )
+        self.graphs.register(
+            "supervisor_flat",
+            self.flat_workflow,
+            expected_nodes=[
+                "supervisor",
+                "information_node",
+                "booking_node",
+                "lab_booking_node",
+                "lab_availability_and_info_node",
+            ],
+        )
 
     def _latest_user_query(self, messages):
         for message in reversed(messages):
@@ -43,7 +127,15 @@ class SupervisorAgent:
                 return message.content
         return ""
 
-    def supervisor_node(
+    def _current_turn_messages(self, messages):
+        """Messages after the latest user message; answers from earlier turns of a thread do not count."""
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                return messages[index + 1:]
+        return list(messages)
+
+    @traced("node.supervisor.supervisor")
+    async def supervisor_node(
         self, state: SupervisorAgentState
     ) -> Command[
         Literal[
@@ -59,7 +151,7 @@ class SupervisorAgent:
         # Look for agent node responses in recent messages
         agent_node_names = ["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node", "closing", "final_response"]
 
-        for msg in reversed(state.get("messages", [])):
+        for msg in reversed(self._current_turn_messages(state.get("messages", []))):
             if hasattr(msg, 'name') and msg.name in agent_node_names:
                 has_final_answer = True
                 final_answer_content = msg.content
@@ -69,47 +161,27 @@ class SupervisorAgent:
         if state.get("next") == "FINISH":
             has_final_answer = True
 
-        supervisor_prompt = (
-            "You are the Top-Level Supervisor Agent for a medical appointment system. "
-            "Route user requests to the appropriate specialized agent:\n\n"
-            "### AGENTS:\n"
-            "1. doctor_appointment_agent: Handles doctor appointments, availability checks of the doctors, booking, cancellation, rescheduling for doctors, and all related queries to doctors\n"
-            "2. lab_diagnostics_agent: Handles lab tests, test booking, test status tracking, test reports, prerequisites validation, and all related queries to lab tests and diagnostics\n"
-            "3. FINISH: When the task is complete and user is satisfied\n\n"
-            "**CRITICAL ROUTING RULES:**\n"
-            f"- Steps completed: {state.get('steps_taken', 0)}. Maximum allowed: 20 steps.\n"
-            "- If steps_taken >= 10, you MUST route to FINISH to prevent infinite loops.\n"
-            f"- IMPORTANT: {'A specialized agent has already provided a final answer. You MUST route to FINISH immediately.' if has_final_answer else 'If the user\'s query has been fully answered, route to FINISH immediately.'}\n"
-            # "- If you've already routed to the same agent 3+ times for the same query, route to FINISH.\n"
-            "- If a specialized agent has already given a clear final answer (check for messages from information_node, booking_node, lab_booking_node, lab_availability_and_info_node, or closing), you MUST choose FINISH.\n"
-            # "- Do NOT route back to the same agent again for the same user query.\n"
-            "- If the task is complete, route to FINISH\n\n"
-            "- If the user asks about doctors, appointments for doctors, doctors availability, doctors consultations → route to doctor_appointment_agent\n"
-            "- If the user asks about lab tests, diagnostics, test results, or test booking → route to lab_diagnostics_agent\n"
-            "- If the query is ambiguous, ask user to provide more information\n"
-            "- If the task is complete, route to FINISH\n\n"
-            f"User ID: {state['id_number']}\n"
-            f"Steps completed: {state.get('steps_taken', 0)}\n"
-        )
-        
         if has_final_answer and final_answer_content:
-            supervisor_prompt += f"\n**CURRENT STATUS:** A specialized agent has already provided this final answer: {final_answer_content[:200]}... You MUST route to FINISH now.\n"
-        
-        if state.get("memory_context"):
-            supervisor_prompt += f"\nMemory context:\n{state['memory_context']}\n"
-
-        supervisor_messages = [
-            SystemMessage(content=supervisor_prompt),
-        ] + state["messages"]
+            status_note = (
+                "- CURRENT STATUS: A specialized agent has already provided this final answer: "
+                f"{final_answer_content[:200]}... You MUST route to FINISH now."
+            )
+        elif has_final_answer:
+            status_note = "- CURRENT STATUS: A specialized agent has already provided a final answer. You MUST route to FINISH immediately."
+        else:
+            status_note = "- CURRENT STATUS: If the user's query has been fully answered, route to FINISH immediately."
 
         latest_query = self._latest_user_query(state["messages"])
 
-        response = self.llm_model.with_structured_output(TopLevelRouter).invoke(supervisor_messages)
-        print("Supervisor response: ", response)
+        response = self.fast_router.route(state)
+        if response is None:
+            supervisor_messages = with_context(
+                top_supervisor_prompt,
+                window_messages(state["messages"], "top_supervisor"),
+                context_message(state, notes=[status_note]),
+            )
+            response = await self.llm_model.with_structured_output(TopLevelRouter).ainvoke(supervisor_messages)
 
-        print("================================================")
-        print("")
-        
         goto_label = response["next"]
         goto = "__end__" if goto_label == "FINISH" else goto_label
 
@@ -149,11 +221,17 @@ class SupervisorAgent:
             "steps_taken": state.get("steps_taken", 0) + 1,
             "messages": messages,
         }
-        print("Update payload: ", update_payload)
-        print("Goto: ", goto)
-        print("================================================")
-        print("")
-        
+        routing_decisions.inc(router="top_supervisor", next=goto_label)
+        logger.info(
+            f"Top supervisor routed to {goto_label}",
+            extra={
+                "node": "top_supervisor",
+                "reasoning": response["reasoning"],
+                "steps_taken": update_payload["steps_taken"],
+                "messages": len(messages),
+            },
+        )
+
         if latest_query:
             update_payload["query"] = latest_query
 
@@ -163,7 +241,8 @@ class SupervisorAgent:
         """Extract the final meaningful answer from agent messages"""
         # Look for the last meaningful response from agent nodes
         agent_node_names = ["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node", "closing"]
-        
+        messages = self._current_turn_messages(messages)
+
         # Find the last message from an agent node
         for msg in reversed(messages):
             if hasattr(msg, 'name') and msg.name in agent_node_names:
@@ -179,7 +258,74 @@ class SupervisorAgent:
         
         return None
 
-    def doctor_appointment_agent_node(self, state: SupervisorAgentState) -> Command[Literal["supervisor", "__end__"]]:
+    @traced("node.supervisor.flat_supervisor")
+    async def flat_supervisor_node(
+        self, state: SupervisorAgentState
+    ) -> Command[
+        Literal[
+            "information_node",
+            "booking_node",
+            "lab_booking_node",
+            "lab_availability_and_info_node",
+            "__end__",
+        ]
+    ]:
+        """Single-hop router used in flat mode: picks the worker node directly."""
+        response = self.flat_fast_router.route(state)
+        if response is None:
+            supervisor_messages = with_context(
+                flat_supervisor_prompt,
+                window_messages(state["messages"], "flat_supervisor"),
+                context_message(state),
+            )
+            response = await self.llm_model.with_structured_output(FlatRouter).ainvoke(supervisor_messages)
+
+        goto_label = response["next"]
+        goto = "__end__" if goto_label == "FINISH" else goto_label
+
+        supervisor_summary = (
+            f"Supervisor routed to {goto_label}. Reasoning: {response['reasoning']} "
+            f"Instructions: {response['instructions']}"
+        )
+        messages = state["messages"] + [AIMessage(content=supervisor_summary, name="top_supervisor")]
+
+        if goto_label == "FINISH":
+            final_answer = self._extract_final_answer(state.get("messages", []))
+            if final_answer:
+                messages.append(AIMessage(content=final_answer, name="final_response"))
+            else:
+                messages.append(
+                    AIMessage(
+                        content="We're not able to assist you now with your query, please contact +94773531234. Have a great day!",
+                        name="closing",
+                    )
+                )
+
+        update_payload = {
+            "next": goto_label,
+            "current_reasoning": response["reasoning"],
+            "current_instructions": response["instructions"],
+            "steps_taken": state.get("steps_taken", 0) + 1,
+            "messages": messages,
+        }
+        routing_decisions.inc(router="flat_supervisor", next=goto_label)
+        logger.info(
+            f"Flat supervisor routed to {goto_label}",
+            extra={
+                "node": "flat_supervisor",
+                "reasoning": response["reasoning"],
+                "steps_taken": update_payload["steps_taken"],
+                "messages": len(messages),
+            },
+        )
+        latest_query = self._latest_user_query(state["messages"])
+        if latest_query:
+            update_payload["query"] = latest_query
+
+        return Command(goto=goto, update=update_payload)
+
+    @traced("node.supervisor.doctor_appointment_agent")
+    async def doctor_appointment_agent_node(self, state: SupervisorAgentState) -> Command[Literal["supervisor", "__end__"]]:
         """Delegate to Doctor Appointment Agent"""
         # Convert state to DoctorAppointmentAgent format
         doctor_state = {
@@ -193,8 +339,8 @@ class SupervisorAgent:
             "memory_context": state.get("memory_context", ""),
         }
 
-        app_graph = self.doctor_agent.workflow()
-        result = app_graph.invoke(doctor_state, config={"recursion_limit": 20})
+        app_graph = self.graphs.get("doctor_appointment_agent")
+        result = await app_graph.ainvoke(doctor_state, config={"recursion_limit": 20})
 
         inner_next = result.get("next")
         
@@ -229,7 +375,8 @@ class SupervisorAgent:
                 goto="supervisor",
             )
 
-    def lab_diagnostics_agent_node(self, state: SupervisorAgentState) -> Command[Literal["supervisor", "__end__"]]:
+    @traced("node.supervisor.lab_diagnostics_agent")
+    async def lab_diagnostics_agent_node(self, state: SupervisorAgentState) -> Command[Literal["supervisor", "__end__"]]:
         """Delegate to Lab and Diagnostics Agent"""
         # Convert state to LabAgentState format
         lab_state = {
@@ -243,8 +390,8 @@ class SupervisorAgent:
             "memory_context": state.get("memory_context", ""),
         }
 
-        app_graph = self.lab_agent.workflow()
-        result = app_graph.invoke(lab_state, config={"recursion_limit": 20})
+        app_graph = self.graphs.get("lab_diagnostics_agent")
+        result = await app_graph.ainvoke(lab_state, config={"recursion_limit": 20})
 
         inner_next = result.get("next")
 
@@ -279,6 +426,13 @@ class SupervisorAgent:
                 goto="supervisor",
             )
 
+    def compiled_graph(self, mode: str = None):
+        """Return the shared compiled top-level graph for the configured (or given) graph mode."""
+        mode = (mode or SUPERVISOR_GRAPH_MODE).lower()
+        if mode not in GRAPH_MODES:
+            raise ValueError(f"Unknown SUPERVISOR_GRAPH_MODE '{mode}'. Use one of {GRAPH_MODES}.")
+        return self.graphs.get("supervisor_flat" if mode == "flat" else "supervisor")
+
     def workflow(self):
 
         graph = StateGraph(SupervisorAgentState)
@@ -286,6 +440,22 @@ class SupervisorAgent:
         graph.add_node("doctor_appointment_agent", self.doctor_appointment_agent_node)
         graph.add_node("lab_diagnostics_agent", self.lab_diagnostics_agent_node)
         graph.add_edge(START, "supervisor")
-        app = graph.compile()
+        # Only the top-level graph is checkpointed; see db/checkpointer.py
+        app = graph.compile(checkpointer=get_checkpointer())
         return app
 
+    def flat_workflow(self):
+        """
+        Flat mode: the worker nodes of both agents hang directly off one router.
+        Workers already return to a node called "supervisor", so they are reused as-is.
+        """
+        graph = StateGraph(SupervisorAgentState)
+        graph.add_node("supervisor", self.flat_supervisor_node)
+        graph.add_node("information_node", self.doctor_agent.information_node)
+        graph.add_node("booking_node", self.doctor_agent.booking_node)
+        graph.add_node("lab_booking_node", self.lab_agent.lab_booking_node)
+        graph.add_node("lab_availability_and_info_node", self.lab_agent.lab_availability_and_info_node)
+        graph.add_edge(START, "supervisor")
+        # Only the top-level graph is checkpointed; see db/checkpointer.py
+        app = graph.compile(checkpointer=get_checkpointer())
+        return app
@@ -0,0 +1,76 @@
+"""
+ReAct worker sub-agents, compiled once per agent instance.
+
+create_react_agent binds the tools to the model and compiles a new graph, so
+calling it inside a node repeated that work on every invocation. Workers are
+built once here and read their per-call context (patient ID, supervisor plan,
+memory) from the state they are invoked with; the prompt callable turns it
+into the trailing context message.
+
+A worker's reply carries the typed results of the tools it ran in
+additional_kwargs["tool_results"]; langchain-openai never sends that key back
+to the provider, so it costs no prompt tokens on later calls.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import create_react_agent
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+from data_models.tool_results import TOOL_RESULTS_KEY
+from prompt_library.context import context_message, with_context
+from utils.tracing import traced_tool
+
+
+class WorkerState(AgentState):
+    id_number: int
+    steps_taken: int
+    current_reasoning: str
+    current_instructions: str
+    memory_context: str
+
+
+def build_worker(model, tools: Sequence[BaseTool], system_prompt: str, name: str):
+    """Compile a ReAct agent whose system prompt is static and whose context comes from state."""
+
+    def prompt(state: WorkerState) -> List[Any]:
+        return with_context(system_prompt, state["messages"], context_message(state, include_plan=True))
+
+    return create_react_agent(
+        model=model,
+        # Each tool run is traced as a tool.<name> span under the calling node
+        tools=[traced_tool(t) for t in tools],
+        prompt=prompt,
+        state_schema=WorkerState,
+        # Runs inside a checkpointed node; its own steps need no checkpoints
+        checkpointer=False,
+        name=name,
+    )
+
+
+def worker_input(state: Dict[str, Any], messages: List[Any]) -> Dict[str, Any]:
+    """The slice of supervisor state a worker runs on, with its windowed messages."""
+    return {
+        "messages": messages,
+        "id_number": state["id_number"],
+        "steps_taken": state.get("steps_taken", 0),
+        "current_reasoning": state.get("current_reasoning", ""),
+        "current_instructions": state.get("current_instructions", ""),
+        "memory_context": state.get("memory_context", ""),
+    }
+
+
+def worker_reply(result: Dict[str, Any], sent: List[Any], name: str) -> AIMessage:
+    """The worker's final answer, tagged with the artifacts of the tools it ran on this call."""
+    results = [
+        message.artifact
+        for message in result["messages"][len(sent):]
+        if isinstance(message, ToolMessage) and message.artifact is not None
+    ]
+    return AIMessage(
+        content=result["messages"][-1].content,
+        name=name,
+        additional_kwargs={TOOL_RESULTS_KEY: results} if results else {},
+    )
@@ -0,0 +1,175 @@
+"""
+Concurrency stress test for db/booking_engine.py.
+
+Fires thousands of parallel booking attempts from many patients at a small
+set of open doctor slots, with a share of them sent twice under the same
+idempotency key (a retried tool call), then checks the database against
+what each caller was told:
+
+- every slot is held by at most one patient, and that patient is the only
+  one who was told "booked";
+- every retry returned the same result as its original request.
+
+--legacy runs the previous SELECT-then-UPDATE flow, which reported success
+without checking the UPDATE, for comparison. Slots taken by the test
+patients are released again at the end.
+
+Usage (from backend/, against a local database with migrations 001-005):
+    python -m benchmarks.booking_stress --attempts 5000 --workers 32 --slots 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+from db import booking_engine
+from db.connection_pool import get_connection, pool_stats
+
+# Stress patients use IDs no real patient has, so cleanup cannot touch real bookings
+PATIENT_ID_BASE = 990_000_000
+
+
+def pick_slots(doctor_name: str, count: int) -> List[datetime]:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT slot_ts FROM doctor_appointments
+            WHERE doctor_name = %s AND is_available = TRUE
+            ORDER BY slot_ts
+            LIMIT %s;
+            """,
+            (doctor_name, count),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def legacy_book(doctor_name: str, slot: datetime, patient_id: int) -> str:
+    """The pre-engine flow: check, then update, then report success regardless of the update."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT consultation_fee FROM doctor_appointments
+            WHERE doctor_name = %s AND slot_ts = %s AND is_available = TRUE;
+            """,
+            (doctor_name, slot),
+        )
+        if cur.fetchone() is None:
+            return "unavailable"
+        cur.execute(
+            """
+            UPDATE doctor_appointments SET is_available = FALSE, patient_to_attend = %s
+            WHERE doctor_name = %s AND slot_ts = %s AND is_available = TRUE;
+            """,
+            (str(patient_id), doctor_name, slot),
+        )
+        conn.commit()
+    return "booked"
+
+
+def run(args) -> int:
+    slots = pick_slots(args.doctor, args.slots)
+    if not slots:
+        print(f"No open slots for {args.doctor}")
+        return 1
+
+    rng = random.Random(args.seed)
+    attempts: List[Tuple[int, datetime]] = [
+        (PATIENT_ID_BASE + rng.randrange(args.patients), rng.choice(slots)) for _ in range(args.attempts)
+    ]
+    # Retries reuse an earlier (patient, slot) pair and so derive the same idempotency key
+    retries = rng.sample(range(len(attempts)), int(len(attempts) * args.retry_ratio))
+    attempts += [attempts[i] for i in retries]
+    rng.shuffle(attempts)
+
+    def attempt(item):
+        patient_id, slot = item
+        started = time.perf_counter()
+        if args.legacy:
+            status = legacy_book(args.doctor, slot, patient_id)
+        else:
+            key = booking_engine.idempotency_key("book", "doctor", args.doctor, slot, patient_id)
+            status = booking_engine.book_doctor(args.doctor, slot, patient_id, key).status
+        return patient_id, slot, status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(attempt, attempts))
+    elapsed = time.perf_counter() - started
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT slot_ts, patient_to_attend FROM doctor_appointments WHERE doctor_name = %s AND slot_ts = ANY(%s);",
+            (args.doctor, slots),
+        )
+        holders = {slot_ts: holder for slot_ts, holder in cur.fetchall()}
+
+    told_booked = defaultdict(set)
+    outcomes = defaultdict(set)
+    for patient_id, slot, status, _ in results:
+        outcomes[(patient_id, slot)].add(status)
+        if status == "booked":
+            told_booked[slot].add(patient_id)
+
+    double_booked = {slot: ids for slot, ids in told_booked.items() if len(ids) > 1}
+    wrong_holder = [
+        slot for slot, ids in told_booked.items() if len(ids) == 1 and holders.get(slot) != str(next(iter(ids)))
+    ]
+    inconsistent_retries = sum(1 for statuses in outcomes.values() if "booked" in statuses and len(statuses) > 1)
+
+    latencies = sorted(r[3] for r in results)
+    print(f"\n{'legacy' if args.legacy else 'booking engine'}: {len(results)} attempts on {len(slots)} slots "
+          f"of {args.doctor}, {args.workers} workers, {len(retries)} retries")
+    print(f"throughput {len(results) / elapsed:8.0f} attempts/s   "
+          f"median {statistics.median(latencies):7.2f} ms   p95 {latencies[int(len(latencies) * 0.95)]:7.2f} ms")
+    print(f"outcomes: {dict(Counter(r[2] for r in results))}")
+    patients = {str(PATIENT_ID_BASE + i) for i in range(args.patients)}
+    print(f"slots taken: {sum(1 for slot in slots if holders.get(slot) in patients)}")
+    print(f"slots promised to more than one patient: {len(double_booked)}")
+    print(f"slots promised to someone other than the holder: {len(wrong_holder)}")
+    print(f"retries that disagreed with their original: {inconsistent_retries}")
+    print(f"pool: {pool_stats()}")
+
+    cleanup(args.doctor, sorted(patients))
+    return 1 if double_booked or wrong_holder or inconsistent_retries else 0
+
+
+def cleanup(doctor_name: str, patients: List[str]) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE doctor_appointments SET is_available = TRUE, patient_to_attend = NULL
+            WHERE doctor_name = %s AND patient_to_attend::TEXT = ANY(%s);
+            """,
+            (doctor_name, patients),
+        )
+        cur.execute("DELETE FROM booking_idempotency WHERE patient_id = ANY(%s);", ([int(p) for p in patients],))
+        cur.execute("DELETE FROM bookings WHERE patient_id = ANY(%s);", ([int(p) for p in patients],))
+        conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctor", default="lisa brown")
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--retry-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--legacy", action="store_true", help="run the old check-then-update flow")
+    args = parser.parse_args()
+
+    # One pooled connection per worker; set before the pool is first created
+    os.environ.setdefault("POSTGRE_POOL_MAX_SIZE", str(args.workers))
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Deterministic stand-in for the OpenAI chat model, for offline benchmarks.
+
+ScriptedChatModel answers every call the graph makes without a network:
+
+- structured routing calls (Router, LabRouter, TopLevelRouter, FlatRouter)
+  pick the next node from the keywords of the latest user message and
+  return FINISH once a worker has answered it;
+- MemoryRecord calls return a short summary;
+- ReAct workers call the tool registered for the latest user message with
+  script(), then answer with the tool output once it comes back.
+
+Every call is counted by kind and can sleep for a fixed latency to stand in
+for provider time. Replies carry usage_metadata, so utils.llm_usage records
+them like real calls. With prefix_cache=True the usage also reports the
+prompt tokens an OpenAI-style prefix cache would have served: the longest
+run of leading messages (under the same tools) sent before, counted from
+1024 tokens in 128-token steps.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from agents.fast_router import BOOKING_KEYWORDS, LAB_KEYWORDS
+
+WORKER_NODES = {"information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node"}
+ROUTER_SCHEMAS = {"Router", "LabRouter", "TopLevelRouter", "FlatRouter"}
+
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+def _approx_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(str(message.content)) for message in messages) // 4
+
+
+class ScriptedChatModel(BaseChatModel):
+    latency_ms: float = 0.0
+    prefix_cache: bool = False
+
+    _script: Dict[str, ToolCall] = PrivateAttr(default_factory=dict)
+    _calls: Counter = PrivateAttr(default_factory=Counter)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _prefixes: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def script(self, user_message: str, tool_name: str, args: Dict[str, Any]) -> None:
+        """The tool a worker calls when the turn's user message is exactly user_message."""
+        self._script[user_message] = (tool_name, args)
+
+    def calls(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._calls)
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+    def reset_prefix_cache(self) -> None:
+        with self._lock:
+            self._prefixes.clear()
+
+    def _cached_tokens(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> int:
+        key = hash(tuple(t["function"]["name"] for t in tools or []))
+        keys = []
+        for message in messages:
+            # Chained, so a key is only seen again when every message before it matched too
+            key = hash((key, message.type, getattr(message, "name", None), str(message.content),
+                        str(getattr(message, "tool_calls", ""))))
+            keys.append(key)
+        with self._lock:
+            matched = max((index + 1 for index, key in enumerate(keys) if key in self._prefixes), default=0)
+            self._prefixes.update(keys)
+        tokens = _approx_tokens(messages[:matched])
+        return 0 if tokens < 1024 else 1024 + (tokens - 1024) // 128 * 128
+
+    def bind_tools(self, tools, tool_choice: Optional[Any] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> Tuple[str, AIMessage]:
+        names = [t["function"]["name"] for t in tools or []]
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        query = messages[last_human].content if last_human >= 0 else ""
+
+        if names and names[0] in ROUTER_SCHEMAS:
+            answered = any(getattr(m, "name", None) in WORKER_NODES for m in messages[last_human + 1:])
+            decision = {"next": _route(names[0], query, answered), "reasoning": "scripted", "instructions": "scripted"}
+            return "router", _tool_call(names[0], decision)
+
+        if names and names[0] == "MemoryRecord":
+            return "memory", _tool_call("MemoryRecord", {"summary": f"Patient asked: {query[:120]}", "slots": {}})
+
+        if names:
+            conversation = [m for m in messages if m.type != "system"]
+            if conversation and isinstance(conversation[-1], ToolMessage):
+                return "worker", AIMessage(content=str(conversation[-1].content))
+            scripted = self._script.get(query)
+            if scripted and scripted[0] in names:
+                return "worker", _tool_call(*scripted)
+            return "worker", AIMessage(content="Could you tell me a little more about what you need?")
+
+        return "plain", AIMessage(content="OK")
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        kind, message = self._reply(messages, tools)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._result(kind, messages, message, tools)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        kind, message = self._reply(messages, tools)
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(kind, messages, message, tools)
+
+    def _result(
+        self, kind: str, messages: List[BaseMessage], message: AIMessage, tools: Optional[List[dict]] = None
+    ) -> ChatResult:
+        with self._lock:
+            self._calls[kind] += 1
+        input_tokens = _approx_tokens(messages)
+        output_tokens = max(1, len(str(message.content)) // 4)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        if self.prefix_cache:
+            message.usage_metadata["input_token_details"] = {"cache_read": self._cached_tokens(messages, tools)}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+
+def _route(schema: str, query: str, answered: bool) -> str:
+    if answered:
+        return "FINISH"
+    # LAB-... booking references match LAB_KEYWORDS too
+    lab = bool(LAB_KEYWORDS.search(query))
+    booking = bool(BOOKING_KEYWORDS.search(query))
+    if schema == "TopLevelRouter":
+        return "lab_diagnostics_agent" if lab else "doctor_appointment_agent"
+    if schema == "LabRouter":
+        return "lab_booking_node" if booking else "lab_availability_and_info_node"
+    if schema == "Router":
+        return "booking_node" if booking else "information_node"
+    if lab:
+        return "lab_booking_node" if booking else "lab_availability_and_info_node"
+    return "booking_node" if booking else "information_node"
@@ -0,0 +1,113 @@
+"""
+A/B latency benchmark of the nested and flat supervisor graph modes.
+
+Runs the same user queries through both compiled graphs, alternating modes on
+every iteration so provider latency drift affects both equally, and reports
+per-mode turn latency and the number of LLM calls per turn.
+
+Runs against the configured LLM and database. The default queries only read
+availability; pass --query to benchmark booking flows on a disposable database.
+
+Usage (from backend/):
+    python -m benchmarks.graph_mode_benchmark --iterations 5
+    python -m benchmarks.graph_mode_benchmark --query "Is Dr. lisa brown free on 20-10-2026?" --no-fast-router
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+import agents.fast_router as fast_router
+import db.checkpointer as checkpointer
+from agents.supervisor_agent import GRAPH_MODES, SupervisorAgent
+
+DEFAULT_QUERIES = [
+    "Is Dr. lisa brown available on 20-10-2026?",
+    "Which cardiology doctors are free on 21-10-2026?",
+    "What ecg lab test slots are available on 20-10-2026?",
+    "Do I need to fast before a lipid panel test?",
+]
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        self.calls += 1
+
+
+def graph_input(query: str, id_number: int) -> Dict[str, Any]:
+    return {
+        "messages": [HumanMessage(content=query)],
+        "id_number": id_number,
+        "next": "",
+        "query": "",
+        "current_reasoning": "",
+        "current_instructions": "",
+        "missing_information": [],
+        "steps_taken": 0,
+        "memory_context": "",
+    }
+
+
+async def run_turn(graph, query: str, id_number: int):
+    counter = LLMCallCounter()
+    started = time.perf_counter()
+    await graph.ainvoke(graph_input(query, id_number), config={"recursion_limit": 20, "callbacks": [counter]})
+    return (time.perf_counter() - started) * 1000, counter.calls
+
+
+def summarize(mode: str, latencies: List[float], calls: List[int]) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (
+        f"{mode:<8} turns {len(ordered):4d}   median {statistics.median(ordered):9.1f} ms   "
+        f"p95 {p95:9.1f} ms   LLM calls/turn {statistics.mean(calls):5.2f}"
+    )
+
+
+async def main_async(args) -> None:
+    agent = SupervisorAgent()
+    graphs = {mode: agent.compiled_graph(mode) for mode in args.modes}
+    latencies = {mode: [] for mode in args.modes}
+    calls = {mode: [] for mode in args.modes}
+
+    for iteration in range(args.iterations):
+        # Alternate which mode goes first so neither always runs on a warm provider
+        order = args.modes if iteration % 2 == 0 else list(reversed(args.modes))
+        for query in args.query or DEFAULT_QUERIES:
+            for mode in order:
+                latency, llm_calls = await run_turn(graphs[mode], query, args.id_number)
+                latencies[mode].append(latency)
+                calls[mode].append(llm_calls)
+        print(f"iteration {iteration + 1}/{args.iterations} done")
+
+    print()
+    for mode in args.modes:
+        print(summarize(mode, latencies[mode], calls[mode]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--query", action="append", help="user message to benchmark (repeatable)")
+    parser.add_argument("--id-number", type=int, default=1234567)
+    parser.add_argument("--modes", nargs="+", choices=GRAPH_MODES, default=list(GRAPH_MODES))
+    parser.add_argument("--no-fast-router", action="store_true", help="send every routing decision to the LLM")
+    args = parser.parse_args()
+
+    # Every turn passes its full input, so the graphs run without a checkpointer
+    checkpointer.CHECKPOINT_BACKEND = "none"
+    if args.no_fast_router:
+        fast_router.FAST_ROUTER_ENABLED = False
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Offline load test of the full FastAPI app.
+
+Drives POST /execute in-process (httpx ASGITransport, with the app's own
+lifespan) at several concurrency levels, with every external dependency
+replaced by something local:
+
+- the OpenAI chat model by benchmarks.fake_llm.ScriptedChatModel, which routes
+  on keywords and calls the tool scripted for each query, with a fixed latency;
+- Supabase by a throwaway schema in a local Postgres, seeded with
+  doctor_appointments / lab_tests and migrated with db/migrations/*.sql;
+- S3 by benchmarks.local_s3.LocalS3Client, with a fixed per-request latency.
+
+The turn mix covers doctor and specialization availability, next-available
+search, lab availability and doctor / lab booking holds. For each level it
+reports p50/p95/p99 turn latency, throughput, errors, LLM calls per turn (by
+kind, including the background memory summaries), pooled DB connection
+checkouts per turn and S3 requests per turn.
+
+Usage (from backend/, with POSTGRE_* pointing at a local database):
+    python -m benchmarks.load_test --concurrency 1,8,32 --turns 200
+    python -m benchmarks.load_test --llm-latency-ms 400 --output load_test.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple, get_args
+
+from psycopg2.extras import execute_values
+
+from benchmarks.fake_llm import ScriptedChatModel
+from benchmarks.local_s3 import LocalS3Client
+
+# Load-test patients use IDs no seeded or real patient has
+PATIENT_ID_BASE = 2_000_000
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "migrations")
+SLOT_TIMES = [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in range(8 * 60, 17 * 60, 30)]
+
+Scenario = Tuple[str, str, str, Dict[str, Any], int]
+
+
+def seed_schema(schema: str, days: int, doctors: List[str], specializations: List[str], tests: List[str]) -> date:
+    """Create and migrate a fresh schema with open slots from tomorrow on; returns the first day."""
+    from db.db_connection import connect_to_db
+
+    first_day = date.today() + timedelta(days=1)
+    conn = connect_to_db()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE; CREATE SCHEMA "{schema}";')
+            cur.execute(f'SET search_path TO "{schema}", public;')
+            cur.execute(
+                """
+                CREATE TABLE doctor_appointments (
+                    date_slot TEXT, specialization TEXT, doctor_name TEXT,
+                    is_available BOOLEAN, patient_to_attend TEXT, consultation_fee NUMERIC
+                );
+                CREATE TABLE lab_tests (
+                    test_name TEXT, date_slot TEXT, is_available BOOLEAN,
+                    patient_to_attend TEXT, price NUMERIC, prerequisites TEXT
+                );
+                """
+            )
+            slots = [
+                f"{(first_day + timedelta(days=d)).strftime('%d-%m-%Y')} {hhmm}"
+                for d in range(days)
+                for hhmm in SLOT_TIMES
+            ]
+            execute_values(
+                cur,
+                "INSERT INTO doctor_appointments VALUES %s",
+                [
+                    (slot, specializations[i % len(specializations)], doctor, True, None, 50 + 10 * (i % 6))
+                    for i, doctor in enumerate(doctors)
+                    for slot in slots
+                ],
+                page_size=1000,
+            )
+            execute_values(
+                cur,
+                "INSERT INTO lab_tests VALUES %s",
+                [
+                    (test, slot, True, None, 20 + 5 * i, "Fast for 12 hours" if test == "lipid panel" else None)
+                    for i, test in enumerate(tests)
+                    for slot in slots
+                ],
+                page_size=1000,
+            )
+            for name in sorted(os.listdir(MIGRATIONS_DIR)):
+                if name.endswith(".sql"):
+                    with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                        cur.execute(f.read())
+    finally:
+        conn.close()
+    return first_day
+
+
+def drop_schema(schema: str) -> None:
+    from db.db_connection import connect_to_db
+
+    conn = connect_to_db()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE;')
+    finally:
+        conn.close()
+
+
+def build_scenarios(
+    count: int, offset: int, first_day: date, days: int, patients: int,
+    doctors: List[str], specializations: List[str], tests: List[str],
+) -> List[Scenario]:
+    """(kind, query, tool, args, patient) for turns offset..offset+count; bookings never target the same slot twice."""
+    scenarios = []
+    for n in range(offset, offset + count):
+        patient_id = PATIENT_ID_BASE + n % patients
+        day = (first_day + timedelta(days=n % days)).strftime("%d-%m-%Y")
+        doctor = doctors[n % len(doctors)]
+        specialization = specializations[n % len(specializations)]
+        test = tests[n % len(tests)]
+        # Each booking turn takes its own (subject, slot) so holds never contend
+        slot = f"{(first_day + timedelta(days=(n // 6) % days)).strftime('%d-%m-%Y')} {SLOT_TIMES[(n // (6 * days)) % len(SLOT_TIMES)]}"
+        kind = n % 6
+        if kind == 0:
+            scenarios.append(("doctor_availability", f"Is Dr. {doctor} available on {day}?",
+                              "check_availability_by_doctor", {"desired_date": {"date": day}, "doctor_name": doctor}, patient_id))
+        elif kind == 1:
+            scenarios.append(("specialization_availability",
+                              f"Which {specialization.replace('_', ' ')} doctors are free on {day}?",
+                              "check_availability_by_specialization",
+                              {"desired_date": {"date": day}, "specialization": specialization}, patient_id))
+        elif kind == 2:
+            scenarios.append(("next_available",
+                              f"When is the first available {specialization.replace('_', ' ')} doctor?",
+                              "find_next_available", {"specialization": specialization}, patient_id))
+        elif kind == 3:
+            scenarios.append(("lab_availability", f"What {test} test slots are available on {day}?",
+                              "check_lab_availability", {"desired_date": {"date": day}, "test_name": test}, patient_id))
+        elif kind == 4:
+            doctor = doctors[(n // (6 * days * len(SLOT_TIMES))) % len(doctors)]
+            scenarios.append(("doctor_booking", f"Book Dr. {doctor} on {slot}, my ID is {patient_id}",
+                              "create_booking_request",
+                              {"desired_date": {"date": slot}, "id_number": {"id": patient_id}, "doctor_name": doctor}, patient_id))
+        else:
+            test = tests[(n // (6 * days * len(SLOT_TIMES))) % len(tests)]
+            scenarios.append(("lab_booking", f"Book a {test} test on {slot}, my ID is {patient_id}",
+                              "create_lab_booking_request",
+                              {"desired_date": {"date": slot}, "id_number": {"id": patient_id}, "test_name": test}, patient_id))
+    return scenarios
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_level(client, main, fake: ScriptedChatModel, s3: LocalS3Client,
+                    scenarios: List[Scenario], concurrency: int) -> Dict[str, Any]:
+    from db.availability_cache import clear_availability_cache
+    from db.connection_pool import pool_stats
+
+    # Every level starts cold
+    clear_availability_cache()
+    fake.reset_calls()
+    s3.requests.clear()
+    acquired_before = pool_stats().get("acquired", 0)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for scenario in scenarios:
+        queue.put_nowait(scenario)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def worker():
+        while not queue.empty():
+            kind, query, _, _, patient_id = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.post("/execute", json={"id_number": patient_id, "messages": query})
+                outcome = None if response.status_code == 200 else f"http {response.status_code}"
+            except Exception as e:
+                outcome = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if outcome:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # Memory summaries run after the response; count them against the level that caused them
+    await main.memory_updates.flush()
+
+    turns = len(scenarios)
+    ordered = sorted(latencies)
+    calls = fake.calls()
+    return {
+        "concurrency": concurrency,
+        "turns": turns,
+        "errors": errors,
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(percentile(ordered, 0.95), 1),
+        "p99_ms": round(percentile(ordered, 0.99), 1),
+        "throughput_turns_per_s": round(turns / elapsed, 2),
+        "llm_calls_per_turn": round(sum(calls.values()) / turns, 2),
+        "llm_calls_by_kind": calls,
+        "db_connections_per_turn": round((pool_stats().get("acquired", 0) - acquired_before) / turns, 2),
+        "s3_requests_per_turn": round(sum(s3.requests.values()) / turns, 2),
+    }
+
+
+def format_row(result: Dict[str, Any]) -> str:
+    errors = sum(result["errors"].values())
+    return (
+        f"{result['concurrency']:>5} {result['turns']:>6} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+        f"{result['p99_ms']:>9.1f} {result['throughput_turns_per_s']:>9.2f} {errors:>6} "
+        f"{result['llm_calls_per_turn']:>9.2f} {result['db_connections_per_turn']:>8.2f} "
+        f"{result['s3_requests_per_turn']:>7.2f}"
+    )
+
+
+async def main_async(args) -> List[Dict[str, Any]]:
+    import httpx
+
+    # Bind the app to the fake model before any agent builds its client
+    import utils.llms
+    from utils.llm_usage import usage_tracker
+    from utils.tracing import llm_span_tracker
+    # Same callbacks as the real models, so token usage and traces are recorded
+    fake = ScriptedChatModel(latency_ms=args.llm_latency_ms, callbacks=[usage_tracker, llm_span_tracker])
+    utils.llms.get_chat_model = lambda *a, **kw: fake
+
+    import main
+    import utils.s3_data_access
+    from toolkit.toolkits import DoctorName, Specialization, check_lab_availability
+
+    s3 = LocalS3Client(latency_ms=args.s3_latency_ms)
+    utils.s3_data_access.s3_client = s3
+
+    doctors = list(dict.fromkeys(get_args(DoctorName)))
+    specializations = list(get_args(Specialization))
+    # Only tests every lab tool accepts under the same spelling
+    tests = list(get_args(check_lab_availability.args_schema.model_fields["test_name"].annotation))
+
+    first_day = seed_schema(args.schema, args.days, doctors, specializations, tests)
+    results = []
+    offset = 0
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+                print(f"{'conc':>5} {'turns':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'turns/s':>9} "
+                      f"{'errors':>6} {'LLM/turn':>9} {'DB/turn':>8} {'S3/turn':>7}")
+                for concurrency in args.concurrency:
+                    scenarios = build_scenarios(
+                        args.turns, offset, first_day, args.days, args.patients, doctors, specializations, tests
+                    )
+                    offset += args.turns
+                    for _, query, tool_name, tool_args, _ in scenarios:
+                        fake.script(query, tool_name, tool_args)
+                    with quiet:
+                        result = await run_level(client, main, fake, s3, scenarios, concurrency)
+                    results.append(result)
+                    print(format_row(result))
+                    if result["errors"]:
+                        print(f"      errors: {result['errors']}")
+    finally:
+        if not args.keep_schema:
+            drop_schema(args.schema)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=120, help="turns per concurrency level")
+    parser.add_argument("--patients", type=int, default=50, help="distinct patients the turns rotate through")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--s3-latency-ms", type=float, default=20.0)
+    parser.add_argument("--schema", default="load_test", help="throwaway schema seeded for the run")
+    parser.add_argument("--days", type=int, default=7, help="days of open slots to seed")
+    parser.add_argument("--keep-schema", action="store_true", help="leave the seeded schema in place")
+    parser.add_argument("--verbose", action="store_true", help="keep the agents' console output")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    # Must be set before utils.llms and the connection pool are first used
+    os.environ.setdefault("OPENAI_API_KEY", "offline-load-test")
+    os.environ["PGOPTIONS"] = f"-c search_path={args.schema},public"
+    os.environ.setdefault("POSTGRE_POOL_MAX_SIZE", str(max(10, max(args.concurrency))))
+    os.environ.setdefault("MEMORY_BACKEND", "s3")
+    # The app's request and routing logs would drown the report
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"started": datetime.now().isoformat(timespec="seconds"), "args": vars(args),
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
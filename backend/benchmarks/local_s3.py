@@ -0,0 +1,65 @@
+"""
+In-process stand-in for the S3 client used by utils/s3_data_access.py.
+
+Implements the get_object / put_object subset the memory store uses,
+including ETags and the IfMatch / IfNoneMatch conditional writes, and
+raises the same botocore ClientError codes as S3. An optional per-request
+latency stands in for the network round trip; every request is counted.
+"""
+
+import hashlib
+import io
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+def _error(code: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class LocalS3Client:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self._objects: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+
+    def _wait(self, operation: str) -> None:
+        with self._lock:
+            self.requests[operation] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        self._wait("GetObject")
+        with self._lock:
+            stored = self._objects.get((Bucket, Key))
+        if stored is None:
+            raise _error("NoSuchKey", "GetObject")
+        body, etag = stored
+        return {"Body": io.BytesIO(body), "ETag": etag, "ContentLength": len(body)}
+
+    def put_object(
+        self,
+        Bucket: str,
+        Key: str,
+        Body: bytes,
+        IfMatch: Optional[str] = None,
+        IfNoneMatch: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        self._wait("PutObject")
+        body = Body.encode() if isinstance(Body, str) else bytes(Body)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            current = self._objects.get((Bucket, Key))
+            if IfNoneMatch == "*" and current is not None:
+                raise _error("PreconditionFailed", "PutObject")
+            if IfMatch is not None and (current is None or current[1] != IfMatch):
+                raise _error("PreconditionFailed", "PutObject")
+            self._objects[(Bucket, Key)] = (body, etag)
+        return {"ETag": etag}
@@ -0,0 +1,140 @@
+"""
+Report prompt tokens per graph node with message windowing off and on.
+
+Plays a scripted multi-turn conversation through the supervisor graph, carrying
+the full message history from turn to turn, once with MESSAGE_WINDOW_ENABLED
+off and once on. Every chat-model call is attributed to the graph node that
+made it and its prompt tokens (system prompt included) are summed per node,
+next to the cached prompt tokens utils.llm_usage recorded for the node: a
+window that keeps its leading messages stable lets the provider serve them
+from its prompt cache.
+
+The fast-path router is disabled so every supervisor makes its LLM call;
+pass --fast-router to keep it. The default script books a doctor and a lab
+slot, so run it against a disposable database. With --fake-llm the graph runs
+offline on benchmarks.fake_llm.ScriptedChatModel, which emulates the
+provider's prefix cache; its workers answer without calling tools.
+
+Usage (from backend/):
+    python -m benchmarks.message_window_report
+    python -m benchmarks.message_window_report --fake-llm --turns 20
+    python -m benchmarks.message_window_report --turn "Is Dr. lisa brown free on 20-10-2026?" --turn "Book 09:00"
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Any, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+import agents.fast_router as fast_router
+import db.checkpointer as checkpointer
+import utils.llms
+import utils.message_window as message_window
+from agents.supervisor_agent import GRAPH_MODES, SupervisorAgent
+from benchmarks.fake_llm import ScriptedChatModel
+from utils.llm_usage import llm_usage_stats, reset_llm_usage_stats, usage_tracker
+from utils.streaming import agent_node_path
+from utils.tracing import llm_span_tracker
+
+DEFAULT_TURNS = [
+    "Is Dr. lisa brown available on 20-10-2026?",
+    "Please book Dr. lisa brown on 20-10-2026 at 09:00.",
+    "What ecg lab test slots are available on 21-10-2026?",
+    "Do I need to fast before an ecg test?",
+    "Book the ecg lab test on 21-10-2026 at 10:00.",
+    "Which cardiology doctors are free on 22-10-2026?",
+]
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.tokens = defaultdict(int)
+
+    def on_chat_model_start(self, serialized, messages, *, metadata=None, **kwargs: Any) -> None:
+        node = agent_node_path(metadata or {})
+        for prompt in messages:
+            self.calls[node] += 1
+            self.tokens[node] += message_window.count_message_tokens(prompt)
+
+
+async def play(graph, turns: List[str], id_number: int) -> PromptTokenCounter:
+    counter = PromptTokenCounter()
+    reset_llm_usage_stats()
+    history: List[Any] = []
+    for turn in turns:
+        state = {
+            "messages": history + [HumanMessage(content=turn)],
+            "id_number": id_number,
+            "next": "",
+            "query": "",
+            "current_reasoning": "",
+            "current_instructions": "",
+            "missing_information": [],
+            "steps_taken": 0,
+            "memory_context": "",
+        }
+        result = await graph.ainvoke(state, config={"recursion_limit": 20, "callbacks": [counter]})
+        history = result["messages"]
+    counter.cached = {node: entry["cached_tokens"] for node, entry in llm_usage_stats().items()}
+    return counter
+
+
+async def main_async(args) -> None:
+    fake = None
+    if args.fake_llm:
+        fake = ScriptedChatModel(prefix_cache=True, callbacks=[usage_tracker, llm_span_tracker])
+        utils.llms.get_chat_model = lambda *a, **kw: fake
+    graph = SupervisorAgent().compiled_graph(args.mode)
+    turns = args.turn or [
+        # Repeats are numbered: identical turns would let the prefix cache match a shifted window
+        text if index < len(DEFAULT_TURNS) else f"{text} (again, #{index // len(DEFAULT_TURNS)})"
+        for index, text in enumerate((DEFAULT_TURNS * args.turns)[:args.turns])
+    ]
+
+    message_window.MESSAGE_WINDOW_ENABLED = False
+    before = await play(graph, turns, args.id_number)
+    if fake is not None:
+        # Start the windowed run with a cold cache, like the first run had
+        fake.reset_prefix_cache()
+    message_window.MESSAGE_WINDOW_ENABLED = True
+    after = await play(graph, turns, args.id_number)
+
+    print(f"\nPrompt tokens per node over {len(turns)} turns ({args.mode} graph), cached tokens from utils.llm_usage\n")
+    print(f"{'node':<56}{'calls':>7}{'before':>10}{'after':>10}{'saved':>8}{'cached before':>15}{'cached after':>14}")
+    total_before = total_after = cached_before = cached_after = 0
+    for node in sorted(set(before.tokens) | set(after.tokens)):
+        b, a = before.tokens.get(node, 0), after.tokens.get(node, 0)
+        cb, ca = before.cached.get(node, 0), after.cached.get(node, 0)
+        total_before += b
+        total_after += a
+        cached_before += cb
+        cached_after += ca
+        saved = f"{(1 - a / b) * 100:.0f}%" if b else "-"
+        print(f"{node:<56}{after.calls.get(node, 0):>7}{b:>10}{a:>10}{saved:>8}{cb:>15}{ca:>14}")
+    saved = f"{(1 - total_after / total_before) * 100:.0f}%" if total_before else "-"
+    print(f"{'total':<56}{'':>7}{total_before:>10}{total_after:>10}{saved:>8}{cached_before:>15}{cached_after:>14}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turn", action="append", help="user message for the next turn (repeatable)")
+    parser.add_argument("--turns", type=int, default=len(DEFAULT_TURNS), help="turns of the default script to play, repeating it")
+    parser.add_argument("--fake-llm", action="store_true", help="run offline on the scripted model with an emulated prefix cache")
+    parser.add_argument("--id-number", type=int, default=1234567)
+    parser.add_argument("--mode", choices=GRAPH_MODES, default="nested")
+    parser.add_argument("--fast-router", action="store_true", help="keep the rule-based pre-router enabled")
+    args = parser.parse_args()
+
+    # Every turn passes its full input, so the graphs run without a checkpointer
+    checkpointer.CHECKPOINT_BACKEND = "none"
+    if not args.fast_router:
+        fast_router.FAST_ROUTER_ENABLED = False
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
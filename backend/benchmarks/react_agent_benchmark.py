@@ -0,0 +1,127 @@
+"""
+Micro-benchmark of per-invocation ReAct worker overhead.
+
+Compares the old pattern (create_react_agent inside the node on every call)
+with the prebuilt workers in agents/worker_agents.py. The model is an
+in-process stub that answers instantly without tool calls, so the numbers are
+pure graph build/bind/run overhead: no network, no database.
+
+Usage (from backend/):
+    python -m benchmarks.react_agent_benchmark --iterations 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.prebuilt import create_react_agent
+
+from agents.worker_agents import build_worker, worker_input
+from prompt_library.context import context_message, with_context
+from prompt_library.doctor_appointment_prompt import booking_agent_prompt
+from toolkit.toolkits import cancel_appointment, reschedule_appointment, set_appointment
+
+TOOLS = [set_appointment, cancel_appointment, reschedule_appointment]
+
+
+class InstantChatModel(BaseChatModel):
+    """Answers immediately; bind_tools is a no-op so only graph overhead is measured."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "instant"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+
+def state(turn: str) -> dict:
+    return {
+        "messages": [HumanMessage(content=turn)],
+        "id_number": 1234567,
+        "steps_taken": 1,
+        "current_reasoning": "User wants to book.",
+        "current_instructions": "Book the requested slot.",
+        "memory_context": "",
+    }
+
+
+def build_per_call(model, node_state: dict):
+    def prompt(agent_state):
+        return with_context(booking_agent_prompt, agent_state["messages"], context_message(node_state, include_plan=True))
+
+    return create_react_agent(model=model, tools=TOOLS, prompt=prompt)
+
+
+async def per_call(model, iterations: int) -> List[float]:
+    timings = []
+    for i in range(iterations):
+        node_state = state(f"book slot {i}")
+        started = time.perf_counter()
+        agent = build_per_call(model, node_state)
+        await agent.ainvoke(node_state)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def prebuilt(model, iterations: int) -> List[float]:
+    agent = build_worker(model, TOOLS, booking_agent_prompt, name="booking_agent")
+    timings = []
+    for i in range(iterations):
+        node_state = state(f"book slot {i}")
+        started = time.perf_counter()
+        await agent.ainvoke(worker_input(node_state, node_state["messages"]))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def build_only(model, iterations: int) -> List[float]:
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        build_per_call(model, state(f"book slot {i}"))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(label: str, timings: List[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"{label:<28} median {statistics.median(ordered):8.3f} ms   p95 {p95:8.3f} ms"
+
+
+async def main_async(args) -> None:
+    model = InstantChatModel()
+    # Warm imports and pydantic schema caches before timing
+    await per_call(model, 3)
+    await prebuilt(model, 3)
+
+    build = build_only(model, args.iterations)
+    old = await per_call(model, args.iterations)
+    new = await prebuilt(model, args.iterations)
+
+    print(f"\nReAct worker overhead over {args.iterations} invocations\n")
+    print(summarize("create_react_agent only", build))
+    print(summarize("build + invoke (per call)", old))
+    print(summarize("invoke prebuilt", new))
+    saved = statistics.median(old) - statistics.median(new)
+    print(f"\nsaved per worker invocation: {saved:.3f} ms ({saved / statistics.median(old) * 100:.0f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
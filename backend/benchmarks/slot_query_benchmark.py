@@ -0,0 +1,198 @@
+"""
+Benchmark legacy TO_TIMESTAMP() slot filters against the indexed slot_date
+queries from db/slot_queries.py.
+
+Seeds a scratch schema (slot_benchmark) with millions of doctor and lab
+slots, times the original text-parsing queries, applies
+db/migrations/001_slot_timestamps.sql to the scratch tables and times the
+new queries on the same data.
+
+Usage (from backend/, against a disposable database):
+    python -m benchmarks.slot_query_benchmark --doctors 200 --slots-per-doctor 10000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db import slot_queries
+from db.db_connection import connect_to_db
+
+SCHEMA = "slot_benchmark"
+MIGRATION = Path(__file__).resolve().parent.parent / "db" / "migrations" / "001_slot_timestamps.sql"
+START = datetime(2025, 1, 1, 8, 0)
+SPECIALIZATIONS = 12
+LAB_TESTS = 10
+
+LEGACY_DOCTOR_QUERY = """
+    SELECT TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI') AS ts, consultation_fee
+    FROM doctor_appointments
+    WHERE doctor_name = %s
+      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
+      AND is_available = TRUE
+    ORDER BY TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
+"""
+
+LEGACY_SPECIALIZATION_QUERY = """
+    SELECT specialization, doctor_name,
+           TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'HH24:MI') AS date_slot_time,
+           consultation_fee
+    FROM doctor_appointments
+    WHERE specialization = %s
+      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
+      AND is_available = TRUE
+    ORDER BY doctor_name, TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
+"""
+
+LEGACY_LAB_QUERY = """
+    SELECT test_name, TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'HH24:MI') AS time_slot, price
+    FROM lab_tests
+    WHERE test_name ILIKE %s
+      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
+      AND is_available = TRUE
+    ORDER BY TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
+"""
+
+
+def seed(cur, doctors: int, slots_per_doctor: int, lab_slots_per_test: int) -> None:
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path = {SCHEMA};")
+    cur.execute(
+        """
+        CREATE TABLE doctor_appointments (
+            date_slot text, specialization text, doctor_name text,
+            is_available boolean, patient_to_attend text, consultation_fee numeric
+        );
+        CREATE TABLE lab_tests (
+            test_name text, date_slot text, is_available boolean,
+            patient_to_attend text, price numeric, prerequisites text
+        );
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO doctor_appointments
+        SELECT TO_CHAR(%(start)s::timestamp + s * interval '30 minutes', 'DD-MM-YYYY HH24:MI'),
+               'specialization_' || (d %% %(specs)s),
+               'doctor_' || d,
+               random() < 0.7,
+               NULL,
+               50 + (d %% 10) * 10
+        FROM generate_series(0, %(doctors)s - 1) AS d,
+             generate_series(0, %(slots)s - 1) AS s;
+        """,
+        {"start": START, "specs": SPECIALIZATIONS, "doctors": doctors, "slots": slots_per_doctor},
+    )
+    cur.execute(
+        """
+        INSERT INTO lab_tests
+        SELECT 'test_' || t,
+               TO_CHAR(%(start)s::timestamp + s * interval '15 minutes', 'DD-MM-YYYY HH24:MI'),
+               random() < 0.7,
+               NULL,
+               20 + t,
+               NULL
+        FROM generate_series(0, %(tests)s - 1) AS t,
+             generate_series(0, %(slots)s - 1) AS s;
+        """,
+        {"start": START, "tests": LAB_TESTS, "slots": lab_slots_per_test},
+    )
+    cur.execute("ANALYZE doctor_appointments; ANALYZE lab_tests;")
+
+
+def timed(fn, samples):
+    durations = []
+    for args in samples:
+        started = time.perf_counter()
+        fn(*args)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def summarize(label: str, durations) -> str:
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"{label:<28} median {statistics.median(ordered):9.2f} ms   p95 {p95:9.2f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--slots-per-doctor", type=int, default=10000)
+    parser.add_argument("--lab-slots-per-test", type=int, default=100000)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"Seeding {args.doctors * args.slots_per_doctor:,} doctor slots and "
+          f"{LAB_TESTS * args.lab_slots_per_test:,} lab slots into schema {SCHEMA}...")
+    started = time.perf_counter()
+    seed(cur, args.doctors, args.slots_per_doctor, args.lab_slots_per_test)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(42)
+    doctor_days = (args.slots_per_doctor * 30) // (24 * 60)
+    lab_days = (args.lab_slots_per_test * 15) // (24 * 60)
+    doctor_samples = [
+        (f"doctor_{rng.randrange(args.doctors)}", (START + timedelta(days=rng.randrange(max(doctor_days, 1)))).date())
+        for _ in range(args.samples)
+    ]
+    spec_samples = [
+        (f"specialization_{rng.randrange(SPECIALIZATIONS)}", day) for _, day in doctor_samples
+    ]
+    lab_samples = [
+        (f"test_{rng.randrange(LAB_TESTS)}", (START + timedelta(days=rng.randrange(max(lab_days, 1)))).date())
+        for _ in range(args.samples)
+    ]
+
+    def legacy(query):
+        def run(name, day):
+            cur.execute(query, (name, day.strftime(slot_queries.SLOT_DATE_FORMAT)))
+            cur.fetchall()
+        return run
+
+    results = {
+        "doctor/day legacy": timed(legacy(LEGACY_DOCTOR_QUERY), doctor_samples),
+        "specialization/day legacy": timed(legacy(LEGACY_SPECIALIZATION_QUERY), spec_samples),
+        "lab test/day legacy": timed(legacy(LEGACY_LAB_QUERY), lab_samples),
+    }
+
+    print("Applying migration to scratch tables...")
+    started = time.perf_counter()
+    cur.execute(MIGRATION.read_text())
+    cur.execute(f"SET search_path = {SCHEMA};")
+    print(f"Migration applied in {time.perf_counter() - started:.1f}s")
+
+    results["doctor/day indexed"] = timed(lambda n, d: slot_queries.fetch_doctor_day_slots(cur, n, d), doctor_samples)
+    results["specialization/day indexed"] = timed(
+        lambda n, d: slot_queries.fetch_specialization_day_slots(cur, n, d), spec_samples
+    )
+    results["lab test/day indexed"] = timed(lambda n, d: slot_queries.fetch_lab_day_slots(cur, n, d), lab_samples)
+
+    print()
+    for label, durations in results.items():
+        print(summarize(label, durations))
+
+    name, day = doctor_samples[0]
+    cur.execute(
+        "EXPLAIN SELECT slot_ts, consultation_fee FROM doctor_appointments "
+        "WHERE doctor_name = %s AND slot_date = %s AND is_available = TRUE ORDER BY slot_ts",
+        (name, day),
+    )
+    print("\nIndexed doctor/day plan:")
+    for (line,) in cur.fetchall():
+        print(f"  {line}")
+
+    if not args.keep:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE;")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
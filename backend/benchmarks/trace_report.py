@@ -0,0 +1,64 @@
+"""
+Summarize a JSON-lines trace file written with TRACE_EXPORTER=jsonl.
+
+Prints, per span name, how often it ran and its total and self time (time
+not spent in child spans) across all turns, then the span tree of the
+slowest turns, so the share of a slow turn spent in LLM calls, tools, the
+database and S3 is visible at a glance.
+
+Usage (from backend/):
+    TRACE_EXPORTER=jsonl TRACE_FILE=traces.jsonl uvicorn main:app
+    python -m benchmarks.trace_report traces.jsonl --slowest 3
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_tree(span: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]], depth: int = 0) -> None:
+    attributes = ", ".join(f"{key}={value}" for key, value in span["attributes"].items() if key != "statement")
+    status = "" if span["status"] == "ok" else f"  [{span['error']}]"
+    print(f"{'  ' * depth}{span['name']:<{60 - 2 * depth}} {span['duration_ms']:9.1f} ms  {attributes}{status}"[:200])
+    for child in sorted(children[span["span_id"]], key=lambda s: s["start_ns"]):
+        print_tree(child, children, depth + 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="traces.jsonl")
+    parser.add_argument("--slowest", type=int, default=1, help="number of slowest turns to print as trees")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    children = defaultdict(list)
+    for span in spans:
+        children[span["parent_id"]].append(span)
+
+    totals = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+    for span in spans:
+        entry = totals[span["name"]]
+        entry["count"] += 1
+        entry["total_ms"] += span["duration_ms"]
+        entry["self_ms"] += span["duration_ms"] - sum(c["duration_ms"] for c in children[span["span_id"]])
+
+    turns = [span for span in spans if span["name"] == "turn"]
+    print(f"{len(spans)} spans, {len(turns)} turns\n")
+    print(f"{'span':<48} {'count':>7} {'total ms':>11} {'self ms':>11} {'mean ms':>9}")
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]["self_ms"]):
+        print(f"{name:<48} {entry['count']:7d} {entry['total_ms']:11.1f} {entry['self_ms']:11.1f} "
+              f"{entry['total_ms'] / entry['count']:9.2f}")
+
+    for turn in sorted(turns, key=lambda s: -s["duration_ms"])[:args.slowest]:
+        print()
+        print_tree(turn, children)
+
+
+if __name__ == "__main__":
+    main()
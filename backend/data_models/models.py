@@ -1,5 +1,9 @@
 import re
-from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+# Longest range the range availability tools accept
+MAX_DATE_RANGE_DAYS = 31
 
 class DateTimeModel(BaseModel):
     date:str=Field(description="Properly formatted date", pattern=r'^\d{2}-\d{2}-\d{4} \d{2}:\d{2}$')
@@ -25,3 +29,35 @@ class IdentificationNumberModel(BaseModel):
         if not re.match(r'^\d{7,8}$', str(v)):  # Convert to string before matching
             raise ValueError("The ID number should be a 7 or 8-digit number")
         return v
+
+
+class DateRangeModel(BaseModel):
+    start_date: str = Field(description="First day of the range, 'DD-MM-YYYY'", pattern=r'^\d{2}-\d{2}-\d{4}$')
+    end_date: str = Field(description="Last day of the range (inclusive), 'DD-MM-YYYY'", pattern=r'^\d{2}-\d{2}-\d{4}$')
+
+    @field_validator("start_date", "end_date")
+    def check_format_date(cls, v):
+        if not re.match(r'^\d{2}-\d{2}-\d{4}$', v):  # Ensures DD-MM-YYYY format
+            raise ValueError("The date must be in the format 'DD-MM-YYYY'")
+        return v
+
+    @model_validator(mode="after")
+    def check_range(self):
+        start = datetime.strptime(self.start_date, "%d-%m-%Y")
+        end = datetime.strptime(self.end_date, "%d-%m-%Y")
+        if end < start:
+            raise ValueError("end_date must not be before start_date")
+        if (end - start).days > MAX_DATE_RANGE_DAYS:
+            raise ValueError(f"The date range can span at most {MAX_DATE_RANGE_DAYS} days")
+        return self
+
+
+class TimeWindowModel(BaseModel):
+    start_time: str = Field(description="Earliest slot time of day, 'HH:MM'", pattern=r'^\d{2}:\d{2}$')
+    end_time: str = Field(description="Latest slot time of day (inclusive), 'HH:MM'", pattern=r'^\d{2}:\d{2}$')
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.end_time < self.start_time:
+            raise ValueError("end_time must not be before start_time")
+        return self
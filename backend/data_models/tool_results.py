@@ -0,0 +1,106 @@
+"""
+Typed results returned by the toolkit tools.
+
+Every tool builds one of these models and returns (model.render(), model.model_dump())
+via response_format="content_and_artifact": the compact rendering is what the
+LLM reads back, the dump travels as the ToolMessage artifact and reaches
+clients through the "results" list of /execute and /execute/stream.
+"""
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+# Key under a worker reply's additional_kwargs holding the dumps of this call's results
+TOOL_RESULTS_KEY = "tool_results"
+
+
+def _money(amount: Optional[float]) -> str:
+    return f"${amount:.2f}" if amount is not None else "n/a"
+
+
+def _compact_slots(slots: List[str]) -> str:
+    """'08:00, 08:30' for one day; '20-10-2026 08:00, 08:30; 21-10-2026 09:00' across days."""
+    days: dict = {}
+    for slot in slots:
+        day, _, hhmm = slot.rpartition(" ")
+        days.setdefault(day, []).append(hhmm)
+    return "; ".join(f"{day} {', '.join(times)}" if day else ", ".join(times) for day, times in days.items())
+
+
+class AvailabilityOption(BaseModel):
+    name: str = Field(description="Doctor or lab test name")
+    specialization: Optional[str] = None
+    fee: Optional[float] = None
+    slots: List[str] = Field(default_factory=list, description="'HH:MM' for one day, 'DD-MM-YYYY HH:MM' otherwise")
+    preferred: bool = Field(default=False, description="The patient's preferred doctor")
+
+
+class AvailabilityResult(BaseModel):
+    type: Literal["availability"] = "availability"
+    kind: Literal["doctor", "lab"]
+    subject: str = Field(description="Doctor name, specialization or test name that was searched")
+    date: str = Field(description="'DD-MM-YYYY' or 'DD-MM-YYYY to DD-MM-YYYY' for range searches")
+    options: List[AvailabilityOption] = Field(default_factory=list)
+    truncated: bool = Field(default=False, description="Only the earliest slots up to the search limit are listed")
+
+    def render(self) -> str:
+        if not self.options:
+            return f"No availability for {self.subject} on {self.date}."
+        header = f"Availability for {self.subject} on {self.date}"
+        lines = [header + (" (earliest slots only):" if self.truncated else ":")]
+        for option in self.options:
+            marker = " [preferred]" if option.preferred else ""
+            lines.append(f"- {option.name}{marker} ({_money(option.fee)}): {_compact_slots(option.slots)}")
+        return "\n".join(lines)
+
+
+class BookingResult(BaseModel):
+    type: Literal["booking"] = "booking"
+    kind: Literal["doctor", "lab"]
+    status: Literal[
+        "booked", "pending", "confirmed", "paid", "cancelled", "rescheduled", "expired",
+        "unavailable", "not_found", "error",
+    ] = Field(description="'pending' is a hold awaiting confirmation; 'confirmed' awaits payment")
+    detail: str = Field(description="Doctor name or lab test name")
+    date: str
+    previous_date: Optional[str] = None
+    patient_id: int
+    booking_reference: Optional[str] = None
+    amount: Optional[float] = None
+    hold_expires_at: Optional[str] = Field(default=None, description="'DD-MM-YYYY HH:MM' for pending holds")
+    message: Optional[str] = None
+
+    def render(self) -> str:
+        subject = f"Dr. {self.detail}" if self.kind == "doctor" else f"lab test {self.detail}"
+        if self.status == "unavailable":
+            return f"UNAVAILABLE: {subject} has no open slot at {self.date}."
+        if self.status == "not_found":
+            if self.booking_reference:
+                return f"NOT_FOUND: no booking {self.booking_reference} for patient {self.patient_id}."
+            return f"NOT_FOUND: no appointment with {subject} on {self.date} for patient {self.patient_id}."
+        if self.status == "error":
+            return f"ERROR: {self.message}"
+        when = f"{self.previous_date} -> {self.date}" if self.previous_date else self.date
+        parts = [f"{self.status.upper()}: {subject}, {when}, patient {self.patient_id}"]
+        if self.booking_reference:
+            parts.append(f"ref {self.booking_reference}")
+        if self.amount is not None:
+            parts.append(f"amount {_money(self.amount)}")
+        if self.hold_expires_at:
+            parts.append(f"held until {self.hold_expires_at}")
+        if self.message:
+            parts.append(self.message)
+        return ", ".join(parts) + "."
+
+
+class PrerequisitesResult(BaseModel):
+    type: Literal["prerequisites"] = "prerequisites"
+    test_name: str
+    found: bool
+    prerequisites: Optional[str] = None
+
+    def render(self) -> str:
+        if not self.found:
+            return f"Test {self.test_name} not found in the system."
+        return f"Prerequisites for {self.test_name}: {self.prerequisites or 'none'}"
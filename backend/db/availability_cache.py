@@ -0,0 +1,141 @@
+"""
+Short-lived cache of open-slot query results for the availability tools.
+
+Entries are keyed on (kind, doctor | specialization | test, day) and hold the
+rows returned by db/slot_queries.py, so a hit skips both the pool checkout and
+the query. Range lookups are keyed on (kind_range, name, start_day, end_day,
+start_time, end_time, limit) and are invalidated when the written day falls
+inside their range. The write tools call the invalidate_* helpers after they commit, so
+a booking, cancellation or reschedule is visible on the next read. Rows
+read while an invalidation of their key lands are returned but not cached (see
+utils/cache.py), so a query racing a booking cannot cache the booked slot
+as free. The TTL only bounds staleness from writers outside this process.
+
+Configuration (environment variables):
+    AVAILABILITY_CACHE_TTL_SECONDS   seconds an entry is served (default 5, 0 disables)
+    AVAILABILITY_CACHE_MAX_ENTRIES   entries kept (default 2048)
+"""
+
+import os
+from datetime import date, time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from db import slot_queries
+from db.connection_pool import get_connection
+from utils.cache import TTLCache
+
+_cache = TTLCache(
+    max_entries=int(os.getenv("AVAILABILITY_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "5")),
+)
+
+
+def _lab_key(test_name: Optional[str]) -> Optional[str]:
+    # Lab lookups match test names case-insensitively
+    return test_name.lower() if test_name else None
+
+
+def _cached_rows(key: Tuple[Any, ...], query: Callable) -> Tuple[tuple, ...]:
+    # Read before the query: an invalidation of this key while it runs means the rows may predate a booking
+    generation = _cache.generation
+    rows = _cache.get(key)
+    if rows is None:
+        with get_connection() as conn, conn.cursor() as cur:
+            rows = tuple(query(cur))
+        _cache.set(key, rows, generation=generation)
+    return rows
+
+
+def doctor_day_slots(doctor_name: str, day: date):
+    """Cached slot_queries.fetch_doctor_day_slots."""
+    return _cached_rows(
+        ("doctor", doctor_name, day),
+        lambda cur: slot_queries.fetch_doctor_day_slots(cur, doctor_name, day),
+    )
+
+
+def specialization_day_slots(specialization: str, day: date):
+    """Cached slot_queries.fetch_specialization_day_slots."""
+    return _cached_rows(
+        ("specialization", specialization, day),
+        lambda cur: slot_queries.fetch_specialization_day_slots(cur, specialization, day),
+    )
+
+
+def lab_day_slots(test_name: Optional[str], day: date):
+    """Cached slot_queries.fetch_lab_day_slots."""
+    return _cached_rows(
+        ("lab", _lab_key(test_name), day),
+        lambda cur: slot_queries.fetch_lab_day_slots(cur, test_name, day),
+    )
+
+
+def doctor_range_slots(
+    doctor_name: str, start_day: date, end_day: date,
+    start_time: Optional[time] = None, end_time: Optional[time] = None, limit: int = 20,
+):
+    """Cached slot_queries.fetch_doctor_range_slots."""
+    return _cached_rows(
+        ("doctor_range", doctor_name, start_day, end_day, start_time, end_time, limit),
+        lambda cur: slot_queries.fetch_doctor_range_slots(
+            cur, doctor_name, start_day, end_day, start_time, end_time, limit
+        ),
+    )
+
+
+def specialization_range_slots(
+    specialization: str, start_day: date, end_day: date,
+    start_time: Optional[time] = None, end_time: Optional[time] = None, limit: int = 20,
+):
+    """Cached slot_queries.fetch_specialization_range_slots."""
+    return _cached_rows(
+        ("specialization_range", specialization, start_day, end_day, start_time, end_time, limit),
+        lambda cur: slot_queries.fetch_specialization_range_slots(
+            cur, specialization, start_day, end_day, start_time, end_time, limit
+        ),
+    )
+
+
+def lab_range_slots(
+    test_name: str, start_day: date, end_day: date,
+    start_time: Optional[time] = None, end_time: Optional[time] = None, limit: int = 20,
+):
+    """Cached slot_queries.fetch_lab_range_slots."""
+    return _cached_rows(
+        ("lab_range", _lab_key(test_name), start_day, end_day, start_time, end_time, limit),
+        lambda cur: slot_queries.fetch_lab_range_slots(cur, test_name, start_day, end_day, start_time, end_time, limit),
+    )
+
+
+def _invalidate_ranges(kind: str, name: Optional[str], day: date) -> None:
+    """Drop cached range lookups of `kind` covering `day`; name None matches every name."""
+    _cache.invalidate_where(
+        lambda key: key[0] == kind and (name is None or key[1] == name) and key[2] <= day <= key[3]
+    )
+
+
+def invalidate_doctor_slot(doctor_name: str, specialization: Optional[str], day: date) -> None:
+    """Drop cached availability affected by a committed write to one doctor's slot."""
+    _cache.invalidate(("doctor", doctor_name, day))
+    _invalidate_ranges("doctor_range", doctor_name, day)
+    if specialization:
+        _cache.invalidate(("specialization", specialization, day))
+    else:
+        # Specialization unknown: drop every specialization entry for the day
+        _cache.invalidate_where(lambda key: key[0] == "specialization" and key[2] == day)
+    _invalidate_ranges("specialization_range", specialization, day)
+
+
+def invalidate_lab_slot(test_name: str, day: date) -> None:
+    """Drop cached availability affected by a committed write to a lab slot."""
+    _cache.invalidate(("lab", _lab_key(test_name), day))
+    _cache.invalidate(("lab", None, day))
+    _invalidate_ranges("lab_range", _lab_key(test_name), day)
+
+
+def availability_cache_stats() -> Dict[str, Any]:
+    return _cache.snapshot()
+
+
+def clear_availability_cache() -> None:
+    _cache.clear()
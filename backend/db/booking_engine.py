@@ -0,0 +1,386 @@
+"""
+Transactional booking operations behind the booking tools.
+
+Each operation runs in one transaction on a pooled connection:
+
+- slots are taken with a single UPDATE ... WHERE is_available RETURNING
+  (slot_queries.book_*_slot), so two patients racing for the same slot
+  cannot both succeed and a miss is reported as "unavailable";
+- a reschedule books the new slot before releasing the old one and rolls
+  both back if either step matches nothing;
+- an optional idempotency key is claimed in the same transaction and the
+  returned BookingResult is stored with it, so retrying the same request
+  returns the original booking instead of booking twice
+  (db/migrations/004_booking_idempotency.sql). The replay reports the
+  booking's current state, so a retry after confirm(), pay() or the
+  hold's expiry does not see the stale "pending" hold;
+- every booking is recorded in the bookings table under a reference
+  (db/migrations/005_bookings.sql). Booking requests hold the slot until
+  confirm() or until the hold expires and expire_holds() frees it;
+  set_appointment's direct bookings are recorded as already confirmed.
+
+The availability cache is invalidated after commit.
+
+Configuration (environment variables):
+    BOOKING_IDEMPOTENCY_TTL_SECONDS   seconds a stored result is replayed (default 900)
+    BOOKING_HOLD_TTL_SECONDS          seconds a booking request holds its slot unconfirmed (default 600)
+"""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from psycopg2.extras import Json
+
+from data_models.tool_results import BookingResult
+from db import availability_cache, booking_queries, slot_queries
+from db.connection_pool import get_connection
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("BOOKING_IDEMPOTENCY_TTL_SECONDS", "900"))
+HOLD_TTL_SECONDS = float(os.getenv("BOOKING_HOLD_TTL_SECONDS", "600"))
+
+# bookings.status -> BookingResult.status
+_RESULT_STATUS = {
+    "held": "pending",
+    "confirmed": "confirmed",
+    "paid": "paid",
+    "cancelled": "cancelled",
+    "expired": "expired",
+}
+
+
+def idempotency_key(operation: str, kind: str, subject: str, slot: datetime, patient_id: int) -> str:
+    """Deterministic key for a booking request, so identical retries collide."""
+    raw = f"{operation}|{kind}|{subject.lower()}|{slot.isoformat()}|{patient_id}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _slot_label(slot: datetime) -> str:
+    return slot.strftime(slot_queries.SLOT_DATETIME_FORMAT)
+
+
+def _fee(amount) -> Optional[float]:
+    return float(amount) if amount is not None else None
+
+
+def _new_reference(kind: str) -> str:
+    return f"{'DOC' if kind == 'doctor' else 'LAB'}-{uuid.uuid4().hex[:8].upper()}"
+
+
+def _booking_result(row: tuple, message: Optional[str] = None) -> BookingResult:
+    reference, kind, subject, slot_ts, patient_id, status, amount, hold_expires_at = row
+    if status == "held" and hold_expires_at is not None and hold_expires_at <= datetime.now(hold_expires_at.tzinfo):
+        status = "expired"
+    return BookingResult(
+        kind=kind, status=_RESULT_STATUS[status], detail=subject, date=_slot_label(slot_ts),
+        patient_id=patient_id, booking_reference=reference, amount=_fee(amount),
+        hold_expires_at=_slot_label(hold_expires_at.astimezone()) if status == "held" and hold_expires_at else None,
+        message=message,
+    )
+
+
+def _replay(cur, stored: BookingResult) -> BookingResult:
+    """The stored result with the booking's current state; bookings outlive their hold, keys outlive both."""
+    if not stored.booking_reference:
+        return stored
+    row = booking_queries.find_booking(cur, stored.booking_reference, stored.patient_id)
+    if row is None:
+        return stored
+    current = _booking_result(row)
+    # "booked" and "rescheduled" are how a confirmed booking was first reported
+    if current.status == "confirmed" and stored.status in ("booked", "rescheduled"):
+        return stored
+    return current
+
+
+def _claim(cur, key: Optional[str], kind: str, subject: str, slot: datetime, patient_id: int) -> Optional[BookingResult]:
+    """
+    Claim `key` for this transaction; returns the earlier request's result,
+    brought up to date by _replay(), if one already completed under it, else None.
+
+    A concurrent claim of the same key waits on the primary key until the
+    first transaction finishes: on commit it reads the stored result, on
+    rollback its INSERT goes through.
+    """
+    if key is None:
+        return None
+    for _ in range(2):
+        cur.execute(
+            """
+            INSERT INTO booking_idempotency (idempotency_key, kind, subject, slot_ts, patient_id)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (idempotency_key) DO NOTHING
+            RETURNING 1;
+            """,
+            (key, kind, subject.lower(), slot, patient_id),
+        )
+        if cur.fetchone():
+            return None
+        cur.execute(
+            """
+            SELECT result, created_at < NOW() - make_interval(secs => %s)
+            FROM booking_idempotency
+            WHERE idempotency_key = %s;
+            """,
+            (IDEMPOTENCY_TTL_SECONDS, key),
+        )
+        row = cur.fetchone()
+        if row and row[0] is not None and not row[1]:
+            return _replay(cur, BookingResult.model_validate(row[0]))
+        # Expired, or removed since the INSERT conflicted: drop it and claim again
+        cur.execute("DELETE FROM booking_idempotency WHERE idempotency_key = %s;", (key,))
+    return None
+
+
+def _store(cur, key: Optional[str], result: BookingResult) -> None:
+    if key is not None:
+        cur.execute(
+            "UPDATE booking_idempotency SET result = %s WHERE idempotency_key = %s;",
+            (Json(result.model_dump(mode="json")), key),
+        )
+
+
+def _forget(cur, kind: str, subject: str, slot: datetime) -> None:
+    """Drop keys for a released slot, so booking it again later is not answered from a stale result."""
+    cur.execute(
+        "DELETE FROM booking_idempotency WHERE kind = %s AND subject = %s AND slot_ts = %s;",
+        (kind, subject.lower(), slot),
+    )
+
+
+def bookings_schema_ready() -> bool:
+    """Whether migrations 004 and 005 (booking_idempotency, bookings) have been applied."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('bookings') IS NOT NULL AND to_regclass('booking_idempotency') IS NOT NULL;")
+        ready = cur.fetchone()[0]
+        conn.commit()
+    return ready
+
+
+def purge_expired_idempotency_keys() -> int:
+    """Delete keys past the TTL; returns the number removed."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM booking_idempotency WHERE created_at < NOW() - make_interval(secs => %s);",
+            (IDEMPOTENCY_TTL_SECONDS,),
+        )
+        removed = cur.rowcount
+        conn.commit()
+    return removed
+
+
+# Doctor appointments
+
+
+def _take_doctor(doctor_name: str, slot: datetime, patient_id: int, key: Optional[str], status: str) -> BookingResult:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            replay = _claim(cur, key, "doctor", doctor_name, slot, patient_id)
+            if replay is not None:
+                conn.rollback()
+                return replay
+
+            booked = slot_queries.book_doctor_slot(cur, doctor_name, slot, patient_id)
+            if booked is None:
+                conn.rollback()
+                return BookingResult(
+                    kind="doctor", status="unavailable", detail=doctor_name,
+                    date=_slot_label(slot), patient_id=patient_id,
+                )
+
+            specialization, consultation_fee = booked
+            row = booking_queries.insert_booking(
+                cur, _new_reference("doctor"), "doctor", doctor_name, slot, patient_id, status, consultation_fee,
+                hold_seconds=HOLD_TTL_SECONDS if status == "held" else None,
+            )
+            result = _booking_result(row)
+            if status == "confirmed":
+                result.status = "booked"
+            _store(cur, key, result)
+        conn.commit()
+
+    availability_cache.invalidate_doctor_slot(doctor_name, specialization, slot.date())
+    return result
+
+
+def book_doctor(doctor_name: str, slot: datetime, patient_id: int, key: Optional[str] = None) -> BookingResult:
+    """Book a slot outright; the booking is recorded as confirmed."""
+    return _take_doctor(doctor_name, slot, patient_id, key, "confirmed")
+
+
+def hold_doctor(doctor_name: str, slot: datetime, patient_id: int, key: Optional[str] = None) -> BookingResult:
+    """Hold a slot for HOLD_TTL_SECONDS pending confirm()."""
+    return _take_doctor(doctor_name, slot, patient_id, key, "held")
+
+
+def cancel_doctor(doctor_name: str, slot: datetime, patient_id: int) -> BookingResult:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            specialization = slot_queries.release_doctor_slot(cur, doctor_name, slot, patient_id)
+            if specialization is None:
+                conn.rollback()
+                return BookingResult(
+                    kind="doctor", status="not_found", detail=doctor_name,
+                    date=_slot_label(slot), patient_id=patient_id,
+                )
+            _forget(cur, "doctor", doctor_name, slot)
+            reference = booking_queries.cancel_live_booking(cur, "doctor", doctor_name, slot, patient_id)
+        conn.commit()
+
+    availability_cache.invalidate_doctor_slot(doctor_name, specialization, slot.date())
+    return BookingResult(
+        kind="doctor", status="cancelled", detail=doctor_name, date=_slot_label(slot),
+        patient_id=patient_id, booking_reference=reference,
+    )
+
+
+def reschedule_doctor(
+    doctor_name: str, old_slot: datetime, new_slot: datetime, patient_id: int, key: Optional[str] = None
+) -> BookingResult:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            replay = _claim(cur, key, "doctor", doctor_name, new_slot, patient_id)
+            if replay is not None:
+                conn.rollback()
+                return replay
+
+            booked = slot_queries.book_doctor_slot(cur, doctor_name, new_slot, patient_id)
+            if booked is None:
+                conn.rollback()
+                return BookingResult(
+                    kind="doctor", status="unavailable", detail=doctor_name, date=_slot_label(new_slot),
+                    previous_date=_slot_label(old_slot), patient_id=patient_id,
+                )
+
+            # Only give up the old slot once the new one is held; undo both if it is not the patient's
+            if slot_queries.release_doctor_slot(cur, doctor_name, old_slot, patient_id) is None:
+                conn.rollback()
+                return BookingResult(
+                    kind="doctor", status="not_found", detail=doctor_name,
+                    date=_slot_label(old_slot), patient_id=patient_id,
+                )
+            _forget(cur, "doctor", doctor_name, old_slot)
+
+            specialization, consultation_fee = booked
+            reference = booking_queries.move_live_booking(
+                cur, "doctor", doctor_name, old_slot, new_slot, patient_id, consultation_fee
+            )
+            if reference is None:
+                # Booked before bookings were recorded; start recording it now
+                reference = booking_queries.insert_booking(
+                    cur, _new_reference("doctor"), "doctor", doctor_name, new_slot, patient_id,
+                    "confirmed", consultation_fee,
+                )[0]
+            result = BookingResult(
+                kind="doctor", status="rescheduled", detail=doctor_name, date=_slot_label(new_slot),
+                previous_date=_slot_label(old_slot), patient_id=patient_id, booking_reference=reference,
+                amount=_fee(consultation_fee),
+            )
+            _store(cur, key, result)
+        conn.commit()
+
+    # A doctor has one specialization, so the booked slot's applies to the released one too
+    availability_cache.invalidate_doctor_slot(doctor_name, specialization, old_slot.date())
+    availability_cache.invalidate_doctor_slot(doctor_name, specialization, new_slot.date())
+    return result
+
+
+# Lab tests
+
+
+def hold_lab(test_name: str, slot: datetime, patient_id: int, key: Optional[str] = None) -> BookingResult:
+    """Hold a lab slot for HOLD_TTL_SECONDS pending confirm()."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            replay = _claim(cur, key, "lab", test_name, slot, patient_id)
+            if replay is not None:
+                conn.rollback()
+                return replay
+
+            booked = slot_queries.book_lab_slot(cur, test_name, slot, patient_id)
+            if booked is None:
+                conn.rollback()
+                return BookingResult(
+                    kind="lab", status="unavailable", detail=test_name,
+                    date=_slot_label(slot), patient_id=patient_id,
+                )
+
+            test_name_db, price = booked
+            row = booking_queries.insert_booking(
+                cur, _new_reference("lab"), "lab", test_name_db, slot, patient_id, "held", price,
+                hold_seconds=HOLD_TTL_SECONDS,
+            )
+            result = _booking_result(row)
+            _store(cur, key, result)
+        conn.commit()
+
+    availability_cache.invalidate_lab_slot(test_name_db, slot.date())
+    return result
+
+
+# Booking lifecycle
+
+
+def _advance(booking_reference: str, patient_id: int, from_status: str, to_status: str) -> BookingResult:
+    reference = booking_reference.strip().upper()
+    with get_connection() as conn, conn.cursor() as cur:
+        row = booking_queries.advance_booking(cur, reference, patient_id, from_status, to_status)
+        if row is None:
+            row = booking_queries.find_booking(cur, reference, patient_id)
+        conn.commit()
+
+    if row is None:
+        return BookingResult(
+            kind="lab" if reference.startswith("LAB-") else "doctor", status="not_found", detail="",
+            date="", patient_id=patient_id, booking_reference=reference,
+        )
+    # A hold past its expiry reads as expired even before the reaper gets to it
+    result = _booking_result(row)
+    if result.status in ("cancelled", "expired"):
+        result.message = "the booking is no longer active, please book again"
+    elif result.status == "pending":
+        result.message = "confirm the booking before paying"
+    # Otherwise the booking is already at or past to_status: repeating the step is a no-op
+    return result
+
+
+def confirm(booking_reference: str, patient_id: int) -> BookingResult:
+    """held -> confirmed, while the hold is still live."""
+    return _advance(booking_reference, patient_id, "held", "confirmed")
+
+
+def pay(booking_reference: str, patient_id: int) -> BookingResult:
+    """confirmed -> paid."""
+    return _advance(booking_reference, patient_id, "confirmed", "paid")
+
+
+def lookup(booking_reference: str, patient_id: int) -> BookingResult:
+    reference = booking_reference.strip().upper()
+    with get_connection() as conn, conn.cursor() as cur:
+        row = booking_queries.find_booking(cur, reference, patient_id)
+    if row is None:
+        return BookingResult(
+            kind="lab" if reference.startswith("LAB-") else "doctor", status="not_found", detail="",
+            date="", patient_id=patient_id, booking_reference=reference,
+        )
+    return _booking_result(row)
+
+
+def expire_holds(batch_size: int = 500) -> int:
+    """Expire overdue holds batch by batch, freeing their slots; returns the number of holds expired."""
+    total = 0
+    while True:
+        with get_connection() as conn, conn.cursor() as cur:
+            expired, rows = booking_queries.expire_holds(cur, batch_size)
+            conn.commit()
+        for kind, subject, specialization, slot_ts in rows:
+            if kind == "doctor":
+                availability_cache.invalidate_doctor_slot(subject, specialization, slot_ts.date())
+            else:
+                availability_cache.invalidate_lab_slot(subject, slot_ts.date())
+        total += expired
+        # Loop on holds, not freed slots: a full batch whose slots were already released still means more may be due
+        if expired < batch_size:
+            return total
@@ -0,0 +1,196 @@
+"""
+Queries for the bookings table (db/migrations/005_bookings.sql).
+
+A booking row records who holds a slot and where it is in the
+held -> confirmed -> paid lifecycle; the slot row itself
+(doctor_appointments / lab_tests) stays the source of truth for
+availability. Held bookings carry hold_expires_at; expire_holds() frees
+overdue holds and their slots in one statement per batch.
+
+Every function takes an open cursor so callers control the connection and
+transaction.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Column order of the booking rows returned below
+BOOKING_COLUMNS = (
+    "booking_reference, kind, subject, slot_ts, patient_id, status, amount, hold_expires_at"
+)
+
+
+def insert_booking(
+    cur,
+    booking_reference: str,
+    kind: str,
+    subject: str,
+    slot: datetime,
+    patient_id: int,
+    status: str,
+    amount,
+    hold_seconds: Optional[float] = None,
+) -> tuple:
+    """Record a booking; holds expire hold_seconds from now."""
+    cur.execute(
+        f"""
+        INSERT INTO bookings (booking_reference, kind, subject, slot_ts, patient_id, status, amount, hold_expires_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s,
+                CASE WHEN %s::float8 IS NULL THEN NULL ELSE NOW() + make_interval(secs => %s::float8) END)
+        RETURNING {BOOKING_COLUMNS};
+        """,
+        (booking_reference, kind, subject, slot, patient_id, status, amount, hold_seconds, hold_seconds),
+    )
+    return cur.fetchone()
+
+
+def find_booking(cur, booking_reference: str, patient_id: int) -> Optional[tuple]:
+    cur.execute(
+        f"""
+        SELECT {BOOKING_COLUMNS}
+        FROM bookings
+        WHERE booking_reference = %s
+          AND patient_id = %s;
+        """,
+        (booking_reference, patient_id),
+    )
+    return cur.fetchone()
+
+
+def advance_booking(cur, booking_reference: str, patient_id: int, from_status: str, to_status: str) -> Optional[tuple]:
+    """
+    Move a booking from from_status to to_status; returns the updated row, or
+    None if it is not in from_status (or is a hold that has already expired).
+    """
+    cur.execute(
+        f"""
+        UPDATE bookings
+        SET status = %s,
+            hold_expires_at = NULL,
+            updated_at = NOW()
+        WHERE booking_reference = %s
+          AND patient_id = %s
+          AND status = %s
+          AND (status <> 'held' OR hold_expires_at > NOW())
+        RETURNING {BOOKING_COLUMNS};
+        """,
+        (to_status, booking_reference, patient_id, from_status),
+    )
+    return cur.fetchone()
+
+
+def cancel_live_booking(cur, kind: str, subject: str, slot: datetime, patient_id: int) -> Optional[str]:
+    """Mark the patient's live booking of a slot cancelled; returns its reference, if any."""
+    cur.execute(
+        """
+        UPDATE bookings
+        SET status = 'cancelled',
+            hold_expires_at = NULL,
+            updated_at = NOW()
+        WHERE kind = %s
+          AND subject = %s
+          AND slot_ts = %s
+          AND patient_id = %s
+          AND status IN ('held', 'confirmed', 'paid')
+        RETURNING booking_reference;
+        """,
+        (kind, subject, slot, patient_id),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def move_live_booking(
+    cur, kind: str, subject: str, old_slot: datetime, new_slot: datetime, patient_id: int, amount
+) -> Optional[str]:
+    """Point the patient's live booking of old_slot at new_slot; returns its reference, if any."""
+    cur.execute(
+        """
+        UPDATE bookings
+        SET slot_ts = %s,
+            amount = %s,
+            updated_at = NOW()
+        WHERE kind = %s
+          AND subject = %s
+          AND slot_ts = %s
+          AND patient_id = %s
+          AND status IN ('held', 'confirmed', 'paid')
+        RETURNING booking_reference;
+        """,
+        (new_slot, amount, kind, subject, old_slot, patient_id),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def expire_holds(cur, batch_size: int) -> Tuple[int, List[Tuple[str, str, Optional[str], datetime]]]:
+    """
+    Expire up to batch_size overdue holds and free their slots. Returns the
+    number of holds expired and the freed slots as (kind, subject,
+    specialization, slot_ts) for cache invalidation; a hold whose slot was
+    already released frees nothing, so the two counts can differ.
+
+    SKIP LOCKED lets several reapers (one per API instance) share the
+    backlog, and leaves a hold that is being confirmed right now alone.
+    """
+    cur.execute(
+        """
+        WITH due AS (
+            SELECT booking_reference
+            FROM bookings
+            WHERE status = 'held'
+              AND hold_expires_at <= NOW()
+            ORDER BY hold_expires_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ),
+        expired AS (
+            UPDATE bookings b
+            SET status = 'expired',
+                updated_at = NOW()
+            FROM due
+            WHERE b.booking_reference = due.booking_reference
+            RETURNING b.kind, b.subject, b.slot_ts, b.patient_id
+        ),
+        freed_doctor AS (
+            UPDATE doctor_appointments d
+            SET is_available = TRUE,
+                patient_to_attend = NULL
+            FROM expired e
+            WHERE e.kind = 'doctor'
+              AND d.doctor_name = e.subject
+              AND d.slot_ts = e.slot_ts
+              AND d.patient_to_attend::TEXT = e.patient_id::TEXT
+            RETURNING d.doctor_name, d.specialization, d.slot_ts
+        ),
+        freed_lab AS (
+            UPDATE lab_tests l
+            SET is_available = TRUE,
+                patient_to_attend = NULL
+            FROM expired e
+            WHERE e.kind = 'lab'
+              AND lower(l.test_name) = lower(e.subject)
+              AND l.slot_ts = e.slot_ts
+              AND l.patient_to_attend::TEXT = e.patient_id::TEXT
+            RETURNING l.test_name, l.slot_ts
+        ),
+        forgotten AS (
+            DELETE FROM booking_idempotency i
+            USING expired e
+            WHERE i.kind = e.kind
+              AND i.subject = lower(e.subject)
+              AND i.slot_ts = e.slot_ts
+        )
+        -- Always one row, carrying the expired count even when no slot was freed
+        SELECT counted.expired, freed.*
+        FROM (SELECT count(*) AS expired FROM expired) counted
+        LEFT JOIN (
+            SELECT 'doctor' AS kind, doctor_name AS subject, specialization, slot_ts FROM freed_doctor
+            UNION ALL
+            SELECT 'lab', test_name, NULL, slot_ts FROM freed_lab
+        ) freed ON TRUE;
+        """,
+        (batch_size,),
+    )
+    rows = cur.fetchall()
+    return rows[0][0], [tuple(row[1:]) for row in rows if row[1] is not None]
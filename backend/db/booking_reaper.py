@@ -0,0 +1,89 @@
+"""
+Background task that expires unconfirmed booking holds.
+
+Every BOOKING_REAPER_INTERVAL_SECONDS it calls booking_engine.expire_holds(),
+which marks overdue holds expired and frees their slots in batches of
+BOOKING_REAPER_BATCH_SIZE (one statement per batch, SKIP LOCKED so several
+API instances can reap side by side). Expired idempotency keys are purged on
+the same tick. The database work runs in a thread so the event loop keeps
+serving requests. The reaper only starts when BOOKING_REAPER_ENABLED is on
+and the bookings tables exist (migrations 004 and 005); otherwise it logs
+once and stays off instead of failing every sweep.
+
+Configuration (environment variables):
+    BOOKING_REAPER_ENABLED            "false" never starts the reaper (default true)
+    BOOKING_REAPER_INTERVAL_SECONDS   seconds between sweeps (default 30, 0 disables)
+    BOOKING_REAPER_BATCH_SIZE         holds expired per statement (default 500)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from db import booking_engine
+
+logger = logging.getLogger(__name__)
+
+BOOKING_REAPER_ENABLED = os.getenv("BOOKING_REAPER_ENABLED", "true").lower() in ("1", "true", "yes")
+BOOKING_REAPER_INTERVAL_SECONDS = float(os.getenv("BOOKING_REAPER_INTERVAL_SECONDS", "30"))
+BOOKING_REAPER_BATCH_SIZE = int(os.getenv("BOOKING_REAPER_BATCH_SIZE", "500"))
+
+
+class HoldReaper:
+    def __init__(
+        self,
+        interval: float = BOOKING_REAPER_INTERVAL_SECONDS,
+        batch_size: int = BOOKING_REAPER_BATCH_SIZE,
+        enabled: bool = BOOKING_REAPER_ENABLED,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"sweeps": 0, "holds_expired": 0, "keys_purged": 0, "failed": 0}
+
+    async def start(self) -> None:
+        if self._task is not None or self.interval <= 0 or not self.enabled:
+            return
+        try:
+            ready = await asyncio.to_thread(booking_engine.bookings_schema_ready)
+        except Exception:
+            logger.exception("Booking hold reaper not started: schema check failed")
+            return
+        if not ready:
+            logger.warning("Booking hold reaper not started: apply db/migrations/004 and 005 first")
+            return
+        self._task = asyncio.create_task(self._run(), name="booking-hold-reaper")
+        logger.info(f"Booking hold reaper started (every {self.interval}s, batches of {self.batch_size})")
+
+    async def sweep(self) -> int:
+        """Expire every overdue hold now; returns the number of holds expired."""
+        expired = await asyncio.to_thread(booking_engine.expire_holds, self.batch_size)
+        purged = await asyncio.to_thread(booking_engine.purge_expired_idempotency_keys)
+        self.stats["sweeps"] += 1
+        self.stats["holds_expired"] += expired
+        self.stats["keys_purged"] += purged
+        if expired:
+            logger.info(f"Expired {expired} unconfirmed booking holds")
+        return expired
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception("Booking hold sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info(f"Booking hold reaper stopped: {self.stats}")
+
+
+booking_reaper = HoldReaper()
@@ -0,0 +1,133 @@
+"""
+Background task that keeps conversation checkpoints bounded.
+
+Each graph step writes a checkpoint, but resuming a thread only needs the
+newest one. Request handlers call mark() with the thread that just ran;
+every CHECKPOINT_PRUNE_INTERVAL_SECONDS the pruner compacts the marked
+threads to their newest CHECKPOINT_KEEP_PER_THREAD checkpoints and deletes
+threads idle for more than CHECKPOINT_TTL_SECONDS (in batches of
+CHECKPOINT_PRUNE_BATCH_SIZE threads). Turns of an expiring thread that no
+memory summary covers yet are queued for summarization before the thread
+is deleted, so short conversations still reach the patient's memory. The database work runs in a thread so
+the event loop keeps serving requests. Only the postgres checkpoint backend
+is pruned.
+
+Configuration (environment variables):
+    CHECKPOINT_PRUNE_INTERVAL_SECONDS   seconds between sweeps (default 60, 0 disables)
+    CHECKPOINT_KEEP_PER_THREAD          checkpoints kept per thread (default 1)
+    CHECKPOINT_TTL_SECONDS              idle time after which a thread is deleted (default 86400)
+    CHECKPOINT_PRUNE_BATCH_SIZE         threads per statement (default 500)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional, Set
+
+from db import checkpointer
+from utils.conversation_threads import summarize_expired_thread
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "60"))
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "1"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "86400"))
+CHECKPOINT_PRUNE_BATCH_SIZE = int(os.getenv("CHECKPOINT_PRUNE_BATCH_SIZE", "500"))
+
+
+class CheckpointPruner:
+    def __init__(
+        self,
+        interval: float = CHECKPOINT_PRUNE_INTERVAL_SECONDS,
+        keep: int = CHECKPOINT_KEEP_PER_THREAD,
+        ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+        batch_size: int = CHECKPOINT_PRUNE_BATCH_SIZE,
+    ):
+        self.interval = interval
+        self.keep = max(1, keep)
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = max(1, batch_size)
+        # threads that ran since the last sweep
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"sweeps": 0, "threads_compacted": 0, "checkpoints_removed": 0, "threads_expired": 0, "threads_summarized": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return checkpointer.CHECKPOINT_BACKEND == "postgres"
+
+    def mark(self, thread_id: str) -> None:
+        """Schedule the thread for compaction on the next sweep."""
+        if self.enabled:
+            self._dirty.add(thread_id)
+
+    async def start(self) -> None:
+        if self._task is not None or self.interval <= 0 or not self.enabled:
+            return
+        self._task = asyncio.create_task(self._run(), name="checkpoint-pruner")
+        logger.info(
+            f"Checkpoint pruner started (every {self.interval}s, keeping {self.keep} per thread, "
+            f"TTL {self.ttl_seconds}s)"
+        )
+
+    async def sweep(self) -> int:
+        """Compact the threads that ran and delete expired ones now; returns the checkpoints removed."""
+        dirty = list(self._dirty)
+        self._dirty.clear()
+        removed = 0
+        try:
+            for start in range(0, len(dirty), self.batch_size):
+                batch = dirty[start:start + self.batch_size]
+                removed += await asyncio.to_thread(checkpointer.compact_threads, batch, self.keep)
+        except Exception:
+            # Compact them again next time
+            self._dirty.update(dirty)
+            raise
+        expired = await self._expire()
+        self.stats["sweeps"] += 1
+        self.stats["threads_compacted"] += len(dirty)
+        self.stats["checkpoints_removed"] += removed
+        self.stats["threads_expired"] += expired
+        if expired:
+            logger.info(f"Deleted {expired} conversation threads idle for more than {self.ttl_seconds}s")
+        return removed
+
+    async def _expire(self) -> int:
+        """Summarize and delete expired threads, batch by batch; returns threads removed."""
+        serde = checkpointer.get_checkpointer().serde
+        expired = 0
+        while True:
+            rows = await asyncio.to_thread(checkpointer.expired_threads, self.ttl_seconds, self.batch_size)
+            for thread_id, type_, payload in rows:
+                values = serde.loads_typed((type_, payload)).get("channel_values", {})
+                if await summarize_expired_thread(values):
+                    self.stats["threads_summarized"] += 1
+            await asyncio.to_thread(checkpointer.delete_expired_threads, [row[0] for row in rows], self.ttl_seconds)
+            expired += len(rows)
+            if len(rows) < self.batch_size:
+                return expired
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception("Checkpoint prune sweep failed")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Compact what ran since the last sweep while the database pool is still open
+        try:
+            await self.sweep()
+        except Exception:
+            logger.exception("Final checkpoint prune sweep failed")
+        logger.info(f"Checkpoint pruner stopped: {self.stats}")
+
+
+checkpoint_pruner = CheckpointPruner()
@@ -0,0 +1,138 @@
+"""
+Checkpointer selection and storage maintenance for conversation threads.
+
+The top-level graph is compiled with get_checkpointer(), so every run on a
+thread_id resumes from the thread's latest checkpoint (see
+utils/conversation_threads.py). The postgres backend is
+db.postgres_checkpointer.PostgresCheckpointSaver, imported only when it is
+selected, so the default stateless setup does not load it.
+
+Storage is bounded by the pruner (db/checkpoint_pruner.py): compact_threads()
+keeps only the newest checkpoints of the threads that ran, and
+expired_threads() / delete_expired_threads() find and remove threads idle
+longer than the TTL. These only run SQL against graph_checkpoints and
+graph_checkpoint_writes.
+
+Backend selection (environment variables):
+    CHECKPOINT_BACKEND   none (default) | postgres | memory
+                         none runs every turn statelessly; postgres needs
+                         migration 006; memory keeps checkpoints in process
+                         (development only, never pruned)
+"""
+
+import os
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from db.connection_pool import get_connection
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "none").lower()
+CHECKPOINT_BACKENDS = ("postgres", "memory", "none")
+
+
+def compact_threads(thread_ids: Sequence[str], keep: int = 1) -> int:
+    """Delete all but the newest `keep` checkpoints of each thread, and orphaned writes; returns checkpoints removed."""
+    thread_ids = list(thread_ids)
+    if not thread_ids:
+        return 0
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM graph_checkpoints c
+            USING (
+                SELECT thread_id, checkpoint_ns, checkpoint_id,
+                       row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position
+                FROM graph_checkpoints
+                WHERE thread_id = ANY(%s)
+            ) ranked
+            WHERE ranked.position > %s
+              AND c.thread_id = ranked.thread_id
+              AND c.checkpoint_ns = ranked.checkpoint_ns
+              AND c.checkpoint_id = ranked.checkpoint_id;
+            """,
+            (thread_ids, max(1, keep)),
+        )
+        removed = cur.rowcount
+        _delete_orphaned_writes(cur, thread_ids)
+        conn.commit()
+    return removed
+
+
+def expired_threads(ttl_seconds: float, limit: int = 500) -> List[Tuple[str, str, bytes]]:
+    """
+    Threads whose newest checkpoint is older than the TTL, as
+    (thread_id, type, checkpoint) of their newest top-level checkpoint.
+    """
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT DISTINCT ON (c.thread_id) c.thread_id, c.type, c.checkpoint
+            FROM graph_checkpoints c
+            JOIN (
+                SELECT thread_id
+                FROM graph_checkpoints
+                GROUP BY thread_id
+                HAVING max(created_at) < NOW() - make_interval(secs => %s)
+                LIMIT %s
+            ) expired ON expired.thread_id = c.thread_id
+            ORDER BY c.thread_id, c.checkpoint_ns = '' DESC, c.checkpoint_id DESC;
+            """,
+            (ttl_seconds, limit),
+        )
+        rows = [(thread_id, type_, bytes(checkpoint)) for thread_id, type_, checkpoint in cur.fetchall()]
+        conn.commit()
+    return rows
+
+
+def delete_expired_threads(thread_ids: Sequence[str], ttl_seconds: float) -> int:
+    """Delete the given threads' checkpoints that are older than the TTL, and orphaned writes; returns checkpoints removed."""
+    thread_ids = list(thread_ids)
+    if not thread_ids:
+        return 0
+    with get_connection() as conn, conn.cursor() as cur:
+        # Re-check the age so a thread resumed since expired_threads() keeps its new checkpoints
+        cur.execute(
+            """
+            DELETE FROM graph_checkpoints
+            WHERE thread_id = ANY(%s) AND created_at < NOW() - make_interval(secs => %s);
+            """,
+            (thread_ids, ttl_seconds),
+        )
+        removed = cur.rowcount
+        _delete_orphaned_writes(cur, thread_ids)
+        conn.commit()
+    return removed
+
+
+def _delete_orphaned_writes(cur, thread_ids: List[str]) -> None:
+    cur.execute(
+        """
+        DELETE FROM graph_checkpoint_writes w
+        WHERE w.thread_id = ANY(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM graph_checkpoints c
+              WHERE c.thread_id = w.thread_id
+                AND c.checkpoint_ns = w.checkpoint_ns
+                AND c.checkpoint_id = w.checkpoint_id
+          );
+        """,
+        (thread_ids,),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """The process-wide checkpointer configured by CHECKPOINT_BACKEND, or None when checkpointing is off."""
+    if CHECKPOINT_BACKEND not in CHECKPOINT_BACKENDS:
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND '{CHECKPOINT_BACKEND}'. Use one of {CHECKPOINT_BACKENDS}.")
+    if CHECKPOINT_BACKEND == "postgres":
+        from db.postgres_checkpointer import PostgresCheckpointSaver
+
+        return PostgresCheckpointSaver()
+    if CHECKPOINT_BACKEND == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    return None
@@ -0,0 +1,275 @@
+"""
+Managed PostgreSQL connection pool shared by every toolkit tool.
+
+Connections are opened once and borrowed per tool call, so a chat turn with
+several tool calls does not pay a TCP+TLS handshake for each one and the
+number of Supabase connection slots in use stays bounded.
+
+Configuration (environment variables):
+    POSTGRE_POOL_MIN_SIZE                connections opened up front (default 1)
+    POSTGRE_POOL_MAX_SIZE                hard upper bound on connections; returned
+                                         connections stay open up to this size (default 10)
+    POSTGRE_POOL_ACQUIRE_TIMEOUT         seconds to wait for a free connection (default 10)
+    POSTGRE_POOL_HEALTH_CHECK_INTERVAL   idle seconds after which a connection is
+                                         pinged before reuse (default 30)
+
+Every idle connection handed out is pinged first when it has been idle for
+longer than the health-check interval; a new connection has just completed
+its handshake and is handed out as is.
+
+With tracing on (utils.tracing), each checkout is a db.connection span with
+its wait time and each statement a db.query span with its row count.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from db.db_connection import connection_params
+from utils.tracing import span, tracer
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes free within the acquire timeout."""
+
+
+class TracedCursor(psycopg2.extensions.cursor):
+    """Cursor that records every statement as a db.query span."""
+
+    def execute(self, query, vars=None):
+        if not tracer.enabled:
+            return super().execute(query, vars)
+        statement = query if isinstance(query, str) else str(query)
+        with span("db.query", statement=" ".join(statement.split())[:200]) as current:
+            result = super().execute(query, vars)
+            current.set("rows", self.rowcount)
+            return result
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+        **connect_kwargs: Any,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._connect_kwargs = connect_kwargs
+        # One slot per connection that may be open; waiting on it is the bounded acquire wait
+        self._slots = threading.BoundedSemaphore(max_size)
+        # Idle connections, most recently returned last; _open counts idle and borrowed ones
+        self._idle: Deque[Any] = deque()
+        self._open = 0
+        self._closed = False
+        self._last_used: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {
+            "acquired": 0,
+            "released": 0,
+            "in_use": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "wait_seconds_total": 0.0,
+        }
+        for _ in range(min_size):
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        self._last_used[conn] = time.monotonic()
+        with self._lock:
+            self._open += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        if not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+        self._last_used.pop(conn, None)
+        with self._lock:
+            self._open -= 1
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(conn)
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        """An idle connection that passes the health check, else a new one; the caller holds a slot."""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._is_healthy(conn):
+                return conn
+            # After a database restart every idle connection may be dead; try the next one
+            logger.warning("Discarding unhealthy pooled connection")
+            self._discard(conn)
+            with self._lock:
+                self._stats["discarded"] += 1
+
+    def _checkin(self, conn) -> None:
+        if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+        if conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        self._last_used[conn] = time.monotonic()
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Borrow a connection; it is rolled back if left mid-transaction and returned on exit."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+
+        with span("db.connection") as current:
+            with self._borrow(timeout) as (conn, waited):
+                current.set("wait_ms", round(waited * 1000, 3))
+                yield conn
+
+    @contextmanager
+    def _borrow(self, timeout: float) -> Iterator[Tuple[Any, float]]:
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(
+                f"Timed out after {timeout}s waiting for a database connection "
+                f"(max pool size {self.max_size})"
+            )
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["in_use"] += 1
+            self._stats["wait_seconds_total"] += waited
+
+        try:
+            yield conn, waited
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            raise
+        finally:
+            # Rolls back any open transaction and drops broken connections
+            self._checkin(conn)
+            with self._lock:
+                self._stats["released"] += 1
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(
+                {
+                    "min_size": self.min_size,
+                    "max_size": self.max_size,
+                    "open": self._open,
+                    "idle": len(self._idle),
+                }
+            )
+        return snapshot
+
+    def close(self) -> None:
+        """Close the idle connections; borrowed ones are closed when they come back."""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    min_size=int(os.getenv("POSTGRE_POOL_MIN_SIZE", "1")),
+                    max_size=int(os.getenv("POSTGRE_POOL_MAX_SIZE", "10")),
+                    acquire_timeout=float(os.getenv("POSTGRE_POOL_ACQUIRE_TIMEOUT", "10")),
+                    health_check_interval=float(os.getenv("POSTGRE_POOL_HEALTH_CHECK_INTERVAL", "30")),
+                    cursor_factory=TracedCursor,
+                    **connection_params(),
+                )
+                logger.info(f"PostgreSQL pool initialised: {_pool.stats()}")
+    return _pool
+
+
+@contextmanager
+def get_connection(timeout: Optional[float] = None) -> Iterator[Any]:
+    """Borrow a connection from the process-wide pool."""
+    with get_pool().connection(timeout=timeout) as conn:
+        yield conn
+
+
+def pool_stats() -> Dict[str, Any]:
+    if _pool is None:
+        return {"initialised": False}
+    return {"initialised": True, **_pool.stats()}
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
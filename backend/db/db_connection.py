@@ -2,18 +2,26 @@ import psycopg2
 import os
 from dotenv import load_dotenv
 
+load_dotenv()
 
-def connect_to_db():
+
+def connection_params():
     """
-    Creates and returns a connection to Supabase PostgreSQL.
+    Returns the Supabase PostgreSQL connection parameters.
     Reads credentials from environment variables.
     """
-    load_dotenv()
+    return {
+        "host": os.getenv("POSTGRE_HOST"),
+        "database": os.getenv("POSTGRE_DB_NAME"),
+        "user": os.getenv("POSTGRE_DB_USER"),
+        "password": os.getenv("POSTGRE_PASSWORD"),
+        "port": os.getenv("POSTGRE_PORT"),
+    }
+
 
-    return psycopg2.connect(
-        host=os.getenv("POSTGRE_HOST"),
-        database=os.getenv("POSTGRE_DB_NAME"),
-        user=os.getenv("POSTGRE_DB_USER"),
-        password=os.getenv("POSTGRE_PASSWORD"),
-        port=os.getenv("POSTGRE_PORT")
-    )
+def connect_to_db():
+    """
+    Creates and returns a standalone connection to Supabase PostgreSQL.
+    Request-path code should borrow from db.connection_pool instead.
+    """
+    return psycopg2.connect(**connection_params())
@@ -0,0 +1,66 @@
+-- Native slot timestamps for doctor_appointments and lab_tests.
+--
+-- date_slot is stored as 'DD-MM-YYYY HH24:MI' text, so every availability
+-- query had to run TO_TIMESTAMP() on each row and could not use an index.
+-- This migration adds:
+--   slot_ts    timestamp, backfilled from date_slot and kept in sync by a trigger
+--   slot_date  date, generated from slot_ts
+-- plus composite indexes matching the toolkit queries.
+--
+-- Run once:  psql -d <database> -f db/migrations/001_slot_timestamps.sql
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION sync_slot_ts() RETURNS trigger AS $$
+BEGIN
+    IF NEW.date_slot IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.date_slot IS DISTINCT FROM OLD.date_slot) THEN
+        NEW.slot_ts := TO_TIMESTAMP(NEW.date_slot, 'DD-MM-YYYY HH24:MI')::timestamp;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- doctor_appointments
+ALTER TABLE doctor_appointments ADD COLUMN IF NOT EXISTS slot_ts timestamp;
+UPDATE doctor_appointments
+SET slot_ts = TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI')::timestamp
+WHERE slot_ts IS NULL;
+ALTER TABLE doctor_appointments ALTER COLUMN slot_ts SET NOT NULL;
+ALTER TABLE doctor_appointments
+    ADD COLUMN IF NOT EXISTS slot_date date GENERATED ALWAYS AS (slot_ts::date) STORED;
+
+DROP TRIGGER IF EXISTS doctor_appointments_sync_slot_ts ON doctor_appointments;
+CREATE TRIGGER doctor_appointments_sync_slot_ts
+    BEFORE INSERT OR UPDATE OF date_slot ON doctor_appointments
+    FOR EACH ROW EXECUTE FUNCTION sync_slot_ts();
+
+CREATE INDEX IF NOT EXISTS idx_doctor_appointments_doctor_date
+    ON doctor_appointments (doctor_name, slot_date, is_available);
+CREATE INDEX IF NOT EXISTS idx_doctor_appointments_specialization_date
+    ON doctor_appointments (specialization, slot_date, is_available);
+
+-- lab_tests
+ALTER TABLE lab_tests ADD COLUMN IF NOT EXISTS slot_ts timestamp;
+UPDATE lab_tests
+SET slot_ts = TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI')::timestamp
+WHERE slot_ts IS NULL;
+ALTER TABLE lab_tests ALTER COLUMN slot_ts SET NOT NULL;
+ALTER TABLE lab_tests
+    ADD COLUMN IF NOT EXISTS slot_date date GENERATED ALWAYS AS (slot_ts::date) STORED;
+
+DROP TRIGGER IF EXISTS lab_tests_sync_slot_ts ON lab_tests;
+CREATE TRIGGER lab_tests_sync_slot_ts
+    BEFORE INSERT OR UPDATE OF date_slot ON lab_tests
+    FOR EACH ROW EXECUTE FUNCTION sync_slot_ts();
+
+-- Test names are matched case-insensitively, so the index is on lower(test_name)
+CREATE INDEX IF NOT EXISTS idx_lab_tests_test_date
+    ON lab_tests (lower(test_name), slot_date, is_available);
+CREATE INDEX IF NOT EXISTS idx_lab_tests_date
+    ON lab_tests (slot_date, is_available);
+
+ANALYZE doctor_appointments;
+ANALYZE lab_tests;
+
+COMMIT;
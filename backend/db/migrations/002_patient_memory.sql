@@ -0,0 +1,17 @@
+-- Per-patient conversation memory for MEMORY_BACKEND=postgres.
+--
+-- version is bumped on every write; writers only update the row if the
+-- version they read is still current (optimistic concurrency).
+--
+-- Run once:  psql -d <database> -f db/migrations/002_patient_memory.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS patient_memory (
+    patient_id  bigint PRIMARY KEY,
+    record      jsonb NOT NULL DEFAULT '{}'::jsonb,
+    version     bigint NOT NULL DEFAULT 1,
+    updated_at  timestamptz NOT NULL DEFAULT NOW()
+);
+
+COMMIT;
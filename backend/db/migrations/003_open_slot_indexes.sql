@@ -0,0 +1,26 @@
+-- Partial indexes over open slots, ordered by slot_ts.
+--
+-- The range availability tools ask for "the N earliest open slots of X
+-- between two dates (optionally within a time-of-day window)". With these
+-- indexes Postgres walks X's open slots in slot_ts order from the start of
+-- the range and stops after N matches, instead of collecting every slot of
+-- every day in the range and sorting it.
+--
+-- Run once (after 001):  psql -d <database> -f db/migrations/003_open_slot_indexes.sql
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_doctor_appointments_doctor_open_ts
+    ON doctor_appointments (doctor_name, slot_ts)
+    WHERE is_available = TRUE;
+CREATE INDEX IF NOT EXISTS idx_doctor_appointments_specialization_open_ts
+    ON doctor_appointments (specialization, slot_ts)
+    WHERE is_available = TRUE;
+CREATE INDEX IF NOT EXISTS idx_lab_tests_test_open_ts
+    ON lab_tests (lower(test_name), slot_ts)
+    WHERE is_available = TRUE;
+
+ANALYZE doctor_appointments;
+ANALYZE lab_tests;
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- Idempotency keys for the booking tools (db/booking_engine.py).
+--
+-- A booking claims its key in the same transaction as the slot UPDATE and
+-- stores the result it returned. A retried tool call with the same key (an
+-- LLM repeating set_appointment, a client resubmitting) gets that result
+-- back instead of booking again; a concurrent duplicate blocks on the key's
+-- primary key until the first attempt commits or rolls back. Keys are
+-- removed when their slot is released and expire after
+-- BOOKING_IDEMPOTENCY_TTL_SECONDS.
+--
+-- Run once:  psql -d <database> -f db/migrations/004_booking_idempotency.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS booking_idempotency (
+    idempotency_key  text PRIMARY KEY,
+    kind             text NOT NULL,
+    subject          text NOT NULL,
+    slot_ts          timestamp NOT NULL,
+    patient_id       bigint NOT NULL,
+    result           jsonb,
+    created_at       timestamptz NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_booking_idempotency_slot
+    ON booking_idempotency (kind, subject, slot_ts);
+CREATE INDEX IF NOT EXISTS idx_booking_idempotency_created_at
+    ON booking_idempotency (created_at);
+
+COMMIT;
@@ -0,0 +1,38 @@
+-- Persisted bookings with a hold -> confirmed -> paid lifecycle.
+--
+-- A booking request takes the slot and records a 'held' booking that
+-- expires at hold_expires_at unless the patient confirms it. The reaper
+-- (db/booking_reaper.py) expires overdue holds in batches and frees their
+-- slots, so abandoned chats do not keep slots out of inventory.
+-- Direct bookings (set_appointment) are recorded as 'confirmed'.
+--
+-- At most one live (held / confirmed / paid) booking can exist per slot.
+--
+-- Run once (after 004):  psql -d <database> -f db/migrations/005_bookings.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_reference  text PRIMARY KEY,
+    kind               text NOT NULL CHECK (kind IN ('doctor', 'lab')),
+    subject            text NOT NULL,
+    slot_ts            timestamp NOT NULL,
+    patient_id         bigint NOT NULL,
+    status             text NOT NULL CHECK (status IN ('held', 'confirmed', 'paid', 'cancelled', 'expired')),
+    amount             numeric,
+    hold_expires_at    timestamptz,
+    created_at         timestamptz NOT NULL DEFAULT NOW(),
+    updated_at         timestamptz NOT NULL DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_live_slot
+    ON bookings (kind, subject, slot_ts)
+    WHERE status IN ('held', 'confirmed', 'paid');
+-- The reaper walks only the holds, oldest expiry first
+CREATE INDEX IF NOT EXISTS idx_bookings_hold_expiry
+    ON bookings (hold_expires_at)
+    WHERE status = 'held';
+CREATE INDEX IF NOT EXISTS idx_bookings_patient
+    ON bookings (patient_id, created_at);
+
+COMMIT;
@@ -0,0 +1,42 @@
+-- LangGraph checkpoints for server-side conversation threads
+-- (db/postgres_checkpointer.py, CHECKPOINT_BACKEND=postgres).
+--
+-- One row per checkpoint holds the serialized graph state of a thread after
+-- a step; graph_checkpoint_writes holds the pending writes of steps that did
+-- not finish. The pruner (db/checkpoint_pruner.py) compacts each thread to
+-- its latest checkpoints and deletes threads idle longer than the TTL.
+--
+-- Run once (after 005):  psql -d <database> -f db/migrations/006_graph_checkpoints.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS graph_checkpoints (
+    thread_id             text NOT NULL,
+    checkpoint_ns         text NOT NULL DEFAULT '',
+    checkpoint_id         text NOT NULL,
+    parent_checkpoint_id  text,
+    type                  text NOT NULL,
+    checkpoint            bytea NOT NULL,
+    metadata              jsonb NOT NULL DEFAULT '{}'::jsonb,
+    created_at            timestamptz NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+-- TTL sweeps look for threads whose newest checkpoint is old
+CREATE INDEX IF NOT EXISTS idx_graph_checkpoints_thread_created
+    ON graph_checkpoints (thread_id, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS graph_checkpoint_writes (
+    thread_id      text NOT NULL,
+    checkpoint_ns  text NOT NULL DEFAULT '',
+    checkpoint_id  text NOT NULL,
+    task_id        text NOT NULL,
+    idx            integer NOT NULL,
+    channel        text NOT NULL,
+    type           text NOT NULL,
+    value          bytea NOT NULL,
+    task_path      text NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+
+COMMIT;
@@ -0,0 +1,429 @@
+"""
+LangGraph checkpoint saver backed by the shared PostgreSQL pool
+(CHECKPOINT_BACKEND=postgres, see db/checkpointer.py).
+
+langgraph-checkpoint-postgres needs psycopg 3, so this saver implements the
+same contract on psycopg2 and db.connection_pool: each checkpoint is one row
+of graph_checkpoints holding the serialized state
+(db/migrations/006_graph_checkpoints.sql), and unfinished steps keep their
+pending writes in graph_checkpoint_writes. Metadata is stored as JSONB
+without the step's node outputs, which the state already contains.
+
+LangGraph saves a checkpoint after every step, but a thread is only ever
+resumed from where its last turn ended. Inside deferred(thread_id), used by
+utils.conversation_threads.thread_turn, the thread's checkpoints and writes
+are kept in memory and only the newest are written when the turn ends, in
+one transaction, so a turn costs one round trip instead of one per step. A
+turn that dies with the process is lost, like its unanswered request.
+"""
+
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from psycopg2.extras import Json
+
+from db.connection_pool import get_connection
+
+# Run configuration that LangGraph tracks itself and never belongs in checkpoint metadata
+_EXCLUDED_METADATA_KEYS = {
+    "thread_id", "checkpoint_id", "checkpoint_ns", "checkpoint_map",
+    "langgraph_step", "langgraph_node", "langgraph_triggers", "langgraph_path", "langgraph_checkpoint_ns",
+}
+
+
+def _json(value: Any) -> Json:
+    return Json(value, dumps=lambda obj: json.dumps(obj, default=str))
+
+
+def _strip_nul(value: Any) -> Any:
+    # JSONB rejects NUL characters
+    return value.replace("\u0000", "") if isinstance(value, str) else value
+
+
+def _checkpoint_metadata(config: RunnableConfig, metadata: CheckpointMetadata) -> Dict[str, Any]:
+    """
+    The step's metadata plus the run's scalar config and metadata values,
+    without the node outputs under "writes". Built here rather than with
+    langgraph's helper, which the pinned langgraph-checkpoint does not have.
+    """
+    result = {key: _strip_nul(value) for key, value in metadata.items() if key != "writes"}
+    for source in (config.get("metadata"), config.get("configurable")):
+        for key, value in (source or {}).items():
+            if key in result or key in _EXCLUDED_METADATA_KEYS or key.startswith("__"):
+                continue
+            if isinstance(value, (str, int, float, bool)):
+                result[key] = _strip_nul(value)
+    return result
+
+
+class PostgresCheckpointSaver(BaseCheckpointSaver):
+    """Checkpoints in graph_checkpoints / graph_checkpoint_writes, one serialized row per checkpoint."""
+
+    def __init__(self, serde=None):
+        super().__init__(serde=serde)
+        # thread id -> checkpoint_ns -> newest unwritten checkpoint row, its writes and
+        # the parent it will be written with; a key exists while the thread is deferred
+        self._deferred: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._deferred_lock = threading.Lock()
+
+    def _thread(self, config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _pending_writes(self, cur, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        cur.execute(
+            """
+            SELECT task_id, channel, type, value
+            FROM graph_checkpoint_writes
+            WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id = %s
+            ORDER BY task_id, idx;
+            """,
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, bytes(value))))
+            for task_id, channel, type_, value in cur.fetchall()
+        ]
+
+    def _tuple(self, cur, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, bytes(checkpoint))),
+            metadata=metadata or {},
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._pending_writes(cur, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def _pending_tuple(self, pending: Dict[str, Any]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = pending["row"]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for (task_id, _), (channel, type_, value, _) in sorted(pending["writes"].items())
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """The checkpoint named by the config, or the thread's latest one."""
+        thread_id, checkpoint_ns = self._thread(config)
+        checkpoint_id = get_checkpoint_id(config)
+        with self._deferred_lock:
+            pending = self._deferred.get(thread_id, {}).get(checkpoint_ns)
+        if pending and checkpoint_id in (None, pending["row"][2]):
+            return self._pending_tuple(pending)
+
+        with get_connection() as conn, conn.cursor() as cur:
+            if checkpoint_id:
+                cur.execute(
+                    """
+                    SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata
+                    FROM graph_checkpoints
+                    WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id = %s;
+                    """,
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cur.execute(
+                    """
+                    SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata
+                    FROM graph_checkpoints
+                    WHERE thread_id = %s AND checkpoint_ns = %s
+                    ORDER BY checkpoint_id DESC
+                    LIMIT 1;
+                    """,
+                    (thread_id, checkpoint_ns),
+                )
+            row = cur.fetchone()
+            result = self._tuple(cur, row) if row else None
+            conn.commit()
+        return result
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Checkpoints matching the config, metadata filter and `before` bound, newest first."""
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = %s")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = %s")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = %s")
+                params.append(checkpoint_id)
+        if filter:
+            clauses.append("metadata @> %s")
+            params.append(_json(filter))
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < %s")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit_sql = "LIMIT %s" if limit is not None else ""
+        if limit is not None:
+            params.append(limit)
+
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata
+                FROM graph_checkpoints
+                {where}
+                ORDER BY checkpoint_id DESC
+                {limit_sql};
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+            results = [self._tuple(cur, row) for row in rows]
+            conn.commit()
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id, checkpoint_ns = self._thread(config)
+        type_, payload = self.serde.dumps_typed(checkpoint)
+        row = (
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            payload,
+            _checkpoint_metadata(config, metadata),
+        )
+        with self._deferred_lock:
+            pending = self._deferred.get(thread_id)
+            if pending is not None:
+                previous = pending.get(checkpoint_ns)
+                # Skipped checkpoints are never written, so the newest one hangs off the last written one
+                parent = previous["parent"] if previous else row[3]
+                pending[checkpoint_ns] = {"row": row, "parent": parent, "writes": {}}
+                row = None
+        if row is not None:
+            with get_connection() as conn, conn.cursor() as cur:
+                _insert_checkpoint(cur, row)
+                conn.commit()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not writes:
+            return
+        thread_id, checkpoint_ns = self._thread(config)
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) have fixed negative indexes and replace earlier ones
+        upsert = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        conflict = _UPSERT_WRITES if upsert else "DO NOTHING"
+        rows = []
+        for index, (channel, value) in enumerate(writes):
+            type_, payload = self.serde.dumps_typed(value)
+            rows.append((task_id, WRITES_IDX_MAP.get(channel, index), channel, type_, payload, task_path))
+
+        with self._deferred_lock:
+            pending = self._deferred.get(thread_id, {}).get(checkpoint_ns)
+            if pending and pending["row"][2] == checkpoint_id:
+                for task_id_, index, channel, type_, payload, task_path_ in rows:
+                    if upsert or (task_id_, index) not in pending["writes"]:
+                        pending["writes"][(task_id_, index)] = (channel, type_, payload, task_path_)
+                return
+
+        with get_connection() as conn, conn.cursor() as cur:
+            _insert_writes(cur, thread_id, checkpoint_ns, checkpoint_id, rows, conflict)
+            conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM graph_checkpoint_writes WHERE thread_id = %s;", (thread_id,))
+            cur.execute("DELETE FROM graph_checkpoints WHERE thread_id = %s;", (thread_id,))
+            conn.commit()
+
+    def flush(self, thread_id: str) -> None:
+        """Write the thread's newest deferred checkpoint and its pending writes, in one transaction."""
+        with self._deferred_lock:
+            pending = self._deferred.get(thread_id)
+            if pending is not None:
+                self._deferred[thread_id] = {}
+        if not pending:
+            return
+        with get_connection() as conn, conn.cursor() as cur:
+            for entry in pending.values():
+                row = entry["row"]
+                _insert_checkpoint(cur, row[:3] + (entry["parent"],) + row[4:])
+                writes = [(task_id, index) + value for (task_id, index), value in entry["writes"].items()]
+                if writes:
+                    _insert_writes(cur, row[0], row[1], row[2], writes, _UPSERT_WRITES)
+            conn.commit()
+
+    @asynccontextmanager
+    async def deferred(self, thread_id: str) -> AsyncIterator[None]:
+        """Keep the thread's checkpoints in memory until the block ends, then write the newest one."""
+        with self._deferred_lock:
+            if thread_id in self._deferred:
+                raise RuntimeError(f"Checkpoints of thread '{thread_id}' are already deferred")
+            self._deferred[thread_id] = {}
+        try:
+            yield
+        finally:
+            try:
+                await asyncio.to_thread(self.flush, thread_id)
+            finally:
+                with self._deferred_lock:
+                    self._deferred.pop(thread_id, None)
+
+    def _is_deferred(self, config: RunnableConfig) -> bool:
+        return config["configurable"]["thread_id"] in self._deferred
+
+    # The pool is synchronous; async callers run the statements in a worker thread.
+    # Deferred threads only touch memory, so their calls run inline.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self._is_deferred(config):
+            with self._deferred_lock:
+                pending = self._deferred.get(config["configurable"]["thread_id"], {})
+            if config["configurable"].get("checkpoint_ns", "") in pending:
+                return self.get_tuple(config)
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for result in results:
+            yield result
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        if self._is_deferred(config):
+            return self.put(config, checkpoint, metadata, new_versions)
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if self._is_deferred(config):
+            return self.put_writes(config, writes, task_id, task_path)
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_UPSERT_WRITES = "DO UPDATE SET channel = EXCLUDED.channel, type = EXCLUDED.type, value = EXCLUDED.value"
+
+
+def _insert_checkpoint(cur, row: tuple) -> None:
+    thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, payload, metadata = row
+    cur.execute(
+        """
+        INSERT INTO graph_checkpoints
+            (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id)
+        DO UPDATE SET checkpoint = EXCLUDED.checkpoint, type = EXCLUDED.type, metadata = EXCLUDED.metadata;
+        """,
+        (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, psycopg2.Binary(payload), _json(metadata)),
+    )
+
+
+def _insert_writes(cur, thread_id: str, checkpoint_ns: str, checkpoint_id: str, rows: List[tuple], conflict: str) -> None:
+    """rows are (task_id, idx, channel, type, value, task_path)."""
+    cur.executemany(
+        f"""
+        INSERT INTO graph_checkpoint_writes
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) {conflict};
+        """,
+        [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, index, channel, type_, psycopg2.Binary(value), task_path)
+            for task_id, index, channel, type_, value, task_path in rows
+        ],
+    )
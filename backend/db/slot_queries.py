@@ -0,0 +1,361 @@
+"""
+Slot queries for doctor_appointments and lab_tests.
+
+All lookups filter on the native slot_ts / slot_date columns added by
+db/migrations/001_slot_timestamps.sql, so they are served by the composite
+(doctor_name | specialization | lower(test_name), slot_date, is_available)
+indexes instead of re-parsing the text date_slot on every row.
+
+Range lookups (fetch_*_range_slots) and next-available lookups
+(fetch_next_*_slots) bound slot_ts and stop after `limit` rows, walking the
+partial open-slot indexes of db/migrations/003_open_slot_indexes.sql in
+slot_ts order.
+
+Every function takes an open cursor so callers control the connection and
+transaction.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+SLOT_DATE_FORMAT = "%d-%m-%Y"
+SLOT_DATETIME_FORMAT = "%d-%m-%Y %H:%M"
+
+
+def parse_slot_date(value: str) -> date:
+    """Parse a 'DD-MM-YYYY' string as used by DateModel."""
+    return datetime.strptime(value, SLOT_DATE_FORMAT).date()
+
+
+def parse_slot_datetime(value: str) -> datetime:
+    """Parse a 'DD-MM-YYYY HH:MM' string as used by DateTimeModel."""
+    return datetime.strptime(value, SLOT_DATETIME_FORMAT)
+
+
+def parse_slot_time(value: Optional[str]) -> Optional[time]:
+    """Parse an 'HH:MM' string as used by TimeWindowModel."""
+    return datetime.strptime(value, "%H:%M").time() if value else None
+
+
+def _range_bounds(start_day: date, end_day: date) -> Tuple[datetime, datetime]:
+    # Half-open [start 00:00, day after end 00:00) so the slot_ts index bounds the scan
+    return datetime.combine(start_day, time.min), datetime.combine(end_day + timedelta(days=1), time.min)
+
+
+# Time-of-day filter shared by the range queries; NULL bounds disable it
+_TIME_WINDOW = """
+          AND (%(start_time)s::time IS NULL OR slot_ts::time >= %(start_time)s::time)
+          AND (%(end_time)s::time IS NULL OR slot_ts::time <= %(end_time)s::time)
+"""
+
+
+def _range_params(key: str, value, start_day, end_day, start_time, end_time, limit) -> dict:
+    start_ts, end_ts = _range_bounds(start_day, end_day)
+    return {
+        key: value,
+        "start_ts": start_ts,
+        "end_ts": end_ts,
+        "start_time": start_time,
+        "end_time": end_time,
+        "limit": limit,
+    }
+
+
+# Doctor appointments
+
+
+def fetch_doctor_day_slots(cur, doctor_name: str, day: date) -> List[Tuple[datetime, float]]:
+    """Open slots for one doctor on one day as (slot_ts, consultation_fee)."""
+    cur.execute(
+        """
+        SELECT slot_ts, consultation_fee
+        FROM doctor_appointments
+        WHERE doctor_name = %s
+          AND slot_date = %s
+          AND is_available = TRUE
+        ORDER BY slot_ts;
+        """,
+        (doctor_name, day),
+    )
+    return cur.fetchall()
+
+
+def fetch_specialization_day_slots(cur, specialization: str, day: date) -> List[Tuple[str, datetime, float]]:
+    """Open slots for a specialization on one day as (doctor_name, slot_ts, consultation_fee)."""
+    cur.execute(
+        """
+        SELECT doctor_name, slot_ts, consultation_fee
+        FROM doctor_appointments
+        WHERE specialization = %s
+          AND slot_date = %s
+          AND is_available = TRUE
+        ORDER BY doctor_name, slot_ts;
+        """,
+        (specialization, day),
+    )
+    return cur.fetchall()
+
+
+def fetch_doctor_range_slots(
+    cur,
+    doctor_name: str,
+    start_day: date,
+    end_day: date,
+    start_time: Optional[time] = None,
+    end_time: Optional[time] = None,
+    limit: int = 20,
+) -> List[Tuple[datetime, float]]:
+    """Earliest open slots for one doctor between two days (inclusive) as (slot_ts, consultation_fee)."""
+    cur.execute(
+        """
+        SELECT slot_ts, consultation_fee
+        FROM doctor_appointments
+        WHERE doctor_name = %(doctor_name)s
+          AND is_available = TRUE
+          AND slot_ts >= %(start_ts)s
+          AND slot_ts < %(end_ts)s
+        """
+        + _TIME_WINDOW
+        + """
+        ORDER BY slot_ts
+        LIMIT %(limit)s;
+        """,
+        _range_params("doctor_name", doctor_name, start_day, end_day, start_time, end_time, limit),
+    )
+    return cur.fetchall()
+
+
+def fetch_specialization_range_slots(
+    cur,
+    specialization: str,
+    start_day: date,
+    end_day: date,
+    start_time: Optional[time] = None,
+    end_time: Optional[time] = None,
+    limit: int = 20,
+) -> List[Tuple[str, datetime, float]]:
+    """Earliest open slots for a specialization between two days as (doctor_name, slot_ts, consultation_fee)."""
+    cur.execute(
+        """
+        SELECT doctor_name, slot_ts, consultation_fee
+        FROM doctor_appointments
+        WHERE specialization = %(specialization)s
+          AND is_available = TRUE
+          AND slot_ts >= %(start_ts)s
+          AND slot_ts < %(end_ts)s
+        """
+        + _TIME_WINDOW
+        + """
+        ORDER BY slot_ts, doctor_name
+        LIMIT %(limit)s;
+        """,
+        _range_params("specialization", specialization, start_day, end_day, start_time, end_time, limit),
+    )
+    return cur.fetchall()
+
+
+def fetch_next_doctor_slots(
+    cur,
+    specialization: str,
+    after: datetime,
+    limit: int = 5,
+    max_fee: Optional[float] = None,
+    preferred_doctor: Optional[str] = None,
+) -> List[Tuple[bool, str, datetime, float]]:
+    """
+    Earliest open slots of a specialization at or after `after`, as
+    (is_preferred, doctor_name, slot_ts, consultation_fee).
+
+    One round trip: the preferred doctor's first `limit` slots (none when
+    preferred_doctor is None) and the specialization's first `limit` slots,
+    each an index-ordered scan that stops at its LIMIT.
+    """
+    cur.execute(
+        """
+        (SELECT TRUE, doctor_name, slot_ts, consultation_fee
+         FROM doctor_appointments
+         WHERE doctor_name = %(preferred_doctor)s
+           AND specialization = %(specialization)s
+           AND is_available = TRUE
+           AND slot_ts >= %(after)s
+           AND (%(max_fee)s::numeric IS NULL OR consultation_fee <= %(max_fee)s::numeric)
+         ORDER BY slot_ts
+         LIMIT %(limit)s)
+        UNION ALL
+        (SELECT FALSE, doctor_name, slot_ts, consultation_fee
+         FROM doctor_appointments
+         WHERE specialization = %(specialization)s
+           AND is_available = TRUE
+           AND slot_ts >= %(after)s
+           AND (%(max_fee)s::numeric IS NULL OR consultation_fee <= %(max_fee)s::numeric)
+         ORDER BY slot_ts
+         LIMIT %(limit)s);
+        """,
+        {
+            "specialization": specialization,
+            "after": after,
+            "limit": limit,
+            "max_fee": max_fee,
+            "preferred_doctor": preferred_doctor,
+        },
+    )
+    return cur.fetchall()
+
+
+def book_doctor_slot(cur, doctor_name: str, slot: datetime, patient_id: int) -> Optional[Tuple[str, float]]:
+    """
+    Atomically take an open slot for the patient; returns (specialization,
+    consultation_fee), or None if the slot was not open.
+
+    The availability check and the write are one statement: a concurrent
+    booking of the same row blocks on its row lock, then re-checks
+    is_available and matches nothing.
+    """
+    cur.execute(
+        """
+        UPDATE doctor_appointments
+        SET is_available = FALSE,
+            patient_to_attend = %s
+        WHERE doctor_name = %s
+          AND slot_date = %s
+          AND slot_ts = %s
+          AND is_available = TRUE
+        RETURNING specialization, consultation_fee;
+        """,
+        (str(patient_id), doctor_name, slot.date(), slot),
+    )
+    return cur.fetchone()
+
+
+def release_doctor_slot(cur, doctor_name: str, slot: datetime, patient_id: int) -> Optional[str]:
+    """Free a slot held by the patient; returns the slot's specialization, or None if nothing was released."""
+    cur.execute(
+        """
+        UPDATE doctor_appointments
+        SET is_available = TRUE,
+            patient_to_attend = NULL
+        WHERE doctor_name = %s
+          AND slot_date = %s
+          AND slot_ts = %s
+          AND patient_to_attend::TEXT = %s
+        RETURNING specialization;
+        """,
+        (doctor_name, slot.date(), slot, str(patient_id)),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+# Lab tests
+
+
+def fetch_lab_day_slots(cur, test_name: Optional[str], day: date) -> List[Tuple[str, datetime, float]]:
+    """Open lab slots on one day as (test_name, slot_ts, price), optionally for one test."""
+    if test_name:
+        cur.execute(
+            """
+            SELECT test_name, slot_ts, price
+            FROM lab_tests
+            WHERE lower(test_name) = lower(%s)
+              AND slot_date = %s
+              AND is_available = TRUE
+            ORDER BY slot_ts;
+            """,
+            (test_name, day),
+        )
+    else:
+        cur.execute(
+            """
+            SELECT test_name, slot_ts, price
+            FROM lab_tests
+            WHERE slot_date = %s
+              AND is_available = TRUE
+            ORDER BY test_name, slot_ts;
+            """,
+            (day,),
+        )
+    return cur.fetchall()
+
+
+def fetch_lab_range_slots(
+    cur,
+    test_name: str,
+    start_day: date,
+    end_day: date,
+    start_time: Optional[time] = None,
+    end_time: Optional[time] = None,
+    limit: int = 20,
+) -> List[Tuple[str, datetime, float]]:
+    """Earliest open slots for one lab test between two days as (test_name, slot_ts, price)."""
+    cur.execute(
+        """
+        SELECT test_name, slot_ts, price
+        FROM lab_tests
+        WHERE lower(test_name) = lower(%(test_name)s)
+          AND is_available = TRUE
+          AND slot_ts >= %(start_ts)s
+          AND slot_ts < %(end_ts)s
+        """
+        + _TIME_WINDOW
+        + """
+        ORDER BY slot_ts
+        LIMIT %(limit)s;
+        """,
+        _range_params("test_name", test_name, start_day, end_day, start_time, end_time, limit),
+    )
+    return cur.fetchall()
+
+
+def fetch_next_lab_slots(
+    cur,
+    test_name: str,
+    after: datetime,
+    limit: int = 5,
+    max_price: Optional[float] = None,
+) -> List[Tuple[str, datetime, float]]:
+    """Earliest open slots for one lab test at or after `after` as (test_name, slot_ts, price)."""
+    cur.execute(
+        """
+        SELECT test_name, slot_ts, price
+        FROM lab_tests
+        WHERE lower(test_name) = lower(%(test_name)s)
+          AND is_available = TRUE
+          AND slot_ts >= %(after)s
+          AND (%(max_price)s::numeric IS NULL OR price <= %(max_price)s::numeric)
+        ORDER BY slot_ts
+        LIMIT %(limit)s;
+        """,
+        {"test_name": test_name, "after": after, "limit": limit, "max_price": max_price},
+    )
+    return cur.fetchall()
+
+
+def book_lab_slot(cur, test_name: str, slot: datetime, patient_id: int) -> Optional[Tuple[str, float]]:
+    """Atomically take an open lab slot for the patient; returns (test_name, price), or None if it was not open."""
+    cur.execute(
+        """
+        UPDATE lab_tests
+        SET is_available = FALSE,
+            patient_to_attend = %s
+        WHERE lower(test_name) = lower(%s)
+          AND slot_date = %s
+          AND slot_ts = %s
+          AND is_available = TRUE
+        RETURNING test_name, price;
+        """,
+        (str(patient_id), test_name, slot.date(), slot),
+    )
+    return cur.fetchone()
+
+
+def fetch_lab_prerequisites(cur, test_name: str) -> Optional[Tuple[str]]:
+    cur.execute(
+        """
+        SELECT prerequisites
+        FROM lab_tests
+        WHERE lower(test_name) = lower(%s)
+        LIMIT 1;
+        """,
+        (test_name,),
+    )
+    return cur.fetchone()
@@ -1,16 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from agents.supervisor_agent import SupervisorAgent
+from agents.fast_router import fast_router_stats
+from db.availability_cache import availability_cache_stats
+from db.booking_reaper import booking_reaper
+from db.checkpoint_pruner import checkpoint_pruner
+from db.checkpointer import get_checkpointer
+from db.connection_pool import close_pool
 from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.errors import GraphRecursionError
 import os
+import json
+import logging
 
-from utils.memory import (
-    load_memory_bundle,
-    format_memory_context,
-    summarize_and_store_conversation,
+from utils.conversation_threads import (
+    DEFAULT_THREAD_ID,
+    compaction,
+    current_turn,
+    schedule_memory_update,
+    thread_config,
+    thread_turn,
 )
+from utils.llms import close_llm_clients
+from utils.logging_config import RequestIdMiddleware, close_logging, configure_logging
+from utils.llm_usage import llm_usage_stats
+from utils.memory import aload_memory_bundle, format_memory_context
+from utils.memory_queue import memory_updates
+from utils.message_window import MEMORY_MESSAGE_PREFIX, window_stats
+from utils.memory_store import memory_cache_stats
+from utils.metrics import RequestMetricsMiddleware, recursion_limit_hits, render_metrics
+from utils.streaming import stream_agent_events, turn_tool_results
+from utils.tracing import span, tracer
 
 FRONTEND_ORIGIN = os.getenv(
     "FRONTEND_ORIGIN",
@@ -19,7 +44,40 @@ FRONTEND_ORIGIN = os.getenv(
 
 os.environ.pop("SSL_CERT_FILE", None)
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+supervisor_agent = SupervisorAgent()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile every graph once at startup and fail fast if one is malformed
+    supervisor_agent.graphs.warm_up()
+    report = supervisor_agent.graphs.self_check()
+    logger.info(f"Graph self-check passed: {report}")
+    # Fails fast on an unknown SUPERVISOR_GRAPH_MODE
+    supervisor_agent.compiled_graph()
+    await memory_updates.start()
+    await booking_reaper.start()
+    await checkpoint_pruner.start()
+    yield
+    await booking_reaper.close()
+    await checkpoint_pruner.close()
+    # Flush pending memory updates while the database pool is still open
+    await memory_updates.close()
+    logger.info(f"Memory cache stats: {memory_cache_stats()}")
+    logger.info(f"Availability cache stats: {availability_cache_stats()}")
+    logger.info(f"Fast-path router stats: {fast_router_stats()}")
+    logger.info(f"Message window tokens per node: {window_stats()}")
+    logger.info(f"LLM token usage per node: {llm_usage_stats()}")
+    await close_llm_clients()
+    close_pool()
+    tracer.close()
+    close_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,27 +87,29 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+# Outermost, so every log record of a request carries its ID
+app.add_middleware(RequestIdMiddleware)
 
 class UserQuery(BaseModel):
     id_number: int
     messages: str
+    # Conversation to continue when checkpointing is on; defaults to the patient's own thread
+    thread_id: Optional[str] = None
 
-supervisor_agent = SupervisorAgent()
-
-@app.post("/execute")
-def execute_agent(user_input: UserQuery):
-    app_graph = supervisor_agent.workflow()
+def graph_config(user_input: UserQuery):
+    """Run config of the turn: the patient's thread when checkpointing is on."""
+    config = {"recursion_limit": 20}
+    if get_checkpointer() is not None:
+        config.update(thread_config(user_input.id_number, user_input.thread_id))
+    return config
 
-    memory_bundle = load_memory_bundle(user_input.id_number)
-    memory_context = format_memory_context(memory_bundle)
 
-    message_stack = []
-    if memory_context:
-        message_stack.append(SystemMessage(content=f"Persistent memory:\n{memory_context}"))
-    message_stack.append(HumanMessage(content=user_input.messages))
+async def build_graph_input(user_input: UserQuery, app_graph, config):
+    """Graph input for the turn; a resumed thread only gets the new message. Call within thread_turn()."""
+    previous = (await app_graph.aget_state(config)).values if "configurable" in config else {}
 
     query_data = {
-        "messages": message_stack,
         "id_number": user_input.id_number,
         "next": "",
         "query": "",
@@ -57,11 +117,92 @@ def execute_agent(user_input: UserQuery):
         "current_instructions": "",
         "missing_information": [],
         "steps_taken": 0,
-        "memory_context": memory_context,
+        "turn_count": previous.get("turn_count", 0) + 1,
     }
+    if previous:
+        # memory_context stays as loaded when the thread started
+        query_data["messages"] = compaction(previous.get("messages", [])) + [HumanMessage(content=user_input.messages)]
+        return query_data
+
+    memory_bundle = await aload_memory_bundle(user_input.id_number)
+    memory_context = format_memory_context(memory_bundle)
+
+    message_stack = []
+    if memory_context:
+        message_stack.append(SystemMessage(content=f"{MEMORY_MESSAGE_PREFIX}\n{memory_context}"))
+    message_stack.append(HumanMessage(content=user_input.messages))
+
+    query_data["messages"] = message_stack
+    query_data["memory_context"] = memory_context
+    return query_data
 
-    response = app_graph.invoke(query_data, config={"recursion_limit": 20})
-    summarize_and_store_conversation(user_input.id_number, response["messages"])
+
+async def finish_turn(user_input: UserQuery, query_data, config, messages) -> None:
+    """Post-turn bookkeeping: the memory summary (when due) and checkpoint compaction."""
+    threaded = "configurable" in config
+    await schedule_memory_update(user_input.id_number, messages, query_data["turn_count"] if threaded else None)
+    if threaded:
+        checkpoint_pruner.mark(config["configurable"]["thread_id"])
+
+
+@app.post("/execute")
+async def execute_agent(user_input: UserQuery):
+    app_graph = supervisor_agent.compiled_graph()
+    config = graph_config(user_input)
+    # One trace per turn: memory load, every node, tool, LLM, DB and S3 call
+    with span("turn", endpoint="/execute", patient_id=user_input.id_number) as turn:
+        async with thread_turn(app_graph, config):
+            query_data = await build_graph_input(user_input, app_graph, config)
+            try:
+                response = await app_graph.ainvoke(query_data, config=config)
+            except GraphRecursionError:
+                recursion_limit_hits.inc(endpoint="/execute")
+                raise
+        turn.set("messages", len(response["messages"]))
+    await finish_turn(user_input, query_data, config, response["messages"])
     # return JSONResponse(content = response["messages"], status_code = 200)
-    return {"messages": response["messages"]}
-    
+    # "messages" is this turn only (earlier turns live in the thread);
+    # "results" holds the typed booking/availability payloads produced in this turn
+    return {
+        "messages": current_turn(response["messages"]),
+        "results": turn_tool_results(response["messages"]),
+        # None when checkpointing is off: there is no thread to resume
+        "thread_id": (user_input.thread_id or DEFAULT_THREAD_ID) if "configurable" in config else None,
+    }
+
+
+@app.post("/execute/stream")
+async def execute_agent_stream(user_input: UserQuery):
+    """Stream node transitions, tool calls and answer tokens as NDJSON while the graph runs."""
+    app_graph = supervisor_agent.compiled_graph()
+    config = graph_config(user_input)
+
+    async def event_stream():
+        final_messages = None
+        try:
+            with span("turn", endpoint="/execute/stream", patient_id=user_input.id_number):
+                # The thread's state is read once the previous turn on it has finished
+                async with thread_turn(app_graph, config):
+                    query_data = await build_graph_input(user_input, app_graph, config)
+                    async for event in stream_agent_events(app_graph, query_data, config):
+                        if event["type"] == "final":
+                            final_messages = event["messages"]
+                            event = {**event, "messages": current_turn(final_messages)}
+                        yield json.dumps(jsonable_encoder(event)) + "\n"
+        except Exception as e:
+            if isinstance(e, GraphRecursionError):
+                recursion_limit_hits.inc(endpoint="/execute/stream")
+            logger.exception("Streaming execution failed")
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+            return
+
+        if final_messages:
+            await finish_turn(user_input, query_data, config, final_messages)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,33 @@
+"""
+Per-call context that is appended after the conversation.
+
+Keeping volatile values out of the system prompts means every call starts with
+the same static prefix (system prompt + conversation so far), which providers
+can serve from their prompt cache; only this trailing message changes.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+from langchain_core.messages import SystemMessage
+
+CONTEXT_HEADER = "### CURRENT CONTEXT"
+
+
+def context_message(state: Dict[str, Any], include_plan: bool = False, notes: Iterable[str] = ()) -> SystemMessage:
+    lines = [
+        CONTEXT_HEADER,
+        f"- User ID (patient_id): {state['id_number']}",
+        f"- Steps completed so far: {state.get('steps_taken', 0)}",
+    ]
+    if include_plan:
+        lines.append(f"- Supervisor reasoning: {state.get('current_reasoning', '')}")
+        lines.append(f"- Action plan: {state.get('current_instructions', '')}")
+    if state.get("memory_context"):
+        lines.append(f"- Long-term memory context (may or may not be relevant):\n{state['memory_context']}")
+    lines.extend(notes)
+    return SystemMessage(content="\n".join(lines))
+
+
+def with_context(static_prompt: str, messages: List[Any], context: SystemMessage) -> List[Any]:
+    """Static system prompt first, conversation next, volatile context last."""
+    return [SystemMessage(content=static_prompt)] + list(messages) + [context]
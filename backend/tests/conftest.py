@@ -0,0 +1,43 @@
+"""
+Shared pytest setup. Run from backend/:
+
+    pip install -r requirements-dev.txt
+    python -m pytest                 # unit tests; db tests skip without a database
+    python -m pytest -m db           # only the tests that need PostgreSQL
+
+Tests marked `db` use the POSTGRE_* connection settings and need db/schema.sql
+plus db/migrations/*.sql applied (README, "Run the Tests"). They only touch rows
+they create themselves, but run them against a disposable database all the same.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# utils.llms exports the key at import time; no test talks to the provider
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "db: needs a PostgreSQL database with the schema and migrations applied")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """The shared pool, or skip when no migrated database is reachable."""
+    if not os.getenv("POSTGRE_HOST"):
+        pytest.skip("POSTGRE_HOST is not set")
+    from db import booking_engine
+    from db.connection_pool import close_pool
+
+    try:
+        ready = booking_engine.bookings_schema_ready()
+    except Exception as e:
+        pytest.skip(f"database unreachable: {e}")
+    if not ready:
+        pytest.skip("bookings tables missing; apply db/migrations/004 and 005")
+    yield
+    close_pool()
@@ -0,0 +1,146 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from db import booking_engine
+from db.connection_pool import get_connection
+
+pytestmark = pytest.mark.db
+
+DOCTOR = "pytest doctor"
+SLOT = datetime(2099, 1, 5, 9, 0)
+OTHER_SLOT = datetime(2099, 1, 5, 10, 0)
+
+
+def _delete_test_rows():
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM booking_idempotency WHERE subject = %s;", (DOCTOR,))
+        cur.execute("DELETE FROM bookings WHERE subject = %s;", (DOCTOR,))
+        cur.execute("DELETE FROM doctor_appointments WHERE doctor_name = %s;", (DOCTOR,))
+        conn.commit()
+
+
+@pytest.fixture
+def open_slot(database):
+    """Open slots (SLOT, OTHER_SLOT) of a doctor no other data uses, removed again afterwards."""
+    _delete_test_rows()
+    with get_connection() as conn, conn.cursor() as cur:
+        for slot in (SLOT, OTHER_SLOT):
+            cur.execute(
+                """
+                INSERT INTO doctor_appointments (date_slot, specialization, doctor_name, is_available, consultation_fee)
+                VALUES (%s, 'general_medicine', %s, TRUE, 50);
+                """,
+                (slot.strftime("%d-%m-%Y %H:%M"), DOCTOR),
+            )
+        conn.commit()
+    yield SLOT
+    _delete_test_rows()
+
+
+def _slot_row(slot=SLOT):
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT is_available, patient_to_attend FROM doctor_appointments WHERE doctor_name = %s AND slot_ts = %s;",
+            (DOCTOR, slot),
+        )
+        return cur.fetchone()
+
+
+def test_book_doctor_takes_the_slot_once(open_slot):
+    first = booking_engine.book_doctor(DOCTOR, open_slot, 1001)
+    second = booking_engine.book_doctor(DOCTOR, open_slot, 1002)
+
+    assert first.status == "booked" and first.booking_reference.startswith("DOC-")
+    assert first.amount == 50.0
+    assert second.status == "unavailable"
+    assert _slot_row() == (False, "1001")
+
+
+def test_concurrent_bookings_of_one_slot_have_a_single_winner(open_slot):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda patient: booking_engine.book_doctor(DOCTOR, open_slot, patient), range(2001, 2009)))
+
+    assert sorted(r.status for r in results) == ["booked"] + ["unavailable"] * 7
+
+
+def test_retry_with_the_same_idempotency_key_replays_the_first_result(open_slot):
+    key = booking_engine.idempotency_key("book", "doctor", DOCTOR, open_slot, 1001)
+    first = booking_engine.book_doctor(DOCTOR, open_slot, 1001, key)
+    retry = booking_engine.book_doctor(DOCTOR, open_slot, 1001, key)
+
+    assert first.status == "booked"
+    assert retry == first
+
+
+def test_expired_hold_frees_its_slot(open_slot, monkeypatch):
+    monkeypatch.setattr(booking_engine, "HOLD_TTL_SECONDS", -1)
+    key = booking_engine.idempotency_key("hold", "doctor", DOCTOR, open_slot, 1001)
+    hold = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    # Already past its expiry: reported as expired, but the slot stays taken until the reaper runs
+    assert hold.status == "expired"
+    assert _slot_row() == (False, "1001")
+
+    assert booking_engine.expire_holds(batch_size=1) >= 1
+
+    assert _slot_row() == (True, None)
+    assert booking_engine.lookup(hold.booking_reference, 1001).status == "expired"
+    assert booking_engine.confirm(hold.booking_reference, 1001).status == "expired"
+    # The idempotency key went with the hold, so the same request holds the slot again
+    monkeypatch.setattr(booking_engine, "HOLD_TTL_SECONDS", 600)
+    again = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    assert again.status == "pending" and again.booking_reference != hold.booking_reference
+
+
+def test_expiry_continues_past_a_batch_whose_slots_were_already_released(open_slot, monkeypatch):
+    monkeypatch.setattr(booking_engine, "HOLD_TTL_SECONDS", -1)
+    hold = booking_engine.hold_doctor(DOCTOR, open_slot, 1001)
+    # Release the slot behind the hold's back, so expiring it frees nothing
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "UPDATE doctor_appointments SET is_available = TRUE, patient_to_attend = NULL WHERE slot_ts = %s AND doctor_name = %s;",
+            (open_slot, DOCTOR),
+        )
+        conn.commit()
+    booking_engine.hold_doctor(DOCTOR, OTHER_SLOT, 1002)
+
+    # Both holds expire although the first batch (the oldest hold) freed no slot
+    assert booking_engine.expire_holds(batch_size=1) >= 2
+    assert booking_engine.lookup(hold.booking_reference, 1001).status == "expired"
+    assert _slot_row(OTHER_SLOT) == (True, None)
+
+
+def test_confirmed_booking_can_be_paid_once(open_slot):
+    hold = booking_engine.hold_doctor(DOCTOR, open_slot, 1001)
+
+    assert booking_engine.pay(hold.booking_reference, 1001).status == "pending"
+    assert booking_engine.confirm(hold.booking_reference, 1001).status == "confirmed"
+    assert booking_engine.pay(hold.booking_reference, 1001).status == "paid"
+    assert booking_engine.pay(hold.booking_reference, 1001).status == "paid"
+    assert booking_engine.confirm(hold.booking_reference, 2002).status == "not_found"
+
+
+def test_retry_of_a_hold_replays_the_booking_as_it_is_now(open_slot):
+    key = booking_engine.idempotency_key("hold", "doctor", DOCTOR, open_slot, 1001)
+    hold = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    assert booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key) == hold
+
+    booking_engine.confirm(hold.booking_reference, 1001)
+    retry = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    assert retry.status == "confirmed" and retry.booking_reference == hold.booking_reference
+
+    booking_engine.pay(hold.booking_reference, 1001)
+    assert booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key).status == "paid"
+
+
+def test_retry_of_a_lapsed_hold_reports_it_expired_before_the_reaper_runs(open_slot, monkeypatch):
+    monkeypatch.setattr(booking_engine, "HOLD_TTL_SECONDS", 0.05)
+    key = booking_engine.idempotency_key("hold", "doctor", DOCTOR, open_slot, 1001)
+    hold = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    assert hold.status == "pending"
+    time.sleep(0.1)
+
+    retry = booking_engine.hold_doctor(DOCTOR, open_slot, 1001, key)
+    assert retry.status == "expired" and retry.booking_reference == hold.booking_reference
@@ -0,0 +1,105 @@
+import utils.cache as cache_module
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_value_until_ttl_expires():
+    clock = FakeClock()
+    cache = TTLCache(max_entries=4, ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.stats["expired"] == 1
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats["evictions"] == 1
+
+
+def test_invalidate_and_invalidate_where():
+    cache = TTLCache(ttl_seconds=60)
+    for key in [("doctor", "lisa", 1), ("doctor", "lisa", 2), ("lab", "ecg", 1)]:
+        cache.set(key, key)
+
+    cache.invalidate(("lab", "ecg", 1))
+    assert cache.invalidate_where(lambda key: key[0] == "doctor" and key[2] == 1) == 1
+
+    assert cache.get(("lab", "ecg", 1)) is None
+    assert cache.get(("doctor", "lisa", 1)) is None
+    assert cache.get(("doctor", "lisa", 2)) == ("doctor", "lisa", 2)
+    assert cache.stats["invalidations"] == 2
+
+
+def test_set_is_skipped_when_its_key_was_invalidated_since_the_read():
+    cache = TTLCache(ttl_seconds=60)
+    generation = cache.generation
+    # A booking commits while the slow read is in flight; the key is not cached yet
+    cache.invalidate("slots")
+    cache.set("slots", ["09:00"], generation=generation)
+
+    assert cache.get("slots") is None
+    assert cache.stats["stale_sets"] == 1
+
+    cache.set("slots", [], generation=cache.generation)
+    assert cache.get("slots") == []
+
+
+def test_invalidating_other_keys_does_not_drop_a_fill():
+    cache = TTLCache(ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate(("doctor", "lisa", 1))
+    cache.invalidate_where(lambda key: key[0] == "lab")
+    cache.set(("doctor", "lisa", 2), ["09:00"], generation=generation)
+    cache.set(("lab", "ecg", 2), ["10:00"], generation=generation)
+
+    assert cache.get(("doctor", "lisa", 2)) == ["09:00"]
+    assert cache.get(("lab", "ecg", 2)) is None
+    assert cache.stats["stale_sets"] == 1
+
+
+def test_clear_drops_fills_of_every_key():
+    cache = TTLCache(ttl_seconds=60)
+    generation = cache.generation
+    cache.clear()
+    cache.set("a", 1, generation=generation)
+    assert cache.get("a") is None
+
+
+def test_fill_older_than_the_invalidation_log_is_dropped(monkeypatch):
+    monkeypatch.setattr(cache_module, "INVALIDATION_LOG_SIZE", 2)
+    cache = TTLCache(ttl_seconds=60)
+    generation = cache.generation
+    for key in ("x", "y", "z"):
+        cache.invalidate(key)
+    # Whether "a" was invalidated is no longer known
+    cache.set("a", 1, generation=generation)
+    assert cache.get("a") is None
+
+    cache.set("a", 1, generation=cache.generation)
+    assert cache.get("a") == 1
+
+
+def test_disabled_cache_stores_nothing():
+    for cache in (TTLCache(max_entries=0), TTLCache(ttl_seconds=0)):
+        assert not cache.enabled
+        cache.set("a", 1)
+        assert cache.get("a") is None
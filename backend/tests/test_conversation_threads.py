@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage
+
+import utils.conversation_threads as conversation_threads
+from utils.conversation_threads import compaction, current_turn, split_turns, summarized_turns, thread_config
+from utils.message_window import MEMORY_MESSAGE_PREFIX
+
+
+def conversation(turns, memory=True):
+    """turns user messages, each answered once; every message has an id like RemoveMessage needs."""
+    messages = [SystemMessage(content=f"{MEMORY_MESSAGE_PREFIX}\nlikes mornings", id="memory")] if memory else []
+    for turn in range(1, turns + 1):
+        messages.append(HumanMessage(content=f"question {turn}", id=f"h{turn}"))
+        messages.append(AIMessage(content=f"answer {turn}", id=f"a{turn}"))
+    return messages
+
+
+def test_split_turns_starts_a_turn_at_each_user_message():
+    turns = split_turns(conversation(3))
+
+    assert [[m.id for m in turn] for turn in turns] == [["memory", "h1", "a1"], ["h2", "a2"], ["h3", "a3"]]
+    assert split_turns([]) == []
+
+
+def test_current_turn_is_the_latest_user_message_onwards():
+    assert [m.id for m in current_turn(conversation(3))] == ["h3", "a3"]
+    # The memory message before the first question is not part of the turn
+    assert [m.id for m in current_turn(conversation(1))] == ["h1", "a1"]
+
+
+def test_compaction_leaves_room_for_one_new_turn():
+    removals = compaction(conversation(4), keep_turns=3)
+
+    assert all(isinstance(r, RemoveMessage) for r in removals)
+    # Turns 3 and 4 stay; with the new message the thread holds three turns
+    assert [r.id for r in removals] == ["memory", "h1", "a1", "h2", "a2"]
+    assert compaction(conversation(2), keep_turns=3) == []
+    assert [r.id for r in compaction(conversation(2), keep_turns=1)] == ["memory", "h1", "a1", "h2", "a2"]
+
+
+def test_thread_ids_are_scoped_to_the_patient():
+    assert thread_config(1, "chat")["configurable"]["thread_id"] == "1:chat"
+    assert thread_config(2, "chat")["configurable"]["thread_id"] == "2:chat"
+    assert thread_config(1)["configurable"]["thread_id"] == "1:default"
+
+
+@pytest.mark.parametrize(
+    "turn_count, covered",
+    [(0, 0), (1, 1), (2, 1), (3, 3), (4, 3), (5, 3), (6, 6)],
+)
+def test_summaries_cover_the_first_turn_then_every_nth(monkeypatch, turn_count, covered):
+    monkeypatch.setattr(conversation_threads, "CHECKPOINT_SUMMARY_EVERY_TURNS", 3)
+    assert summarized_turns(turn_count) == covered
+
+
+class FakeQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, id_number, messages):
+        self.submitted.append((id_number, [m.content for m in messages]))
+
+
+@pytest.fixture
+def memory_queue(monkeypatch):
+    queue = FakeQueue()
+
+    async def load_memory(id_number):
+        return {"id_number": id_number}
+
+    monkeypatch.setattr(conversation_threads, "memory_updates", queue)
+    monkeypatch.setattr(conversation_threads, "aload_memory_bundle", load_memory)
+    monkeypatch.setattr(conversation_threads, "format_memory_context", lambda bundle: "fresh memory")
+    monkeypatch.setattr(conversation_threads, "CHECKPOINT_SUMMARY_EVERY_TURNS", 3)
+    return queue
+
+
+def test_thread_summaries_run_when_due_over_the_turns_since_the_last_one(memory_queue):
+    memory = f"{MEMORY_MESSAGE_PREFIX}\nfresh memory"
+    for turn_count in (1, 2, 3):
+        asyncio.run(conversation_threads.schedule_memory_update(7, conversation(turn_count), turn_count))
+
+    assert memory_queue.submitted == [
+        (7, [memory, "question 1", "answer 1"]),
+        # Turn 3 covers turns 2 and 3, each submitted so the queue coalesces them; the stale memory message is gone
+        (7, [memory, "question 2", "answer 2"]),
+        (7, ["question 3", "answer 3"]),
+    ]
+
+
+def test_stateless_turns_are_always_summarized(memory_queue):
+    messages = conversation(1)
+    asyncio.run(conversation_threads.schedule_memory_update(7, messages))
+    assert memory_queue.submitted == [(7, [m.content for m in messages])]
+
+
+def test_expiring_thread_summarizes_only_uncovered_turns(memory_queue):
+    assert asyncio.run(
+        conversation_threads.summarize_expired_thread({"id_number": 7, "turn_count": 2, "messages": conversation(2)})
+    )
+    assert memory_queue.submitted == [(7, [f"{MEMORY_MESSAGE_PREFIX}\nfresh memory", "question 2", "answer 2"])]
+
+    # Turn 3 was summarized when it ran
+    assert not asyncio.run(
+        conversation_threads.summarize_expired_thread({"id_number": 7, "turn_count": 3, "messages": conversation(3)})
+    )
+    assert len(memory_queue.submitted) == 1
@@ -0,0 +1,115 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agents.fast_router as fast_router
+from agents.fast_router import (
+    AVAILABILITY_KEYWORDS,
+    BOOKING_KEYWORDS,
+    DOCTOR_KEYWORDS,
+    FINISH,
+    LAB_INFO_KEYWORDS,
+    LAB_KEYWORDS,
+    FastRouter,
+)
+
+
+@pytest.fixture
+def top_router():
+    # Same rules as SupervisorAgent's top-level router
+    return FastRouter(
+        "test_top",
+        routing_message_name="top_supervisor",
+        answer_nodes=["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node"],
+        intent_rules=[("doctor_appointment_agent", DOCTOR_KEYWORDS), ("lab_diagnostics_agent", LAB_KEYWORDS)],
+    )
+
+
+@pytest.fixture
+def flat_router():
+    return FastRouter(
+        "test_flat",
+        routing_message_name="top_supervisor",
+        answer_nodes=["information_node", "booking_node", "lab_booking_node", "lab_availability_and_info_node"],
+        intent_rules=[
+            ("booking_node", (DOCTOR_KEYWORDS, BOOKING_KEYWORDS)),
+            ("information_node", (DOCTOR_KEYWORDS, AVAILABILITY_KEYWORDS)),
+            ("lab_booking_node", (LAB_KEYWORDS, BOOKING_KEYWORDS)),
+            ("lab_availability_and_info_node", (LAB_KEYWORDS, LAB_INFO_KEYWORDS)),
+        ],
+    )
+
+
+def state(*messages, **fields):
+    return {"messages": list(messages), "next": "", "steps_taken": 0, **fields}
+
+
+@pytest.mark.parametrize(
+    "query, target",
+    [
+        ("Is Dr. lisa brown available on 20-10-2026?", "doctor_appointment_agent"),
+        ("Which cardiology specialists are free tomorrow?", "doctor_appointment_agent"),
+        ("Do I need to fast before a lipid panel?", "lab_diagnostics_agent"),
+        ("Book an ecg for Friday", "lab_diagnostics_agent"),
+    ],
+)
+def test_intent_routes_unambiguous_requests(top_router, query, target):
+    decision = top_router.route(state(HumanMessage(content=query)))
+    assert decision["next"] == target
+    assert decision["reasoning"].startswith("[fast-path:intent]")
+
+
+@pytest.mark.parametrize("query", ["Hello there", "Book the doctor and a blood test", ""])
+def test_ambiguous_or_unmatched_requests_go_to_the_llm(top_router, query):
+    assert top_router.route(state(HumanMessage(content=query))) is None
+
+
+def test_compound_rules_need_every_keyword_group(flat_router):
+    assert flat_router.route(state(HumanMessage(content="Book Dr. lisa brown at 09:00")))["next"] == "booking_node"
+    assert flat_router.route(state(HumanMessage(content="What ecg slots are free?")))["next"] == (
+        "lab_availability_and_info_node"
+    )
+    # Doctor keywords without an intent keyword match no rule
+    assert flat_router.route(state(HumanMessage(content="Tell me about Dr. lisa brown"))) is None
+
+
+def test_inner_finish_ends_the_turn(top_router):
+    decision = top_router.route(state(HumanMessage(content="Is Dr. lisa brown free?"), next=FINISH))
+    assert decision["next"] == FINISH
+    assert "[fast-path:inner_finish]" in decision["reasoning"]
+
+
+def test_answer_after_the_latest_user_message_ends_the_turn(top_router):
+    answered = state(HumanMessage(content="Is Dr. lisa brown free?"), AIMessage(content="Yes", name="information_node"))
+    assert top_router.route(answered)["next"] == FINISH
+
+    # An answer from an earlier turn does not end the new one
+    follow_up = state(*answered["messages"], HumanMessage(content="Book Dr. lisa brown at 09:00"))
+    assert top_router.route(follow_up)["next"] == "doctor_appointment_agent"
+
+
+def test_step_limit_ends_the_turn(top_router):
+    decision = top_router.route(state(HumanMessage(content="Hello"), steps_taken=fast_router.MAX_SUPERVISOR_STEPS))
+    assert decision["next"] == FINISH
+
+
+def test_intent_only_decides_the_first_hop_of_a_turn(top_router):
+    routed = state(
+        HumanMessage(content="Is Dr. lisa brown free?"),
+        AIMessage(content="Routing to the doctor agent", name="top_supervisor"),
+    )
+    assert top_router.route(routed) is None
+
+
+def test_disabled_router_always_defers_to_the_llm(top_router, monkeypatch):
+    monkeypatch.setattr(fast_router, "FAST_ROUTER_ENABLED", False)
+    assert top_router.route(state(HumanMessage(content="Hi"), next=FINISH)) is None
+
+
+def test_decisions_are_counted_per_scope_and_rule(top_router):
+    before = fast_router.fast_router_stats()
+    top_router.route(state(HumanMessage(content="Is Dr. lisa brown free?")))
+    top_router.route(state(HumanMessage(content="Hello")))
+    after = fast_router.fast_router_stats()
+
+    assert after["test_top.intent"] == before.get("test_top.intent", 0) + 1
+    assert after["test_top.llm"] == before.get("test_top.llm", 0) + 1
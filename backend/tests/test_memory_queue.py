@@ -0,0 +1,100 @@
+import asyncio
+
+from utils.memory_queue import MemoryUpdateQueue
+
+
+class RecordingSummarizer:
+    """Stands in for asummarize_and_store_conversation; can hold a patient's call open."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+        self.block = False
+
+    async def __call__(self, id_number, messages, max_messages=None):
+        self.calls.append((id_number, list(messages)))
+        if self.block:
+            await self.release.wait()
+
+
+def test_turns_of_one_patient_are_coalesced_into_one_summary():
+    async def scenario():
+        summarize = RecordingSummarizer()
+        queue = MemoryUpdateQueue(workers=2, summarize=summarize)
+        queue.submit(1, ["turn 1"])
+        queue.submit(1, ["turn 2"])
+        queue.submit(2, ["other patient"])
+        await queue.start()
+        await queue.close(timeout=5)
+        return summarize.calls, queue.stats
+
+    calls, stats = asyncio.run(scenario())
+
+    assert sorted(calls) == [(1, ["turn 1", "turn 2"]), (2, ["other patient"])]
+    assert stats["submitted"] == 3 and stats["coalesced"] == 1 and stats["processed"] == 2
+
+
+def test_turns_arriving_while_a_patient_is_in_flight_get_a_second_pass():
+    async def scenario():
+        summarize = RecordingSummarizer()
+        summarize.block = True
+        queue = MemoryUpdateQueue(workers=2, summarize=summarize)
+        await queue.start()
+        queue.submit(1, ["turn 1"])
+        while not summarize.calls:
+            await asyncio.sleep(0)
+        # Another worker is free, but must not summarize patient 1 concurrently
+        queue.submit(1, ["turn 2"])
+        queue.submit(1, ["turn 3"])
+        await asyncio.sleep(0.01)
+        in_flight_calls = len(summarize.calls)
+        summarize.release.set()
+        await queue.close(timeout=5)
+        return in_flight_calls, summarize.calls
+
+    in_flight_calls, calls = asyncio.run(scenario())
+
+    assert in_flight_calls == 1
+    assert calls == [(1, ["turn 1"]), (1, ["turn 2", "turn 3"])]
+
+
+def test_new_patients_are_dropped_when_the_backlog_is_full():
+    queue = MemoryUpdateQueue(max_backlog=1, summarize=RecordingSummarizer())
+
+    assert queue.submit(1, ["a"])
+    assert queue.submit(1, ["b"])  # coalesced, not a new patient
+    assert not queue.submit(2, ["c"])
+    assert queue.stats["dropped"] == 1
+    assert queue.backlog() == 1
+
+
+def test_closed_queue_drops_updates():
+    async def scenario():
+        queue = MemoryUpdateQueue(summarize=RecordingSummarizer())
+        await queue.start()
+        await queue.close(timeout=5)
+        return queue.submit(1, ["late"]), queue.stats
+
+    accepted, stats = asyncio.run(scenario())
+    assert not accepted and stats["dropped"] == 1
+
+
+def test_failed_summaries_are_counted_and_do_not_stop_the_worker():
+    async def scenario():
+        calls = []
+
+        async def summarize(id_number, messages, max_messages=None):
+            calls.append(id_number)
+            if id_number == 1:
+                raise RuntimeError("provider down")
+
+        queue = MemoryUpdateQueue(workers=1, summarize=summarize)
+        await queue.start()
+        queue.submit(1, ["a"])
+        queue.submit(2, ["b"])
+        await queue.close(timeout=5)
+        return calls, queue.stats
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == [1, 2]
+    assert stats["failed"] == 1 and stats["processed"] == 1
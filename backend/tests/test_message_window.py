@@ -0,0 +1,116 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import utils.message_window as message_window
+from utils.message_window import MEMORY_MESSAGE_PREFIX, count_message_tokens, window_messages
+
+
+@pytest.fixture(autouse=True)
+def windowing_on(monkeypatch):
+    monkeypatch.setattr(message_window, "MESSAGE_WINDOW_ENABLED", True)
+
+
+def contents(messages):
+    return [m.content for m in messages]
+
+
+def test_memory_message_and_earlier_routing_summaries_are_dropped():
+    messages = [
+        SystemMessage(content=f"{MEMORY_MESSAGE_PREFIX}\nlikes mornings"),
+        HumanMessage(content="Is Dr. lisa brown free?"),
+        AIMessage(content="route to doctor agent", name="supervisor"),
+        AIMessage(content="She is free at 09:00", name="information_node"),
+        HumanMessage(content="Book it"),
+        AIMessage(content="route to booking", name="supervisor"),
+    ]
+
+    # Supervisors keep this turn's routing, workers get none
+    assert contents(window_messages(messages, "test_supervisor")) == [
+        "Is Dr. lisa brown free?", "She is free at 09:00", "Book it", "route to booking",
+    ]
+    assert contents(window_messages(messages, "test_worker", worker=True)) == [
+        "Is Dr. lisa brown free?", "She is free at 09:00", "Book it",
+    ]
+
+
+def test_budget_keeps_newest_messages_and_always_the_latest_request():
+    history = [HumanMessage(content=f"old question {i} " + "word " * 50) for i in range(10)]
+    latest = HumanMessage(content="latest request " + "word " * 200)
+    budget = count_message_tokens([latest]) + 5
+
+    kept = window_messages(history + [latest], "test_budget", budget=budget)
+
+    assert kept == [latest]
+    # Even when the latest request alone is over budget it is kept verbatim
+    assert window_messages(history + [latest], "test_budget", budget=1) == [latest]
+
+
+def test_older_long_messages_are_truncated_but_the_latest_ones_are_not():
+    long_answer = AIMessage(content="x" * 500)
+    latest = HumanMessage(content="y" * 500)
+    kept = window_messages([HumanMessage(content="q"), long_answer, latest], "test_truncate", max_chars=100)
+
+    assert len(kept[1].content) < 500
+    assert kept[2].content == latest.content
+    # The state's message is not modified
+    assert len(long_answer.content) == 500
+
+
+def test_window_never_starts_with_an_orphaned_tool_result():
+    messages = [
+        HumanMessage(content="old " * 300),
+        AIMessage(content="", tool_calls=[{"name": "check", "args": {}, "id": "call-1"}]),
+        ToolMessage(content="slots", tool_call_id="call-1"),
+        HumanMessage(content="new question"),
+    ]
+    ai_tokens = count_message_tokens([messages[1]])
+    # Room for the tool result and the new question, but not its calling AI message
+    budget = count_message_tokens(messages[2:]) + ai_tokens // 2
+
+    kept = window_messages(messages, "test_tools", budget=budget)
+    assert not isinstance(kept[0], ToolMessage)
+    assert kept[-1].content == "new question"
+
+
+def test_disabled_windowing_passes_the_full_history(monkeypatch):
+    monkeypatch.setattr(message_window, "MESSAGE_WINDOW_ENABLED", False)
+    messages = [SystemMessage(content=f"{MEMORY_MESSAGE_PREFIX}\nx"), HumanMessage(content="hi")]
+    assert window_messages(messages, "test_disabled") == messages
+
+
+def test_before_and_after_tokens_are_recorded_per_node():
+    messages = [HumanMessage(content="old " * 100), HumanMessage(content="new")]
+    window_messages(messages, "test_stats", budget=count_message_tokens(messages[-1:]))
+
+    stats = message_window.window_stats()["test_stats"]
+    assert stats["calls"] >= 1
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_the_current_turn_is_sent_verbatim():
+    tool_result = ToolMessage(content="slot " * 400, tool_call_id="call-1")
+    messages = [
+        HumanMessage(content="Which slots are free?"),
+        AIMessage(content="", tool_calls=[{"name": "check", "args": {}, "id": "call-1"}]),
+        tool_result,
+        AIMessage(content="Here they are"),
+    ]
+    kept = window_messages(messages, "test_current", worker=True, max_chars=100)
+    assert kept[2].content == tool_result.content
+
+
+def test_consecutive_turns_share_a_byte_identical_prefix():
+    history, windows = [], []
+    for turn in range(1, 21):
+        history += [HumanMessage(content=f"question {turn} " + "word " * 30)]
+        windows.append(contents(window_messages(history, "test_prefix", budget=400, max_chars=80)))
+        history += [AIMessage(content=f"answer {turn} " + "word " * 120)]
+
+    cuts = 0
+    for previous, current in zip(windows, windows[1:]):
+        # Everything before the previous call's own turn is sent again unchanged
+        if current[:len(previous) - 1] != previous[:-1]:
+            cuts += 1
+            assert current[0] != previous[0]
+    # Over budget from turn 3 on, yet the head only moves every few turns
+    assert 0 < cuts <= 5
@@ -0,0 +1,179 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+
+from db import checkpointer
+from db.connection_pool import get_connection
+from db.postgres_checkpointer import PostgresCheckpointSaver
+
+pytestmark = pytest.mark.db
+
+THREAD = "pytest:checkpoints"
+OTHER_THREAD = "pytest:other"
+
+
+def _delete_test_rows():
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM graph_checkpoint_writes WHERE thread_id LIKE 'pytest:%%';")
+        cur.execute("DELETE FROM graph_checkpoints WHERE thread_id LIKE 'pytest:%%';")
+        conn.commit()
+
+
+@pytest.fixture
+def saver(database):
+    """A saver on empty pytest:* threads, which are removed again afterwards."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('graph_checkpoints') IS NOT NULL AND to_regclass('graph_checkpoint_writes') IS NOT NULL;")
+        ready = cur.fetchone()[0]
+        conn.commit()
+    if not ready:
+        pytest.skip("checkpoint tables missing; apply db/migrations/006")
+    _delete_test_rows()
+    yield PostgresCheckpointSaver()
+    _delete_test_rows()
+
+
+def config(thread_id=THREAD, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def parent_id(parent_config):
+    return parent_config["configurable"]["checkpoint_id"]
+
+
+def checkpoint_at(step):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": [f"step {step}"]}
+    return checkpoint
+
+
+def put(saver, step, thread_id=THREAD, parent=None):
+    metadata = {"source": "loop", "step": step, "writes": {"node": "output"}, "note": "a\u0000b"}
+    return saver.put(config(thread_id, parent), checkpoint_at(step), metadata, {})
+
+
+def stored(thread_id=THREAD):
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM graph_checkpoints WHERE thread_id = %s;", (thread_id,))
+        checkpoints = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM graph_checkpoint_writes WHERE thread_id = %s;", (thread_id,))
+        writes = cur.fetchone()[0]
+        conn.commit()
+    return checkpoints, writes
+
+
+def test_checkpoints_and_pending_writes_round_trip(saver):
+    first = put(saver, 0)
+    second = put(saver, 1, parent=first["configurable"]["checkpoint_id"])
+    saver.put_writes(second, [("messages", "pending"), ("__error__", "boom")], task_id="task-1")
+    saver.put_writes(second, [("__error__", "boom again")], task_id="task-1")
+
+    latest = saver.get_tuple(config())
+    assert latest.config == second
+    assert latest.checkpoint["channel_values"] == {"messages": ["step 1"]}
+    assert latest.parent_config == first
+    # Node outputs are dropped from the metadata, and NUL characters JSONB would reject
+    assert latest.metadata["step"] == 1 and "writes" not in latest.metadata
+    assert latest.metadata["note"] == "ab"
+    # The special error write is replaced, the regular one kept
+    assert sorted(latest.pending_writes) == [("task-1", "__error__", "boom again"), ("task-1", "messages", "pending")]
+
+    assert saver.get_tuple(first).checkpoint["channel_values"] == {"messages": ["step 0"]}
+    assert [t.config for t in saver.list(config())] == [second, first]
+    assert [t.config for t in saver.list(config(), before=second)] == [first]
+    assert [t.config for t in saver.list(config(), filter={"step": 0})] == [first]
+    assert saver.get_tuple(config(OTHER_THREAD)) is None
+
+
+def test_deferred_turn_writes_only_its_newest_checkpoint_when_it_ends(saver):
+    written = put(saver, 0)
+
+    async def turn():
+        async with saver.deferred(THREAD):
+            parent = written
+            for step in (1, 2, 3):
+                parent = await saver.aput(config(checkpoint_id=parent_id(parent)), checkpoint_at(step), {"step": step}, {})
+                await saver.aput_writes(parent, [("messages", f"write {step}")], task_id=f"task-{step}")
+            # Served from memory while the turn runs; nothing reached the database
+            in_turn = await saver.aget_tuple(config())
+            return parent, in_turn, stored()
+
+    newest, in_turn, during = asyncio.run(turn())
+
+    assert during == (1, 0)
+    assert in_turn.config == newest and in_turn.checkpoint["channel_values"] == {"messages": ["step 3"]}
+    assert stored() == (2, 1)
+    latest = saver.get_tuple(config())
+    assert latest.config == newest
+    # The skipped steps were never written, so the newest hangs off the last written checkpoint
+    assert latest.parent_config == written
+    assert latest.pending_writes == [("task-3", "messages", "write 3")]
+
+
+def test_compaction_keeps_the_newest_checkpoints_and_their_writes(saver):
+    parent = None
+    for step in range(4):
+        parent = put(saver, step, parent=parent and parent_id(parent))
+        saver.put_writes(parent, [("messages", f"write {step}")], task_id="task")
+    put(saver, 0, thread_id=OTHER_THREAD)
+
+    assert checkpointer.compact_threads([THREAD], keep=2) == 2
+
+    assert stored() == (2, 2)
+    assert [t.checkpoint["channel_values"]["messages"] for t in saver.list(config())] == [["step 3"], ["step 2"]]
+    assert stored(OTHER_THREAD) == (1, 0)
+
+
+def test_idle_threads_expire_with_their_newest_state(saver):
+    put(saver, 0)
+    put(saver, 1)
+    put(saver, 0, thread_id=OTHER_THREAD)
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "UPDATE graph_checkpoints SET created_at = NOW() - interval '2 hours' WHERE thread_id = %s;", (THREAD,)
+        )
+        conn.commit()
+
+    expired = [row for row in checkpointer.expired_threads(3600) if row[0].startswith("pytest:")]
+
+    assert [thread_id for thread_id, _, _ in expired] == [THREAD]
+    _, type_, payload = expired[0]
+    assert saver.serde.loads_typed((type_, payload))["channel_values"] == {"messages": ["step 1"]}
+    # A thread that ran again since it was listed keeps its new checkpoint
+    put(saver, 2)
+    assert checkpointer.delete_expired_threads([THREAD, OTHER_THREAD], 3600) == 2
+    assert stored() == (1, 0)
+    assert stored(OTHER_THREAD) == (1, 0)
+
+
+class TurnState(TypedDict):
+    log: Annotated[list, operator.add]
+
+
+def test_graph_resumes_a_thread_from_its_checkpoint(saver):
+    graph = StateGraph(TurnState)
+    graph.add_node("answer", lambda state: {"log": [f"answer {len(state['log'])}"]})
+    graph.add_edge(START, "answer")
+    graph.add_edge("answer", END)
+    app = graph.compile(checkpointer=saver)
+
+    async def turns():
+        results = []
+        for turn in (1, 2):
+            async with saver.deferred(THREAD):
+                results.append((await app.ainvoke({"log": [f"question {turn}"]}, config()))["log"])
+        return results
+
+    first, second = asyncio.run(turns())
+
+    assert first == ["question 1", "answer 1"]
+    # The second turn only sent its new message; the rest came from the checkpoint
+    assert second == ["question 1", "answer 1", "question 2", "answer 3"]
+    assert stored()[0] == 2
@@ -1,443 +1,466 @@
-from typing import Literal
+from typing import Literal, Optional
 from langchain_core.tools import tool
 from data_models.models import *
+from data_models.tool_results import AvailabilityOption, AvailabilityResult, BookingResult, PrerequisitesResult
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-import uuid
-from db.db_connection import connect_to_db
+from db.connection_pool import get_connection
+from db import availability_cache, booking_engine, slot_queries
 
 
-@tool
-def check_availability_by_doctor(
-    desired_date: DateModel,
-    doctor_name: Literal[
-        "lisa brown", "alexander turner", "sophia clark", "emily johnson", "olivia rodriguez", "matthew thompson", "daniel miller", "susan davis", "rebecca scott", "sarah wilson", "jennifer white", "nicholas adams", "laura mitchell", "michael green", "david lee", "amanda taylor", "ryan cooper", "kevin anderson", "christopher brown", "rachel moore", "kevin anderson", "jessica martinez", "daniel campbell", "ashley evans", "patricia davis", "robert stewart", "linda murphy", "william jones", "elizabeth taylor", "mark cook", "nancy thomas", "charles jackson", "paul rogers", "barbara harris", "sandra reed", "george howard", "margaret lewis", "carol torres", "kenneth peterson", "john doe"
-    ]
-):
-    """
-    Check the Supabase PostgreSQL doctor_appointments table to see
-    if a doctor has available slots for a given date.
-    """
+def _tool_output(result):
+    """Compact text for the LLM plus the typed payload as the ToolMessage artifact."""
+    return result.render(), result.model_dump(mode="json")
 
-    # Database connection
-    conn = connect_to_db()
-    cur = conn.cursor()
 
-    # print(cur)
+def _fee(value):
+    return float(value) if value is not None else None
 
-    # Query available slots with consultation fee
-    query = """
-        SELECT TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI') AS ts, consultation_fee
-        FROM doctor_appointments
-        WHERE doctor_name = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
-          AND is_available = TRUE
-        ORDER BY TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
-    """
 
-    cur.execute(query, (doctor_name, desired_date.date))
-    rows = cur.fetchall()
-    # print("Fetched records: ", rows)
+# Upper bound on slots a range search returns to the LLM
+MAX_RANGE_SLOTS = 50
+
+# One spelling per value, shared by every tool so the model sees a single enum of each
+DoctorName = Literal[
+    "lisa brown", "alexander turner", "sophia clark", "emily johnson", "olivia rodriguez", "matthew thompson", "daniel miller", "susan davis", "rebecca scott", "sarah wilson", "jennifer white", "nicholas adams", "laura mitchell", "michael green", "david lee", "amanda taylor", "ryan cooper", "kevin anderson", "christopher brown", "rachel moore", "jessica martinez", "daniel campbell", "ashley evans", "patricia davis", "robert stewart", "linda murphy", "william jones", "elizabeth taylor", "mark cook", "nancy thomas", "charles jackson", "paul rogers", "barbara harris", "sandra reed", "george howard", "margaret lewis", "carol torres", "kenneth peterson", "john doe"
+]
+Specialization = Literal[
+    "cardiology", "dermatology", "neurology", "pediatrics", "emergency_medicine", "oral_surgeon", "orthodontist", "radiology", "surgery", "sport_medicine", "general_medicine", "hematalogists"
+]
+LabTestName = Literal[
+    "lipid panel", "complete blood count", "blood glucose test", "thyroid function test", "liver function test", "kidney function test", "urine analysis", "chest x-ray", "ecg", "vitamin d test"
+]
+
 
-    # print(rows[0][0].strftime("%H:%M"))
+def _range_args(date_range: DateRangeModel, time_window: Optional[TimeWindowModel], limit: int):
+    """Parsed (start_day, end_day, start_time, end_time, limit) for the range queries."""
+    return (
+        slot_queries.parse_slot_date(date_range.start_date),
+        slot_queries.parse_slot_date(date_range.end_date),
+        slot_queries.parse_slot_time(time_window.start_time if time_window else None),
+        slot_queries.parse_slot_time(time_window.end_time if time_window else None),
+        max(1, min(limit, MAX_RANGE_SLOTS)),
+    )
 
-    cur.close()
-    conn.close()
 
-    # Format response
-    if not rows:
-        return f"No availability for Dr. {doctor_name} on {desired_date.date}"
+def _range_label(date_range: DateRangeModel) -> str:
+    return f"{date_range.start_date} to {date_range.end_date}"
 
-    # Extract time part (HH:MM) and consultation fee
-    slots = [r[0].strftime("%H:%M") for r in rows]
-    consultation_fee = rows[0][1] if rows else None
 
-    output = f"Availability for Dr. {doctor_name} on {desired_date.date}:\n"
-    output += ", ".join(slots)
-    if consultation_fee:
-        output += f"\nConsultation Fee: ${float(consultation_fee):.2f}"
+def _search_start(after: Optional[DateTimeModel]) -> datetime:
+    # Never offer slots that have already started
+    now = datetime.now().replace(second=0, microsecond=0)
+    return max(slot_queries.parse_slot_datetime(after.date), now) if after else now
 
-    return output
 
+def _doctor_key(name: Optional[str]) -> Optional[str]:
+    """Normalise a free-text doctor name from memory ('Dr. Lisa Brown') to the stored form."""
+    if not name:
+        return None
+    name = name.strip().lower()
+    return name[3:].strip() if name.startswith("dr.") else name
 
-@tool
+
+@tool(response_format="content_and_artifact")
+def check_availability_by_doctor(
+    desired_date: DateModel,
+    doctor_name: DoctorName
+):
+    """
+    Check the Supabase PostgreSQL doctor_appointments table to see
+    if a doctor has available slots for a given date.
+    """
+
+    # Query available slots with consultation fee
+    rows = availability_cache.doctor_day_slots(doctor_name, slot_queries.parse_slot_date(desired_date.date))
+
+    options = []
+    if rows:
+        options.append(
+            AvailabilityOption(
+                name=doctor_name,
+                fee=_fee(rows[0][1]),
+                slots=[r[0].strftime("%H:%M") for r in rows],
+            )
+        )
+    return _tool_output(
+        AvailabilityResult(kind="doctor", subject=f"Dr. {doctor_name}", date=desired_date.date, options=options)
+    )
+
+
+@tool(response_format="content_and_artifact")
 def check_availability_by_specialization(
     desired_date: DateModel,
-    specialization: Literal[
-        "cardiology" , "dermatology", "neurology", "pediatrics", "emergency_medicine", "oral_surgeon", "orthodontist", "radiology", "surgery", "sport_medicine", "general_medicine", "hematalogists"
-    ]
+    specialization: Specialization
 ):
     """
     Check the Supabase PostgreSQL database for doctor availability
     filtered by specialization and date.
     """
 
-    # Connect to DB
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Query: Convert date_slot (text -> timestamp) and extract both date & time with consultation fee
-    query = """
-        SELECT 
-            specialization,
-            doctor_name,
-            TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'HH24:MI') AS date_slot_time,
-            consultation_fee
-        FROM doctor_appointments
-        WHERE specialization = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
-          AND is_available = TRUE
-        ORDER BY doctor_name, TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
-    """
-
-    cur.execute(query, (specialization, desired_date.date))
-    rows = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
-    # Handle no availability
-    if not rows:
-        return f"No availability for {specialization.replace('_', ' ')} on {desired_date.date}"
+    # Query available slots with doctor and consultation fee
+    rows = availability_cache.specialization_day_slots(
+        specialization, slot_queries.parse_slot_date(desired_date.date)
+    )
 
     # Group by doctor_name → collect available times and consultation fee
-    availability = {}
-    doctor_fees = {}
-    for specialization_, doctor_name, slot_time, consultation_fee in rows:
-        availability.setdefault(doctor_name, []).append(slot_time)
-        # Store consultation fee for each doctor (should be consistent per doctor)
-        if doctor_name not in doctor_fees:
-            doctor_fees[doctor_name] = consultation_fee
-
-    # Convert to AM/PM format
-    def convert_to_am_pm(time_str):
-        hours, minutes = map(int, time_str.split(":"))
-        period = "AM" if hours < 12 else "PM"
-        hours = hours % 12 or 12
-        return f"{hours}:{minutes:02d} {period}"
-
-    # Build the output string
-    output = f"This availability for {desired_date.date}\n"
-    for doctor_name, slot_times in availability.items():
-        am_pm_times = [convert_to_am_pm(t) for t in slot_times]
-        fee = doctor_fees.get(doctor_name)
-        fee_str = f" (Fee: ${float(fee):.2f})" if fee else ""
-        output += f"{doctor_name}: Available slots → {', '.join(am_pm_times)}{fee_str}\n"
-
-    return output
-
-
-@tool
+    options = {}
+    for doctor_name, slot_ts, consultation_fee in rows:
+        option = options.get(doctor_name)
+        if option is None:
+            option = options[doctor_name] = AvailabilityOption(
+                name=doctor_name, specialization=specialization, fee=_fee(consultation_fee)
+            )
+        option.slots.append(slot_ts.strftime("%H:%M"))
+
+    return _tool_output(
+        AvailabilityResult(
+            kind="doctor",
+            subject=specialization.replace("_", " "),
+            date=desired_date.date,
+            options=list(options.values()),
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
+def check_availability_by_doctor_range(
+    date_range: DateRangeModel,
+    doctor_name: DoctorName,
+    time_window: Optional[TimeWindowModel] = None,
+    limit: int = 10,
+):
+    """
+    Find the earliest open slots of a doctor between two dates (inclusive) in a single lookup,
+    optionally only within a time-of-day window. Use this for questions spanning several days
+    ("next week", "before Friday", "any morning this week") instead of checking day by day.
+    """
+    start_day, end_day, start_time, end_time, limit = _range_args(date_range, time_window, limit)
+    rows = availability_cache.doctor_range_slots(doctor_name, start_day, end_day, start_time, end_time, limit)
+
+    options = []
+    if rows:
+        options.append(
+            AvailabilityOption(
+                name=doctor_name,
+                fee=_fee(rows[0][1]),
+                slots=[r[0].strftime(slot_queries.SLOT_DATETIME_FORMAT) for r in rows],
+            )
+        )
+    return _tool_output(
+        AvailabilityResult(
+            kind="doctor",
+            subject=f"Dr. {doctor_name}",
+            date=_range_label(date_range),
+            options=options,
+            truncated=len(rows) >= limit,
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
+def check_availability_by_specialization_range(
+    date_range: DateRangeModel,
+    specialization: Specialization,
+    time_window: Optional[TimeWindowModel] = None,
+    limit: int = 10,
+):
+    """
+    Find the earliest open slots across all doctors of a specialization between two dates
+    (inclusive) in a single lookup, optionally only within a time-of-day window.
+    """
+    start_day, end_day, start_time, end_time, limit = _range_args(date_range, time_window, limit)
+    rows = availability_cache.specialization_range_slots(
+        specialization, start_day, end_day, start_time, end_time, limit
+    )
+
+    options = {}
+    for doctor_name, slot_ts, consultation_fee in rows:
+        option = options.get(doctor_name)
+        if option is None:
+            option = options[doctor_name] = AvailabilityOption(
+                name=doctor_name, specialization=specialization, fee=_fee(consultation_fee)
+            )
+        option.slots.append(slot_ts.strftime(slot_queries.SLOT_DATETIME_FORMAT))
+
+    return _tool_output(
+        AvailabilityResult(
+            kind="doctor",
+            subject=specialization.replace("_", " "),
+            date=_range_label(date_range),
+            options=list(options.values()),
+            truncated=len(rows) >= limit,
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
+def find_next_available(
+    specialization: Specialization,
+    after: Optional[DateTimeModel] = None,
+    limit: int = 5,
+    max_fee: Optional[float] = None,
+    preferred_doctor: Optional[str] = None,
+):
+    """
+    Find the earliest open slots across all doctors of a specialization, without needing a date.
+    Use for "first available cardiologist" style questions. `after` defaults to now; `max_fee`
+    drops doctors above the patient's budget; set `preferred_doctor` from the patient's memory
+    (preferred_doctor slot) to also list that doctor's earliest slots.
+    """
+    start = _search_start(after)
+    limit = max(1, min(limit, MAX_RANGE_SLOTS))
+    preferred = _doctor_key(preferred_doctor)
+    with get_connection() as conn, conn.cursor() as cur:
+        rows = slot_queries.fetch_next_doctor_slots(cur, specialization, start, limit, max_fee, preferred)
+
+    # Preferred doctor first, then doctors in order of their earliest slot
+    options = {}
+    for is_preferred, doctor_name, slot_ts, consultation_fee in sorted(rows, key=lambda r: (not r[0], r[2])):
+        option = options.get(doctor_name)
+        if option is None:
+            option = options[doctor_name] = AvailabilityOption(
+                name=doctor_name, specialization=specialization, fee=_fee(consultation_fee), preferred=is_preferred
+            )
+        slot = slot_ts.strftime(slot_queries.SLOT_DATETIME_FORMAT)
+        if slot not in option.slots:
+            option.slots.append(slot)
+    for option in options.values():
+        option.slots.sort(key=slot_queries.parse_slot_datetime)
+
+    return _tool_output(
+        AvailabilityResult(
+            kind="doctor",
+            subject=specialization.replace("_", " "),
+            date=f"{start.strftime(slot_queries.SLOT_DATETIME_FORMAT)} onwards",
+            options=list(options.values()),
+            truncated=True,
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
 def set_appointment(
     desired_date: DateTimeModel,
     id_number: IdentificationNumberModel,
-    doctor_name: Literal[
-        "lisa brown", "alexander turner", "sophia clark", "emily johnson", "olivia rodriguez", "matthew thompson", "daniel miller", "susan davis", "rebecca scott", "sarah wilson", "jennifer white", "nicholas adams", "laura mitchell", "michael green", "david lee", "amanda taylor", "ryan cooper", "kevin anderson", "christopher brown", "rachel moore", "kevin anderson", "jessica martinez", "daniel campbell", "ashley evans", "patricia davis", "robert stewart", "linda murphy", "william jones", "elizabeth taylor", "mark cook", "nancy thomas", "charles jackson", "paul rogers", "barbara harris", "sandra reed", "george howard", "margaret lewis", "carol torres", "kenneth peterson", "john doe"
-    ]
+    doctor_name: DoctorName
 ):
     """
     DEPRECATED: Use create_booking_request instead for new booking flow with confirmation and payment.
     Set appointment (book a slot) with the doctor in the Supabase PostgreSQL database.
     """
 
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Step 1: Check if the given slot is available and get consultation fee
-    check_query = """
-        SELECT consultation_fee
-        FROM doctor_appointments
-        WHERE doctor_name = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-          AND is_available = TRUE;
-    """
-
-    cur.execute(check_query, (doctor_name, desired_date.date))
-    available_slot = cur.fetchone()
-
-    if not available_slot:
-        cur.close()
-        conn.close()
-        return f"No available appointments for Dr. {doctor_name} at {desired_date.date}"
+    slot = slot_queries.parse_slot_datetime(desired_date.date)
+    # A repeated call for the same patient, doctor and slot returns the first call's result
+    key = booking_engine.idempotency_key("book", "doctor", doctor_name, slot, id_number.id)
+    return _tool_output(booking_engine.book_doctor(doctor_name, slot, id_number.id, key))
 
-    consultation_fee = available_slot[0]
 
-    # Step 2: Book (update) the appointment
-    update_query = """
-        UPDATE doctor_appointments
-        SET is_available = FALSE,
-            patient_to_attend = %s
-        WHERE doctor_name = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-          AND is_available = TRUE;
+@tool(response_format="content_and_artifact")
+def create_booking_request(
+    desired_date: DateTimeModel,
+    id_number: IdentificationNumberModel,
+    doctor_name: DoctorName,
+):
     """
-
-    cur.execute(update_query, (id_number.id, doctor_name, desired_date.date))
-    conn.commit()  # Commit the update
-
-    cur.close()
-    conn.close()
-
-    fee_str = f", Consultation Fee: ${float(consultation_fee):.2f}" if consultation_fee else ""
-    return f"Successfully booked Dr. {doctor_name} for {desired_date.date} (Patient ID: {id_number.id}{fee_str})"
+    Create a booking request (pending confirmation) for a doctor appointment.
+    The slot is held under the returned booking reference until the user confirms it with
+    confirm_booking; unconfirmed holds expire and the slot is released.
+    """
+    slot = slot_queries.parse_slot_datetime(desired_date.date)
+    key = booking_engine.idempotency_key("hold", "doctor", doctor_name, slot, id_number.id)
+    return _tool_output(booking_engine.hold_doctor(doctor_name, slot, id_number.id, key))
 
 
-@tool
+@tool(response_format="content_and_artifact")
 def cancel_appointment(
     date: DateTimeModel,
     id_number: IdentificationNumberModel,
-    doctor_name: Literal[
-        "lisa brown", "alexander turner", "sophia clark", "emily johnson", "olivia rodriguez", "matthew thompson", "daniel miller", "susan davis", "rebecca scott", "sarah wilson", "jennifer white", "nicholas adams", "laura mitchell", "michael green", "david lee", "amanda taylor", "ryan cooper", "kevin anderson", "christopher brown", "rachel moore", "kevin anderson", "jessica martinez", "daniel campbell", "ashley evans", "patricia davis", "robert stewart", "linda murphy", "william jones", "elizabeth taylor", "mark cook", "nancy thomas", "charles jackson", "paul rogers", "barbara harris", "sandra reed", "george howard", "margaret lewis", "carol torres", "kenneth peterson", "john doe"
-    ]
+    doctor_name: DoctorName
 ):
     """
     Cancel an existing appointment in the Supabase PostgreSQL database.
     The parameters MUST be mentioned by the user in the query.
     """
-    # 1️⃣ Connect to database
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # 2️⃣ Check if an appointment exists for the patient, doctor, and date
-    check_query = """
-        SELECT *
-        FROM doctor_appointments
-        WHERE doctor_name = %s
-          AND patient_to_attend = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s;
-    """
-
-    cur.execute(check_query, (doctor_name, str(id_number.id), date.date))
-    appointment = cur.fetchone()
-
-    if not appointment:
-        cur.close()
-        conn.close()
-        return f"No appointment found for Dr. {doctor_name} on {date.date} for patient ID {id_number.id}"
-
-    # 3️⃣ Update the record to mark the slot available again
-    update_query = """
-        UPDATE doctor_appointments
-        SET is_available = TRUE,
-            patient_to_attend = NULL
-        WHERE doctor_name = %s
-          AND patient_to_attend = %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s;
-    """
-
-    cur.execute(update_query, (doctor_name, str(id_number.id), date.date))
-    conn.commit()  # ✅ Commit the change
+    slot = slot_queries.parse_slot_datetime(date.date)
+    return _tool_output(booking_engine.cancel_doctor(doctor_name, slot, id_number.id))
 
-    cur.close()
-    conn.close()
-
-    return f"Successfully cancelled the appointment with Dr. {doctor_name} on {date.date} (Patient ID: {id_number.id})"
-
-@tool
+@tool(response_format="content_and_artifact")
 def reschedule_appointment(
     old_date: DateTimeModel,
     new_date: DateTimeModel,
     id_number: IdentificationNumberModel,
-    doctor_name: Literal[
-        "lisa brown", "alexander turner", "sophia clark", "emily johnson", "olivia rodriguez", "matthew thompson", "daniel miller", "susan davis", "rebecca scott", "sarah wilson", "jennifer white", "nicholas adams", "laura mitchell", "michael green", "david lee", "amanda taylor", "ryan cooper", "kevin anderson", "christopher brown", "rachel moore", "kevin anderson", "jessica martinez", "daniel campbell", "ashley evans", "patricia davis", "robert stewart", "linda murphy", "william jones", "elizabeth taylor", "mark cook", "nancy thomas", "charles jackson", "paul rogers", "barbara harris", "sandra reed", "george howard", "margaret lewis", "carol torres", "kenneth peterson", "john doe"
-    ]
+    doctor_name: DoctorName
 ):
     """
     Reschedule an appointment in the Supabase PostgreSQL database.
     """
 
-    conn = connect_to_db()
+    old_slot = slot_queries.parse_slot_datetime(old_date.date)
+    new_slot = slot_queries.parse_slot_datetime(new_date.date)
+    key = booking_engine.idempotency_key(f"reschedule:{old_slot.isoformat()}", "doctor", doctor_name, new_slot, id_number.id)
 
     try:
-        with conn:  # ✅ psycopg2 will manage BEGIN / COMMIT / ROLLBACK automatically
-            with conn.cursor() as cur:
-
-                # 1️⃣ Check if the new slot is available and get consultation fee
-                cur.execute("""
-                    SELECT consultation_fee
-                    FROM doctor_appointments
-                    WHERE doctor_name = %s
-                      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-                      AND is_available = TRUE;
-                """, (doctor_name, new_date.date))
-
-                new_slot = cur.fetchone()
-                if not new_slot:
-                    return f"Not available slots for Dr. {doctor_name} at {new_date.date}"
-                
-                consultation_fee = new_slot[0]
-
-                # 2️⃣ Cancel old appointment
-                cur.execute("""
-                    UPDATE doctor_appointments
-                    SET is_available = TRUE,
-                        patient_to_attend = NULL
-                    WHERE doctor_name = %s
-                      AND patient_to_attend::TEXT = %s
-                      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s;
-                """, (doctor_name, str(id_number.id), old_date.date))
-
-                # 3️⃣ Book new appointment
-                cur.execute("""
-                    UPDATE doctor_appointments
-                    SET is_available = FALSE,
-                        patient_to_attend = %s
-                    WHERE doctor_name = %s
-                      AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-                      AND is_available = TRUE;
-                """, (str(id_number.id), doctor_name, new_date.date))
-
-        conn.close()
-        fee_str = f", Consultation Fee: ${float(consultation_fee):.2f}" if consultation_fee else ""
-        return f"Successfully rescheduled appointment with Dr. {doctor_name} from {old_date.date} to {new_date.date} (Patient ID: {id_number.id}{fee_str})"
-
+        return _tool_output(booking_engine.reschedule_doctor(doctor_name, old_slot, new_slot, id_number.id, key))
     except Exception as e:
-        conn.close()
-        return f"Error during rescheduling: {e}"
+        return _tool_output(
+            BookingResult(
+                kind="doctor", status="error", detail=doctor_name, date=new_date.date,
+                previous_date=old_date.date, patient_id=id_number.id, message=f"Error during rescheduling: {e}",
+            )
+        )
 
 
 # Lab Test Tools
 
 
-@tool
+@tool(response_format="content_and_artifact")
 def check_lab_availability(
     desired_date: DateModel,
-    test_name: Literal[
-        "lipid panel", "complete blood count", "blood glucose test", "thyroid function test", "liver function test", "kidney function test", "Urine Analysis", "chest x-ray", "ecg", "vitamin d test"
-        ]
+    test_name: LabTestName
 ):
     """
     Check available lab test slots for a given date. If test_name is provided, filters by that test.
     Returns available time slots.
     """
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    if test_name:
-        query = """
-            SELECT test_name, TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'HH24:MI') AS time_slot, price
-            FROM lab_tests
-            WHERE test_name ILIKE %s
-              AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
-              AND is_available = TRUE
-            ORDER BY TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
-        """
-        cur.execute(query, (test_name, desired_date.date))
-    else:
-        query = """
-            SELECT test_name, TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'HH24:MI') AS time_slot, price
-            FROM lab_tests
-            WHERE TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY') = %s
-              AND is_available = TRUE
-            ORDER BY test_name, TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI');
-        """
-        cur.execute(query, (desired_date.date,))
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    if not rows:
-        return f"No available lab test slots on {desired_date.date}" + (f" for {test_name}" if test_name else "")
-
-    # Group by test name
-    availability = {}
-    for test, time_slot, price in rows:
-        if test not in availability:
-            availability[test] = []
-        availability[test].append((time_slot, float(price)))
-
-    output = f"Available lab test slots on {desired_date.date}:\n"
-    for test, slots in availability.items():
-        slot_times = [f"{time} (${price:.2f})" for time, price in slots]
-        output += f"{test}: {', '.join(slot_times)}\n"
-
-    return output
-
-
-@tool
+    rows = availability_cache.lab_day_slots(test_name, slot_queries.parse_slot_date(desired_date.date))
+
+    # Group by test name and price
+    options = {}
+    for test, slot_ts, price in rows:
+        option = options.get((test, price))
+        if option is None:
+            option = options[(test, price)] = AvailabilityOption(name=test, fee=_fee(price))
+        option.slots.append(slot_ts.strftime("%H:%M"))
+
+    return _tool_output(
+        AvailabilityResult(kind="lab", subject=test_name, date=desired_date.date, options=list(options.values()))
+    )
+
+
+@tool(response_format="content_and_artifact")
+def check_lab_availability_range(
+    date_range: DateRangeModel,
+    test_name: LabTestName,
+    time_window: Optional[TimeWindowModel] = None,
+    limit: int = 10,
+):
+    """
+    Find the earliest open slots for a lab test between two dates (inclusive) in a single lookup,
+    optionally only within a time-of-day window.
+    """
+    start_day, end_day, start_time, end_time, limit = _range_args(date_range, time_window, limit)
+    rows = availability_cache.lab_range_slots(test_name, start_day, end_day, start_time, end_time, limit)
+
+    options = {}
+    for test, slot_ts, price in rows:
+        option = options.get((test, price))
+        if option is None:
+            option = options[(test, price)] = AvailabilityOption(name=test, fee=_fee(price))
+        option.slots.append(slot_ts.strftime(slot_queries.SLOT_DATETIME_FORMAT))
+
+    return _tool_output(
+        AvailabilityResult(
+            kind="lab",
+            subject=test_name,
+            date=_range_label(date_range),
+            options=list(options.values()),
+            truncated=len(rows) >= limit,
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
+def find_next_available_lab(
+    test_name: LabTestName,
+    after: Optional[DateTimeModel] = None,
+    limit: int = 5,
+    max_price: Optional[float] = None,
+):
+    """
+    Find the earliest open slots for a lab test, without needing a date. `after` defaults to now;
+    `max_price` drops slots above the patient's budget.
+    """
+    start = _search_start(after)
+    limit = max(1, min(limit, MAX_RANGE_SLOTS))
+    with get_connection() as conn, conn.cursor() as cur:
+        rows = slot_queries.fetch_next_lab_slots(cur, test_name, start, limit, max_price)
+
+    options = {}
+    for test, slot_ts, price in rows:
+        option = options.get((test, price))
+        if option is None:
+            option = options[(test, price)] = AvailabilityOption(name=test, fee=_fee(price))
+        option.slots.append(slot_ts.strftime(slot_queries.SLOT_DATETIME_FORMAT))
+
+    return _tool_output(
+        AvailabilityResult(
+            kind="lab",
+            subject=test_name,
+            date=f"{start.strftime(slot_queries.SLOT_DATETIME_FORMAT)} onwards",
+            options=list(options.values()),
+            truncated=True,
+        )
+    )
+
+
+@tool(response_format="content_and_artifact")
 def create_lab_booking_request(
     desired_date: DateTimeModel,
     id_number: IdentificationNumberModel,
-    test_name: Literal[
-        "lipid panel", "complete blood count", "blood glucose test", "thyroid function test", "liver function test", "kidney function test", "urine analysis", "chest x-ray", "ecg", "vitamin d test"
-        ]
+    test_name: LabTestName
 ):
     """
     Create a booking request (pending confirmation) for a lab test.
-    This creates a booking record that requires user confirmation before payment.
-    """
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    # Check availability
-    check_query = """
-        SELECT test_name, date_slot, price
-        FROM lab_tests
-        WHERE test_name ILIKE %s
-          AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-          AND is_available = TRUE;
+    The slot is held under the returned booking reference until the user confirms it with
+    confirm_booking; unconfirmed holds expire and the slot is released.
     """
+    slot = slot_queries.parse_slot_datetime(desired_date.date)
+    key = booking_engine.idempotency_key("hold", "lab", test_name, slot, id_number.id)
+    return _tool_output(booking_engine.hold_lab(test_name, slot, id_number.id, key))
 
-    cur.execute(check_query, (test_name, desired_date.date))
-    available_slot = cur.fetchone()
 
-    if not available_slot:
-        cur.close()
-        conn.close()
-        return f"BOOKING_UNAVAILABLE: No available slots for {test_name} at {desired_date.date}"
+@tool(response_format="content_and_artifact")
+def validate_test_prerequisites(
+    test_name: LabTestName,
+    id_number: IdentificationNumberModel
+):
+    """
+    Validate prerequisites for a lab test (e.g., fasting requirements, previous tests needed).
+    """
+    with get_connection() as conn, conn.cursor() as cur:
+        result = slot_queries.fetch_lab_prerequisites(cur, test_name)
 
-    test_name_db, date_slot, price = available_slot
-    booking_ref = f"LAB-{uuid.uuid4().hex[:8].upper()}"
+    if not result:
+        return _tool_output(PrerequisitesResult(test_name=test_name, found=False))
 
-    update_query = """
-        UPDATE lab_tests 
-        SET is_available = FALSE,
-            patient_to_attend = %s
-        WHERE test_name ILIKE %s
-        AND TO_CHAR(TO_TIMESTAMP(date_slot, 'DD-MM-YYYY HH24:MI'), 'DD-MM-YYYY HH24:MI') = %s
-        AND is_available = TRUE;
-    """
+    prerequisites = result[0] or "No specific prerequisites required."
 
-    cur.execute(update_query, (str(id_number.id), test_name_db, desired_date.date))
-    
-    conn.commit()
+    return _tool_output(PrerequisitesResult(test_name=test_name, found=True, prerequisites=prerequisites))
 
-    cur.close()
-    conn.close()
 
-    return f"BOOKING_CREATED: Booking {booking_ref} created. Test: {test_name_db}, Date: {desired_date.date}, Amount: ${float(price):.2f}."  # Please confirm to proceed with payment.
+# Booking lifecycle tools (doctor and lab)
 
 
-@tool
-def validate_test_prerequisites(
-    test_name: Literal[
-        "lipid panel", "complete blood count", "blood glucose test", "thyroid function test", "liver function test", "kidney function test", "Urine Analysis", "chest x-ray", "ecg", "vitamin d test"
-        ],
-    id_number: IdentificationNumberModel
-):
+@tool(response_format="content_and_artifact")
+def confirm_booking(booking_reference: str, id_number: IdentificationNumberModel):
     """
-    Validate prerequisites for a lab test (e.g., fasting requirements, previous tests needed).
-    """
-    conn = connect_to_db()
-    cur = conn.cursor()
-
-    query = """
-        SELECT prerequisites
-        FROM lab_tests
-        WHERE test_name = %s
-        LIMIT 1;
+    Confirm a pending booking request by its reference (e.g. DOC-1A2B3C4D or LAB-1A2B3C4D).
+    Confirmed bookings are ready for payment.
     """
+    return _tool_output(booking_engine.confirm(booking_reference, id_number.id))
 
-    cur.execute(query, (test_name,))
-    result = cur.fetchone()
 
-    cur.close()
-    conn.close()
-
-    if not result:
-        return f"Test {test_name} not found in the system."
+@tool(response_format="content_and_artifact")
+def process_payment(booking_reference: str, id_number: IdentificationNumberModel):
+    """
+    Mark a confirmed booking as paid. Card details are collected by the payment form;
+    never pass them to this tool.
+    """
+    return _tool_output(booking_engine.pay(booking_reference, id_number.id))
 
-    prerequisites = result[0] or "No specific prerequisites required."
 
-    return f"Prerequisites for {test_name}:\n{prerequisites}\n\nPatient ID: {id_number.id}"
\ No newline at end of file
+@tool(response_format="content_and_artifact")
+def get_booking_status(booking_reference: str, id_number: IdentificationNumberModel):
+    """Look up a booking by its reference: what was booked, when, and whether it is pending, confirmed, paid, cancelled or expired."""
+    return _tool_output(booking_engine.lookup(booking_reference, id_number.id))
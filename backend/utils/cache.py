@@ -0,0 +1,122 @@
+"""
+Small thread-safe LRU cache with per-entry TTL and hit/miss counters.
+
+Every invalidation bumps `generation` and is logged with the keys it
+covered. A caller filling the cache from a slower source reads the
+generation before the lookup and passes it to set(), which drops the value
+only if an invalidation of that same key landed in between. A result read
+before a concurrent write is never cached over it, while fills of unrelated
+keys still land. The log keeps the last INVALIDATION_LOG_SIZE invalidations;
+a fill older than all of them is dropped to be safe.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+INVALIDATION_LOG_SIZE = 1024
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # (generation, key matcher) per invalidation; fills read before _horizon are always stale
+        self._invalidations: "deque[tuple]" = deque()
+        self._horizon = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "stale_sets": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def _invalidated(self, matches: Callable[[Hashable], bool]) -> None:
+        # Caller holds the lock. Logged even when nothing is cached: a fill of the key may be in flight
+        self._generation += 1
+        self._invalidations.append((self._generation, matches))
+        if len(self._invalidations) > INVALIDATION_LOG_SIZE:
+            self._horizon = self._invalidations.popleft()[0]
+
+    def _stale(self, key: Hashable, generation: int) -> bool:
+        if generation < self._horizon:
+            return True
+        for invalidated_at, matches in reversed(self._invalidations):
+            if invalidated_at <= generation:
+                return False
+            if matches(key):
+                return True
+        return False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.stats["misses"] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(
+        self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None, generation: Optional[int] = None
+    ) -> None:
+        """Store the value; with `generation`, only if the key was not invalidated since it was read."""
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if generation is not None and self._stale(key, generation):
+                self.stats["stale_sets"] += 1
+                return
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._invalidated(lambda other: other == key)
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.stats["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches the predicate; returns how many were dropped."""
+        with self._lock:
+            self._invalidated(predicate)
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidated(lambda key: True)
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,153 @@
+"""
+Server-side conversation threads on top of LangGraph checkpointing.
+
+With a checkpointer configured (db/checkpointer.py), every turn runs on a
+thread and the graph resumes from the thread's last checkpoint. The client
+only sends the new message, and follow-ups such as "book the 10:30 one" see
+the earlier turns verbatim instead of through the memory summary. Clients
+pass thread_id to keep several conversations apart; thread IDs are scoped
+to the patient, and without one each patient has a single default thread.
+
+Each turn of a resumed thread:
+- resets the per-turn routing fields (next, steps_taken, ...) and appends
+  the new user message; persistent memory is only loaded when a thread starts,
+- is compacted first: messages older than the last CHECKPOINT_KEEP_TURNS user
+  turns are removed from the state (RemoveMessage), so checkpoints and every
+  node reading the state stay bounded,
+- holds the thread's lock while it reads the state and runs, so concurrent
+  turns on one thread (double submits, several tabs) run one after the other
+  instead of overwriting each other's checkpoints (per process); meanwhile
+  the checkpointer keeps its per-step checkpoints in memory and writes the
+  turn's last one when the turn ends, if it supports that (deferred()),
+- is counted; the memory summary runs after the first turn (so even a
+  one-message conversation reaches memory) and then once every
+  CHECKPOINT_SUMMARY_EVERY_TURNS turns over the turns since the last summary,
+  instead of after every turn. Keep it at most CHECKPOINT_KEEP_TURNS so turns
+  are summarized before compaction drops them. When the checkpoint pruner
+  expires a thread, its turns since the last summary are summarized first
+  (summarize_expired_thread).
+
+Configuration (environment variables):
+    CHECKPOINT_KEEP_TURNS            user turns kept in a thread's state (default 6)
+    CHECKPOINT_SUMMARY_EVERY_TURNS   turns per memory summary on a thread (default 3)
+"""
+
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+
+from utils.memory import aload_memory_bundle, format_memory_context
+from utils.memory_queue import memory_updates
+from utils.message_window import MEMORY_MESSAGE_PREFIX
+
+CHECKPOINT_KEEP_TURNS = int(os.getenv("CHECKPOINT_KEEP_TURNS", "6"))
+CHECKPOINT_SUMMARY_EVERY_TURNS = int(os.getenv("CHECKPOINT_SUMMARY_EVERY_TURNS", "3"))
+
+DEFAULT_THREAD_ID = "default"
+
+# thread id -> lock of the turn running on it; entries go away with the last waiter
+_thread_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def thread_config(id_number: int, thread_id: Optional[str] = None) -> Dict[str, Any]:
+    """Checkpointer config of the patient's thread; a thread ID never reaches another patient's state."""
+    return {"configurable": {"thread_id": f"{id_number}:{thread_id or DEFAULT_THREAD_ID}"}}
+
+
+@asynccontextmanager
+async def thread_turn(app_graph: Any, config: Dict[str, Any]) -> AsyncIterator[None]:
+    """Run one turn on the config's thread: serialized with its other turns, checkpoints written at the end."""
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if thread_id is None:
+        yield
+        return
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    async with lock:
+        deferred = getattr(app_graph.checkpointer, "deferred", None)
+        if deferred is None:
+            yield
+            return
+        async with deferred(thread_id):
+            yield
+
+
+def split_turns(messages: List[Any]) -> List[List[Any]]:
+    """Messages grouped per user turn; anything before the first user message joins the first turn."""
+    turns: List[List[Any]] = []
+    for message in messages or []:
+        if isinstance(message, HumanMessage) and turns and any(isinstance(m, HumanMessage) for m in turns[-1]):
+            turns.append([])
+        if not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def current_turn(messages: List[Any]) -> List[Any]:
+    """The latest user message and everything after it."""
+    turns = split_turns(messages)
+    if not turns:
+        return []
+    latest = turns[-1]
+    for index, message in enumerate(latest):
+        if isinstance(message, HumanMessage):
+            return latest[index:]
+    return latest
+
+
+def compaction(messages: List[Any], keep_turns: int = CHECKPOINT_KEEP_TURNS) -> List[RemoveMessage]:
+    """Removals that leave room for one new turn within the last keep_turns turns of the thread."""
+    turns = split_turns(messages)
+    keep_previous = max(0, keep_turns - 1)
+    dropped = turns[:len(turns) - keep_previous] if keep_previous else turns
+    return [RemoveMessage(id=message.id) for turn in dropped for message in turn if message.id]
+
+
+def summarized_turns(turn_count: int) -> int:
+    """How many of a thread's first turn_count turns its summaries cover: the first, then every N-th."""
+    every = max(1, CHECKPOINT_SUMMARY_EVERY_TURNS)
+    return max(min(turn_count, 1), turn_count - turn_count % every)
+
+
+async def schedule_memory_update(id_number: int, messages: List[Any], turn_count: Optional[int] = None) -> None:
+    """
+    Queue the memory summary after a turn. Stateless turns (turn_count None)
+    are summarized every time; a thread's turns only once a summary is due.
+    """
+    if turn_count is None:
+        memory_updates.submit(id_number, messages)
+        return
+    if summarized_turns(turn_count) != turn_count:
+        return
+    await _submit_turns(id_number, messages, turn_count - summarized_turns(turn_count - 1))
+
+
+async def summarize_expired_thread(values: Dict[str, Any]) -> bool:
+    """Queue the summary of a thread's turns since its last summary, before the thread is deleted."""
+    turn_count = values.get("turn_count", 0)
+    pending = turn_count - summarized_turns(turn_count)
+    if pending <= 0 or "id_number" not in values:
+        return False
+    await _submit_turns(values["id_number"], values.get("messages", []), pending)
+    return True
+
+
+async def _submit_turns(id_number: int, messages: List[Any], count: int) -> None:
+    turns = split_turns(messages)[-count:]
+    turns = [
+        [m for m in turn if not (isinstance(m, SystemMessage) and str(m.content).startswith(MEMORY_MESSAGE_PREFIX))]
+        for turn in turns
+    ]
+    # The new summary replaces the stored one, so the summarizer must see the memory as it is now
+    memory_context = format_memory_context(await aload_memory_bundle(id_number))
+    if memory_context and turns:
+        turns[0].insert(0, SystemMessage(content=f"{MEMORY_MESSAGE_PREFIX}\n{memory_context}"))
+    # Submitted together, the turns are coalesced into one summarization
+    for turn in turns:
+        memory_updates.submit(id_number, turn)
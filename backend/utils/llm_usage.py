@@ -0,0 +1,74 @@
+"""
+Token usage per graph node, including prompt tokens served from the provider cache.
+
+Every chat model built by utils.llms.get_chat_model carries an LLMUsageTracker
+callback. On each call it reads the response's usage_metadata (input, output
+and input_token_details.cache_read tokens) and adds it to the totals of the
+agent node that made the call. OpenAI caches prompt prefixes of 1024 tokens
+or more, so cached_tokens only moves for calls whose static prefix (system
+prompt plus earlier conversation) is at least that long.
+"""
+
+import threading
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from utils.streaming import agent_node_path
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(node: str, usage: Dict[str, Any]) -> None:
+    details = usage.get("input_token_details") or {}
+    with _stats_lock:
+        entry = _stats.setdefault(node, {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+        entry["calls"] += 1
+        entry["input_tokens"] += usage.get("input_tokens", 0) or 0
+        entry["cached_tokens"] += details.get("cache_read", 0) or 0
+        entry["output_tokens"] += usage.get("output_tokens", 0) or 0
+
+
+def llm_usage_stats() -> Dict[str, Dict[str, Any]]:
+    """Token totals per node plus the share of prompt tokens read from the provider cache."""
+    with _stats_lock:
+        report = {node: dict(entry) for node, entry in _stats.items()}
+    for entry in report.values():
+        entry["cache_hit_ratio"] = (
+            round(entry["cached_tokens"] / entry["input_tokens"], 3) if entry["input_tokens"] else 0.0
+        )
+    return report
+
+
+def reset_llm_usage_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+class LLMUsageTracker(BaseCallbackHandler):
+    def __init__(self):
+        self._nodes: Dict[UUID, str] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        with self._lock:
+            self._nodes[run_id] = agent_node_path(metadata or {})
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            node = self._nodes.pop(run_id, "unknown")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    _record(node, usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._nodes.pop(run_id, None)
+
+
+usage_tracker = LLMUsageTracker()
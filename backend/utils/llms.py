@@ -1,25 +1,120 @@
+import logging
 import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
 # from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
+from utils.llm_usage import usage_tracker
+from utils.tracing import llm_span_tracker
 load_dotenv()
+
+logger = logging.getLogger(__name__)
 # api_key = os.getenv("GROQ_API_KEY")
 OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
 os.environ["OPENAI_API_KEY"]=OPENAI_API_KEY
 
+# One tuned connection pool shared by every chat model in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Off by default: needs the h2 package (pip install "httpx[http2]"), which requirements.txt does not install
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when the h2 package is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_models: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], ChatOpenAI] = {}
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "http2": LLM_HTTP2 and HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    }
+
+
+def _shared_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    global _http_client, _http_async_client
+    if _http_client is None:
+        if LLM_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning('LLM_HTTP2 is on but the h2 package is missing; install "httpx[http2]". Using HTTP/1.1')
+        _http_client = httpx.Client(**_client_options())
+        _http_async_client = httpx.AsyncClient(**_client_options())
+    return _http_client, _http_async_client
+
+
+def get_chat_model(model_name: str = "gpt-4o", **params) -> ChatOpenAI:
+    """
+    Return the process-wide ChatOpenAI for this model name and parameters.
+    All models share one sync and one async httpx pool, so TLS connections to
+    the provider are reused and LLM_MAX_CONNECTIONS caps total concurrency.
+    Token usage, including cached prompt tokens, is recorded by utils.llm_usage
+    and every call is traced as an llm.chat span by utils.tracing.
+    """
+    if not model_name:
+        raise ValueError("Model is not defined.")
+    key = (model_name, tuple(sorted(params.items())))
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                http_client, http_async_client = _shared_http_clients()
+                options = {"max_retries": LLM_MAX_RETRIES, "timeout": LLM_REQUEST_TIMEOUT, **params}
+                model = ChatOpenAI(
+                    model=model_name,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                    callbacks=[usage_tracker, llm_span_tracker],
+                    **options,
+                )
+                _models[key] = model
+    return model
+
+
+async def close_llm_clients() -> None:
+    """Close the shared connection pools; models are rebuilt on next use."""
+    global _http_client, _http_async_client
+    with _lock:
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+        _models.clear()
+    if http_async_client is not None:
+        await http_async_client.aclose()
+    if http_client is not None:
+        http_client.close()
+
+
 class LLMModel:
-    def __init__(self, model_name="gpt-4o"):
+    def __init__(self, model_name="gpt-4o", **params):
         if not model_name:
             raise ValueError("Model is not defined.")
         self.model_name = model_name
-        self.openai_model=ChatOpenAI(model=self.model_name)
-        
+        self.openai_model = get_chat_model(self.model_name, **params)
+
     def get_model(self):
         return self.openai_model
 
 if __name__ == "__main__":
-    llm_instance = LLMModel()  
+    llm_instance = LLMModel()
     llm_model = llm_instance.get_model()
     response=llm_model.invoke("hi")
 
-    print(response)
\ No newline at end of file
+    print(response)
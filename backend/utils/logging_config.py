@@ -0,0 +1,213 @@
+"""
+Process-wide logging: leveled, structured, sampled and non-blocking.
+
+configure_logging() installs a single QueueHandler on the root logger. The
+calling thread only filters the record and puts it on a bounded queue; a
+QueueListener thread formats it (JSON lines by default) and writes it to
+stderr, so a slow log pipeline never stalls a request. When the queue is
+full records are dropped and counted instead of blocking.
+
+Every record carries the request ID of the HTTP request it was logged in
+(set by the middleware in main.py from X-Request-ID, or generated) and the
+trace ID of the current span when tracing is on. Extra fields passed with
+logger.info(..., extra={...}) become JSON keys; string fields and messages
+longer than LOG_MAX_FIELD_CHARS are truncated, so a record's size does not
+grow with the conversation.
+
+Sampling is decided once per request: a sampled request keeps all of its
+records, an unsampled one keeps only WARNING and above. Records logged
+outside a request (startup, shutdown, background workers) are always kept.
+
+Configuration (environment variables):
+    LOG_LEVEL            root level (default INFO)
+    LOG_FORMAT           json (default) | text
+    LOG_SAMPLE_RATIO     share of requests whose sub-WARNING records are kept, 0-1 (default 1.0)
+    LOG_MAX_FIELD_CHARS  truncation limit for messages and string fields (default 500)
+    LOG_QUEUE_SIZE       records waiting to be written before new ones are dropped (default 10000)
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from utils.tracing import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATIO = float(os.getenv("LOG_SAMPLE_RATIO", "1.0"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# (request id, sampled) of the request being served
+_request: ContextVar[Optional[Tuple[str, bool]]] = ContextVar("log_request", default=None)
+
+# LogRecord attributes that are not user-supplied extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "trace_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+_stats = {"dropped": 0, "sampled_out": 0}
+
+
+def truncate(value: Any, limit: int = LOG_MAX_FIELD_CHARS) -> Any:
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    return value
+
+
+def begin_request(request_id: Optional[str] = None, sample_ratio: float = LOG_SAMPLE_RATIO) -> str:
+    """Bind a request ID (and this request's sampling decision) to the current context; returns the ID."""
+    request_id = request_id or uuid.uuid4().hex
+    _request.set((request_id, random.random() < sample_ratio))
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    request = _request.get()
+    return request[0] if request else None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the request and trace IDs and applies per-request sampling."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = _request.get()
+        if request is not None and not request[1] and record.levelno < logging.WARNING:
+            _stats["sampled_out"] += 1
+            return False
+        record.request_id = request[0] if request else None
+        record.trace_id = current_trace_id()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge args into the message here; formatting happens on the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = truncate(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "trace_id"):
+            if getattr(record, key, None):
+                entry[key] = getattr(record, key)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = truncate(value)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.request_id = getattr(record, "request_id", None) or "-"
+        extras = {k: truncate(v) for k, v in record.__dict__.items() if k not in _RECORD_ATTRIBUTES and not k.startswith("_")}
+        line = super().format(record)
+        return f"{line} {extras}" if extras else line
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, queue_size: int = LOG_QUEUE_SIZE) -> None:
+    """Route all logging through the background queue; safe to call more than once."""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _handler = handler
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def close_logging() -> None:
+    """Write every queued record and stop the listener thread; later records are written directly."""
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger(__name__).info(f"Logging stopped: {logging_stats()}")
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    for stream in _listener.handlers:
+        root.addHandler(stream)
+    _listener = _handler = None
+
+
+def logging_stats() -> Dict[str, int]:
+    return dict(_stats)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that binds each HTTP request to a request ID and echoes it as X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger(__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        request_id = begin_request(incoming.decode("latin-1")[:64] if incoming else None)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            self.logger.info(
+                f"{scope['method']} {scope['path']} {status}",
+                extra={"status": status, "duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+            )
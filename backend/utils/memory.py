@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import logging
+from functools import lru_cache
 from typing import Any, Dict, List, TypedDict
 
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from utils.data_access import load_json_file, write_json_file
 from utils.llms import LLMModel
+from utils.memory_store import ConcurrentModificationError, get_memory_store
 
-MEMORY_FILENAME = "conversation_memory.json"
+logger = logging.getLogger(__name__)
+
+# Attempts at the read-merge-write cycle before giving up on a contended record
+MAX_WRITE_ATTEMPTS = 3
+
+# Most recent messages of a turn that are shown to the summarizer
+SUMMARY_WINDOW = 10
 
 
 class MemoryRecord(TypedDict, total=False):
@@ -17,19 +26,7 @@ class MemoryRecord(TypedDict, total=False):
     last_updated: str
 
 
-def _load_memory_store() -> Dict[str, MemoryRecord]:
-    return load_json_file(MEMORY_FILENAME, default={}) or {}
-
-
-def _write_memory_store(store: Dict[str, MemoryRecord]) -> None:
-    write_json_file(MEMORY_FILENAME, store)
-
-
-def load_memory_bundle(id_number: int) -> Dict[str, Any]:
-    """Return stored memory for the patient."""
-    store = _load_memory_store()
-    conversation_memory = store.get(str(id_number), {})
-
+def _bundle_from_record(conversation_memory: MemoryRecord) -> Dict[str, Any]:
     bundle: Dict[str, Any] = {
         "summary": conversation_memory.get("summary", ""),
         "slots": conversation_memory.get("slots", {}),
@@ -37,6 +34,18 @@ def load_memory_bundle(id_number: int) -> Dict[str, Any]:
     return bundle
 
 
+def load_memory_bundle(id_number: int) -> Dict[str, Any]:
+    """Return stored memory for the patient."""
+    record, _ = get_memory_store().load(id_number)
+    return _bundle_from_record(record)
+
+
+async def aload_memory_bundle(id_number: int) -> Dict[str, Any]:
+    """Async variant of load_memory_bundle."""
+    record, _ = await asyncio.to_thread(get_memory_store().load, id_number)
+    return _bundle_from_record(record)
+
+
 def format_memory_context(bundle: Dict[str, Any]) -> str:
     if not bundle:
         return ""
@@ -50,18 +59,15 @@ def format_memory_context(bundle: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def summarize_and_store_conversation(id_number: int, messages: List[Any]) -> MemoryRecord:
-    """Summarize the latest exchange and persist it."""
+def _summary_prompt(messages: List[Any], max_messages: int = SUMMARY_WINDOW) -> List[Any]:
     transcript = []
-    for message in messages[-10:]:
+    for message in messages[-max_messages:]:
         role = getattr(message, "name", None) or message.type
         content = getattr(message, "content", "")
         transcript.append(f"{role.upper()}: {content}")
     transcript_text = "\n".join(transcript)
 
-    llm = LLMModel().get_model()
-
-    summary_prompt = [
+    return [
         SystemMessage(
             content=(
                 "You maintain persistent CRM memory for a dental assistant agent. "
@@ -73,19 +79,55 @@ def summarize_and_store_conversation(id_number: int, messages: List[Any]) -> Mem
         HumanMessage(content=f"Conversation transcript:\n{transcript_text}"),
     ]
 
-    parser = llm.with_structured_output(MemoryRecord)
-    memory_update = parser.invoke(summary_prompt)
-    memory_update["last_updated"] = datetime.datetime.utcnow().isoformat()
 
-    store = _load_memory_store()
-    existing = store.get(str(id_number), {})
-    merged_slots = existing.get("slots", {})
+def _merge_memory_update(existing: MemoryRecord, memory_update: MemoryRecord) -> MemoryRecord:
+    merged_slots = dict(existing.get("slots", {}))
     merged_slots.update(memory_update.get("slots") or {})
 
-    store[str(id_number)] = {
+    return {
         "summary": memory_update.get("summary", existing.get("summary", "")),
         "slots": merged_slots,
         "last_updated": memory_update["last_updated"],
     }
-    _write_memory_store(store)
-    return store[str(id_number)]
+
+
+def _store_memory_update(id_number: int, memory_update: MemoryRecord) -> MemoryRecord:
+    """Merge the update into the patient's record with optimistic concurrency, retrying on conflicts."""
+    store = get_memory_store()
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        existing, version = store.load(id_number)
+        record = _merge_memory_update(existing, memory_update)
+        try:
+            store.save(id_number, record, expected_version=version)
+            return record
+        except ConcurrentModificationError:
+            if attempt == MAX_WRITE_ATTEMPTS:
+                raise
+            logger.info(f"Memory for patient {id_number} changed concurrently, retrying merge ({attempt})")
+    return record
+
+
+@lru_cache(maxsize=1)
+def _memory_parser():
+    """Structured-output summarizer, built once and shared by every summarization."""
+    return LLMModel().get_model().with_structured_output(MemoryRecord)
+
+
+def summarize_and_store_conversation(
+    id_number: int, messages: List[Any], max_messages: int = SUMMARY_WINDOW
+) -> MemoryRecord:
+    """Summarize the latest exchange and persist it."""
+    memory_update = _memory_parser().invoke(_summary_prompt(messages, max_messages))
+    memory_update["last_updated"] = datetime.datetime.utcnow().isoformat()
+
+    return _store_memory_update(id_number, memory_update)
+
+
+async def asummarize_and_store_conversation(
+    id_number: int, messages: List[Any], max_messages: int = SUMMARY_WINDOW
+) -> MemoryRecord:
+    """Async variant of summarize_and_store_conversation."""
+    memory_update = await _memory_parser().ainvoke(_summary_prompt(messages, max_messages))
+    memory_update["last_updated"] = datetime.datetime.utcnow().isoformat()
+
+    return await asyncio.to_thread(_store_memory_update, id_number, memory_update)
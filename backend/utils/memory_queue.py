@@ -0,0 +1,133 @@
+"""
+Background pipeline that summarizes finished conversations into patient memory.
+
+Request handlers call submit() and return immediately; a small pool of asyncio
+workers runs the summarization LLM call and the memory-store write. Turns that
+arrive for a patient whose update is still pending are coalesced into that
+update, so a burst of turns costs one summarization. The backlog is bounded by
+the number of distinct patients waiting; when it is full new patients are
+dropped (and counted) rather than slowing down requests.
+
+Configuration (environment variables):
+    MEMORY_QUEUE_WORKERS         concurrent summarizations (default 2)
+    MEMORY_QUEUE_MAX_BACKLOG     max patients waiting for an update (default 1000)
+    MEMORY_QUEUE_FLUSH_TIMEOUT   seconds to drain the backlog on shutdown (default 30)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from utils.memory import SUMMARY_WINDOW, asummarize_and_store_conversation
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+MEMORY_QUEUE_WORKERS = int(os.getenv("MEMORY_QUEUE_WORKERS", "2"))
+MEMORY_QUEUE_MAX_BACKLOG = int(os.getenv("MEMORY_QUEUE_MAX_BACKLOG", "1000"))
+MEMORY_QUEUE_FLUSH_TIMEOUT = float(os.getenv("MEMORY_QUEUE_FLUSH_TIMEOUT", "30"))
+
+
+class MemoryUpdateQueue:
+    def __init__(
+        self,
+        workers: int = MEMORY_QUEUE_WORKERS,
+        max_backlog: int = MEMORY_QUEUE_MAX_BACKLOG,
+        summarize=asummarize_and_store_conversation,
+    ):
+        self.workers = max(1, workers)
+        self.max_backlog = max_backlog
+        self._summarize = summarize
+        # patient id -> message lists of the turns waiting to be summarized
+        self._pending: Dict[int, List[List[Any]]] = {}
+        # patients currently being summarized; new turns wait in _pending until they finish
+        self._in_flight: Set[int] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+        self.stats = {"submitted": 0, "coalesced": 0, "dropped": 0, "processed": 0, "failed": 0}
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._closed = False
+        # Turns submitted before start() are picked up now
+        for id_number in self._pending:
+            self._queue.put_nowait(id_number)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"memory-worker-{i}") for i in range(self.workers)]
+        logger.info(f"Memory update queue started with {self.workers} workers")
+
+    def submit(self, id_number: int, messages: List[Any]) -> bool:
+        """Schedule a memory update for the turn; returns False if it was dropped."""
+        if self._closed:
+            logger.warning(f"Memory queue is closed, dropping update for patient {id_number}")
+            self.stats["dropped"] += 1
+            return False
+
+        self.stats["submitted"] += 1
+        turns = self._pending.get(id_number)
+        if turns is not None:
+            turns.append(list(messages))
+            self.stats["coalesced"] += 1
+            return True
+
+        if len(self._pending) >= self.max_backlog:
+            logger.warning(f"Memory backlog full ({self.max_backlog} patients), dropping update for patient {id_number}")
+            self.stats["dropped"] += 1
+            return False
+
+        self._pending[id_number] = [list(messages)]
+        if self._queue is not None and id_number not in self._in_flight:
+            self._queue.put_nowait(id_number)
+        return True
+
+    def backlog(self) -> int:
+        return len(self._pending)
+
+    async def _worker(self) -> None:
+        while True:
+            id_number = await self._queue.get()
+            turns = self._pending.pop(id_number, None)
+            self._in_flight.add(id_number)
+            try:
+                if turns:
+                    messages = [message for turn in turns for message in turn]
+                    with span("memory.update", patient_id=id_number, turns=len(turns)):
+                        await self._summarize(id_number, messages, max_messages=SUMMARY_WINDOW * len(turns))
+                    self.stats["processed"] += 1
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception(f"Memory update failed for patient {id_number}")
+            finally:
+                self._in_flight.discard(id_number)
+                # Turns that arrived while this patient was in flight get their own pass
+                if id_number in self._pending:
+                    self._queue.put_nowait(id_number)
+                self._queue.task_done()
+
+    async def flush(self, timeout: float = MEMORY_QUEUE_FLUSH_TIMEOUT) -> bool:
+        """Wait up to timeout seconds for every queued update to finish; returns False on timeout."""
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: float = MEMORY_QUEUE_FLUSH_TIMEOUT) -> None:
+        """Stop accepting updates, drain the backlog (up to timeout seconds) and stop the workers."""
+        self._closed = True
+        if not await self.flush(timeout):
+            logger.warning(f"Memory queue flush timed out with {self.backlog()} patients pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        logger.info(f"Memory update queue stopped: {self.stats}")
+
+
+memory_updates = MemoryUpdateQueue()
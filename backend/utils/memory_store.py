@@ -0,0 +1,252 @@
+"""
+Per-patient storage backends for conversation memory.
+
+Each patient's MemoryRecord lives under its own key, so a turn only reads and
+writes that patient's record. Writes are conditional on the version that was
+read (S3 ETag, Postgres row version, or a content hash for local files) and
+raise ConcurrentModificationError when another writer got there first.
+
+Backend selection (environment variables):
+    MEMORY_BACKEND     s3 (default) | postgres | local
+    S3_MEMORY_PREFIX   key prefix for the s3 backend (default "memory/")
+    MEMORY_LOCAL_DIR   directory for the local backend (default "memory")
+    MEMORY_CACHE_MAX_ENTRIES   patients kept in the in-process cache (default 1024, 0 disables)
+    MEMORY_CACHE_TTL_SECONDS   how long a cached record is trusted (default 300)
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from psycopg2.extras import Json
+
+from utils.cache import TTLCache
+
+MemoryRecord = Dict[str, Any]
+
+
+class ConcurrentModificationError(RuntimeError):
+    """Raised when a conditional write finds the record changed since it was read."""
+
+
+class MemoryStore:
+    """Interface implemented by every memory backend."""
+
+    def load(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        """Return (record, version). A missing record is ({}, None)."""
+        raise NotImplementedError
+
+    def save(self, id_number: int, record: MemoryRecord, expected_version: Optional[str]) -> str:
+        """
+        Persist the record if the stored version still equals expected_version
+        (None = the record must not exist yet). Returns the new version.
+        """
+        raise NotImplementedError
+
+
+class S3MemoryStore(MemoryStore):
+    """One JSON object per patient at <prefix><id>.json, guarded by ETag conditional writes."""
+
+    def __init__(self, prefix: str = "memory/"):
+        self.prefix = prefix
+
+    def _key(self, id_number: int) -> str:
+        return f"{self.prefix}{id_number}.json"
+
+    def load(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        from utils.s3_data_access import load_json_object_with_etag
+
+        record, etag = load_json_object_with_etag(self._key(id_number))
+        return record or {}, etag
+
+    def save(self, id_number: int, record: MemoryRecord, expected_version: Optional[str]) -> str:
+        from utils.s3_data_access import S3PreconditionFailed, write_json_object_conditional
+
+        try:
+            return write_json_object_conditional(self._key(id_number), record, expected_version)
+        except S3PreconditionFailed as e:
+            raise ConcurrentModificationError(str(e)) from e
+
+
+class PostgresMemoryStore(MemoryStore):
+    """
+    Rows in the patient_memory table (db/migrations/002_patient_memory.sql),
+    with an integer version column used for optimistic concurrency.
+    """
+
+    def load(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        from db.connection_pool import get_connection
+
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT record, version FROM patient_memory WHERE patient_id = %s;",
+                (id_number,),
+            )
+            row = cur.fetchone()
+        if not row:
+            return {}, None
+        return row[0] or {}, str(row[1])
+
+    def save(self, id_number: int, record: MemoryRecord, expected_version: Optional[str]) -> str:
+        from db.connection_pool import get_connection
+
+        with get_connection() as conn, conn.cursor() as cur:
+            if expected_version is None:
+                cur.execute(
+                    """
+                    INSERT INTO patient_memory (patient_id, record, version, updated_at)
+                    VALUES (%s, %s, 1, NOW())
+                    ON CONFLICT (patient_id) DO NOTHING
+                    RETURNING version;
+                    """,
+                    (id_number, Json(record)),
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE patient_memory
+                    SET record = %s, version = version + 1, updated_at = NOW()
+                    WHERE patient_id = %s AND version = %s
+                    RETURNING version;
+                    """,
+                    (Json(record), id_number, int(expected_version)),
+                )
+            row = cur.fetchone()
+            conn.commit()
+
+        if not row:
+            raise ConcurrentModificationError(f"Memory for patient {id_number} was modified concurrently")
+        return str(row[0])
+
+
+class LocalFileMemoryStore(MemoryStore):
+    """One JSON file per patient in a local directory; a stand-in for S3 in tests and local runs."""
+
+    def __init__(self, directory: str = "memory"):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, id_number: int) -> str:
+        return os.path.join(self.directory, f"{id_number}.json")
+
+    def _read(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        try:
+            with open(self._path(id_number), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return {}, None
+        return json.loads(raw.decode("utf-8")), hashlib.sha1(raw).hexdigest()
+
+    def load(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        with self._lock:
+            return self._read(id_number)
+
+    def save(self, id_number: int, record: MemoryRecord, expected_version: Optional[str]) -> str:
+        raw = json.dumps(record, indent=2, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            _, current_version = self._read(id_number)
+            if current_version != expected_version:
+                raise ConcurrentModificationError(f"Memory for patient {id_number} was modified concurrently")
+
+            tmp_path = f"{self._path(id_number)}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, self._path(id_number))
+        return hashlib.sha1(raw).hexdigest()
+
+
+class CachingMemoryStore(MemoryStore):
+    """
+    Read-through, write-through LRU+TTL cache in front of another store.
+
+    Records are cached together with their version, so a stale entry (another
+    process wrote in the meantime) surfaces as a ConcurrentModificationError on
+    save; the entry is then invalidated and the caller's retry reads through.
+    """
+
+    def __init__(self, backend: MemoryStore, cache: TTLCache):
+        self.backend = backend
+        self.cache = cache
+
+    def load(self, id_number: int) -> Tuple[MemoryRecord, Optional[str]]:
+        cached = self.cache.get(id_number)
+        if cached is None:
+            cached = self.backend.load(id_number)
+            self.cache.set(id_number, cached)
+        record, version = cached
+        return copy.deepcopy(record), version
+
+    def save(self, id_number: int, record: MemoryRecord, expected_version: Optional[str]) -> str:
+        try:
+            version = self.backend.save(id_number, record, expected_version)
+        except ConcurrentModificationError:
+            self.cache.invalidate(id_number)
+            raise
+        self.cache.set(id_number, (copy.deepcopy(record), version))
+        return version
+
+    def invalidate(self, id_number: int) -> None:
+        self.cache.invalidate(id_number)
+
+
+_store: Optional[MemoryStore] = None
+_store_lock = threading.Lock()
+
+
+def create_memory_store(backend: Optional[str] = None) -> MemoryStore:
+    backend = (backend or os.getenv("MEMORY_BACKEND", "s3")).lower()
+    if backend == "s3":
+        return S3MemoryStore(prefix=os.getenv("S3_MEMORY_PREFIX", "memory/"))
+    if backend == "postgres":
+        return PostgresMemoryStore()
+    if backend == "local":
+        return LocalFileMemoryStore(directory=os.getenv("MEMORY_LOCAL_DIR", "memory"))
+    raise ValueError(f"Unknown MEMORY_BACKEND '{backend}'. Use 's3', 'postgres' or 'local'.")
+
+
+def create_cached_memory_store(backend: Optional[str] = None) -> MemoryStore:
+    """The configured backend wrapped in the in-process cache, unless the cache is disabled."""
+    store = create_memory_store(backend)
+    cache = TTLCache(
+        max_entries=int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=float(os.getenv("MEMORY_CACHE_TTL_SECONDS", "300")),
+    )
+    if not cache.enabled:
+        return store
+    return CachingMemoryStore(store, cache)
+
+
+def get_memory_store() -> MemoryStore:
+    """Return the process-wide memory store configured by MEMORY_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_cached_memory_store()
+    return _store
+
+
+def set_memory_store(store: Optional[MemoryStore]) -> None:
+    """Override the process-wide store (e.g. a LocalFileMemoryStore in tests)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def invalidate_memory(id_number: int) -> None:
+    """Drop a patient's cached record, e.g. after it was edited outside this process."""
+    store = get_memory_store()
+    if isinstance(store, CachingMemoryStore):
+        store.invalidate(id_number)
+
+
+def memory_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the memory cache (empty when caching is disabled)."""
+    store = get_memory_store()
+    if isinstance(store, CachingMemoryStore):
+        return store.cache.snapshot()
+    return {}
@@ -0,0 +1,185 @@
+"""
+Prompt-side windowing of the conversation passed to each LLM call.
+
+Graph state keeps every message, but each node only sends a bounded window:
+
+- the persistent-memory SystemMessage is dropped (every node's trailing
+  context message already carries memory_context),
+- routing summaries from earlier turns are dropped everywhere, and worker
+  nodes drop them entirely (the supervisor's reasoning and instructions
+  reach them through state instead),
+- the current turn (the latest user message onwards) is always sent
+  verbatim; long messages of earlier turns are truncated to
+  MESSAGE_WINDOW_MAX_CHARS,
+- when earlier turns do not fit the node's token budget, whole turns are
+  dropped from the front, and the cut only moves in steps of half the
+  budget.
+
+The window is laid out for provider prefix caching (see
+prompt_library/context.py): a message is truncated once, when its turn ends,
+and is byte-identical in every later call, and the first turn kept stays the
+same until the history has grown by another half budget. Consecutive calls
+therefore share everything up to the turn that just ended; only the tail
+changes. utils.llm_usage records the cached prompt tokens this buys per node.
+
+Token counts use tiktoken when its encoding is available and fall back to a
+4-characters-per-token estimate. Per-node before/after totals are collected
+in window_stats().
+
+Configuration (environment variables):
+    MESSAGE_WINDOW_ENABLED              "false" passes full history (default true)
+    MESSAGE_WINDOW_SUPERVISOR_TOKENS    budget for routing calls (default 2000)
+    MESSAGE_WINDOW_WORKER_TOKENS        budget for worker agents (default 3000)
+    MESSAGE_WINDOW_MAX_CHARS            cap for older messages (default 1500)
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+MESSAGE_WINDOW_ENABLED = os.getenv("MESSAGE_WINDOW_ENABLED", "true").lower() in ("1", "true", "yes")
+MESSAGE_WINDOW_SUPERVISOR_TOKENS = int(os.getenv("MESSAGE_WINDOW_SUPERVISOR_TOKENS", "2000"))
+MESSAGE_WINDOW_WORKER_TOKENS = int(os.getenv("MESSAGE_WINDOW_WORKER_TOKENS", "3000"))
+MESSAGE_WINDOW_MAX_CHARS = int(os.getenv("MESSAGE_WINDOW_MAX_CHARS", "1500"))
+
+# main.build_graph_input prefixes the memory SystemMessage with this
+MEMORY_MESSAGE_PREFIX = "Persistent memory:"
+
+# Routing summaries the supervisors append to the conversation
+ROUTING_MESSAGE_NAMES = {"supervisor", "top_supervisor", "lab_supervisor"}
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing or its encoding file cannot be fetched
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Any]) -> int:
+    total = 0
+    for message in messages:
+        content = getattr(message, "content", "")
+        total += count_text_tokens(content if isinstance(content, str) else str(content))
+        total += MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def _compact(message: Any, max_chars: int) -> Any:
+    content = getattr(message, "content", "")
+    if not isinstance(content, str) or len(content) <= max_chars:
+        return message
+    return message.model_copy(update={"content": content[:max_chars] + " …[truncated]"})
+
+
+def _turns(messages: List[Any]) -> List[List[Any]]:
+    turns: List[List[Any]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _record(node: str, before: int, after: int) -> None:
+    with _stats_lock:
+        entry = _stats.setdefault(node, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+        entry["calls"] += 1
+        entry["tokens_before"] += before
+        entry["tokens_after"] += after
+
+
+def window_stats() -> Dict[str, Dict[str, int]]:
+    """Message tokens per node before and after windowing, summed over calls."""
+    with _stats_lock:
+        return {node: dict(entry) for node, entry in _stats.items()}
+
+
+def reset_window_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def window_messages(
+    messages: List[Any],
+    node: str,
+    worker: bool = False,
+    budget: Optional[int] = None,
+    max_chars: Optional[int] = None,
+) -> List[Any]:
+    """Return the bounded slice of the conversation that `node` sends to its LLM."""
+    messages = list(messages or [])
+    before = count_message_tokens(messages)
+    if not MESSAGE_WINDOW_ENABLED:
+        _record(node, before, before)
+        return messages
+
+    if budget is None:
+        budget = MESSAGE_WINDOW_WORKER_TOKENS if worker else MESSAGE_WINDOW_SUPERVISOR_TOKENS
+    if max_chars is None:
+        max_chars = MESSAGE_WINDOW_MAX_CHARS
+
+    turn_start = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            turn_start = index
+            break
+
+    candidates = []
+    for index, message in enumerate(messages):
+        if isinstance(message, SystemMessage) and str(message.content).startswith(MEMORY_MESSAGE_PREFIX):
+            continue
+        if getattr(message, "name", None) in ROUTING_MESSAGE_NAMES and (worker or index < turn_start):
+            continue
+        candidates.append(message)
+
+    latest_human = None
+    for index in range(len(candidates) - 1, -1, -1):
+        if isinstance(candidates[index], HumanMessage):
+            latest_human = index
+            break
+    if latest_human is None:
+        # No user message to anchor a turn on: only the newest message counts as current
+        latest_human = max(len(candidates) - 1, 0)
+
+    current = candidates[latest_human:]
+    earlier = _turns([_compact(message, max_chars) for message in candidates[:latest_human]])
+    costs = [count_message_tokens(turn) for turn in earlier]
+    # Sized against the user's request only, so every call of the turn cuts at the same place
+    excess = sum(costs) - max(0, budget - count_message_tokens(current[:1]))
+    if excess > 0:
+        # Cut at the first turn past a multiple of half the budget, so the cut stays put across calls
+        step = max(1, budget // 2)
+        cut = -(-excess // step) * step
+        dropped = 0
+        while earlier and dropped < cut:
+            dropped += costs.pop(0)
+            earlier.pop(0)
+    kept = [message for turn in earlier for message in turn] + current
+
+    # A tool result without its calling AI message is rejected by the provider
+    while kept and isinstance(kept[0], ToolMessage):
+        kept.pop(0)
+
+    _record(node, before, count_message_tokens(kept))
+    return kept
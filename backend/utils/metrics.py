@@ -0,0 +1,346 @@
+"""
+Prometheus metrics for the API, served at GET /metrics.
+
+A small in-process registry renders the Prometheus text exposition format,
+so the endpoint needs no client library and tests can read metric values
+directly (metric.value(...) / registry.render()) without a scraper.
+
+Most metrics are derived from the spans of utils.tracing: MetricsSpanProcessor
+is registered on the tracer and turns every finished span into observations,
+whether or not the trace is exported. This gives node, tool, LLM, database
+and S3 metrics without further instrumentation:
+
+    http_request_duration_seconds{method,route,status}    RequestMetricsMiddleware
+    agent_node_duration_seconds{node}                      node.* spans
+    agent_routing_decisions_total{router,next}             supervisor nodes
+    agent_recursion_limit_hits_total{endpoint}             main.py
+    llm_call_duration_seconds / llm_calls_total{model}     llm.chat spans
+    llm_tokens_total{type}                                 llm.chat spans
+    llm_calls_per_turn / llm_tokens_per_turn               llm.chat spans, per turn trace
+    tool_duration_seconds{tool} / tool_calls_total{tool,status}
+    db_query_duration_seconds / db_connection_wait_seconds
+    db_pool_connections{state} / db_pool_*_total           pool stats, read at scrape time
+    s3_request_duration_seconds{operation,status} / s3_bytes_total{operation}
+
+Configuration (environment variables):
+    METRICS_ENABLED   true (default) | false; false also leaves /metrics empty
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from utils.tracing import Span, tracer
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class CopiedCounter(Gauge):
+    """A counter whose value is copied at scrape time from stats kept elsewhere."""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def value(self, **labels: Any) -> Tuple[int, float]:
+        """(count, sum) of the observations for these labels."""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return (entry[2], entry[1]) if entry else (0, 0.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        inf = 'le="+Inf"'
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Call collector() before every render, e.g. to copy pool stats into gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+node_duration = registry.histogram("agent_node_duration_seconds", "Latency of one graph node run.", ("node",))
+routing_decisions = registry.counter(
+    "agent_routing_decisions_total", "Supervisor routing decisions by chosen next node.", ("router", "next")
+)
+recursion_limit_hits = registry.counter(
+    "agent_recursion_limit_hits_total", "Turns aborted by the graph recursion limit.", ("endpoint",)
+)
+llm_call_duration = registry.histogram("llm_call_duration_seconds", "Chat model call latency.", ("model",))
+llm_calls = registry.counter("llm_calls_total", "Chat model calls.", ("model", "status"))
+llm_tokens = registry.counter("llm_tokens_total", "Chat model tokens by type.", ("type",))
+llm_calls_per_turn = registry.histogram("llm_calls_per_turn", "Chat model calls per turn.", buckets=COUNT_BUCKETS)
+llm_tokens_per_turn = registry.histogram(
+    "llm_tokens_per_turn", "Chat model input plus output tokens per turn.", buckets=TOKEN_BUCKETS
+)
+tool_duration = registry.histogram("tool_duration_seconds", "Tool run latency.", ("tool",))
+tool_calls = registry.counter("tool_calls_total", "Tool runs by outcome.", ("tool", "status"))
+db_query_duration = registry.histogram("db_query_duration_seconds", "Database statement latency.", buckets=FAST_BUCKETS)
+db_connection_wait = registry.histogram(
+    "db_connection_wait_seconds", "Time spent waiting for a pooled connection.", buckets=FAST_BUCKETS
+)
+db_pool_connections = registry.gauge("db_pool_connections", "Pooled database connections by state.", ("state",))
+db_pool_acquired = registry.register(CopiedCounter("db_pool_acquired_total", "Connections borrowed from the pool."))
+db_pool_timeouts = registry.register(CopiedCounter("db_pool_timeouts_total", "Pool checkouts that timed out."))
+s3_request_duration = registry.histogram(
+    "s3_request_duration_seconds", "S3 memory request latency.", ("operation", "status")
+)
+s3_bytes = registry.counter("s3_bytes_total", "S3 memory payload bytes read and written.", ("operation",))
+
+
+def _collect_pool_stats() -> None:
+    from db.connection_pool import pool_stats
+
+    stats = pool_stats()
+    if not stats.get("initialised"):
+        return
+    for state in ("in_use", "idle", "open", "max_size"):
+        db_pool_connections.set(stats[state], state=state)
+    db_pool_acquired.set(stats["acquired"])
+    db_pool_timeouts.set(stats["timeouts"])
+
+
+registry.add_collector(_collect_pool_stats)
+
+
+class MetricsSpanProcessor:
+    """Turns finished tracing spans into metric observations."""
+
+    def __init__(self):
+        # trace id -> [llm calls, tokens] of turns still running
+        self._turns: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span) -> None:
+        name = span.name
+        status = "error" if span.error else "ok"
+        if name.startswith("node."):
+            node_duration.observe(span.duration_seconds, node=name[len("node."):])
+        elif name == "llm.chat":
+            model = span.attributes.get("model") or "unknown"
+            llm_call_duration.observe(span.duration_seconds, model=model)
+            llm_calls.inc(model=model, status=status)
+            tokens = 0
+            for kind in ("input", "output", "cached"):
+                count = span.attributes.get(f"{kind}_tokens") or 0
+                if count:
+                    llm_tokens.inc(count, type=kind)
+                if kind != "cached":
+                    tokens += count
+            with self._lock:
+                turn = self._turns.setdefault(span.trace_id, [0, 0])
+                turn[0] += 1
+                turn[1] += tokens
+        elif name.startswith("tool."):
+            tool = name[len("tool."):]
+            tool_duration.observe(span.duration_seconds, tool=tool)
+            tool_calls.inc(tool=tool, status=status)
+        elif name == "db.query":
+            db_query_duration.observe(span.duration_seconds)
+        elif name == "db.connection":
+            wait_ms = span.attributes.get("wait_ms")
+            if wait_ms is not None:
+                db_connection_wait.observe(wait_ms / 1000)
+        elif name.startswith("s3."):
+            operation = name[len("s3."):]
+            if span.attributes.get("found") is False:
+                status = "miss"
+            s3_request_duration.observe(span.duration_seconds, operation=operation, status=status)
+            s3_bytes.inc(span.attributes.get("bytes") or 0, operation=operation)
+
+        if span.parent_id is None:
+            with self._lock:
+                calls, tokens = self._turns.pop(span.trace_id, (0, 0))
+            if name == "turn":
+                llm_calls_per_turn.observe(calls)
+                llm_tokens_per_turn.observe(tokens)
+
+
+if METRICS_ENABLED:
+    tracer.add_processor(MetricsSpanProcessor())
+
+
+def render_metrics() -> str:
+    return registry.render() if METRICS_ENABLED else ""
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware observing http_request_duration_seconds by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status)
+            )
@@ -0,0 +1,105 @@
+"""
+Split the legacy conversation_memory.json blob into per-patient records.
+
+Reads the old global object ({"<patient_id>": MemoryRecord, ...}) from S3 (or
+a local copy) and writes each patient into the store selected by
+MEMORY_BACKEND. Existing per-patient records are left untouched unless
+--overwrite is given, so the tool can be re-run safely.
+
+Usage (from backend/):
+    python -m utils.migrate_memory_store
+    python -m utils.migrate_memory_store --source ./conversation_memory.json --backend postgres
+"""
+
+import argparse
+import json
+import logging
+
+from utils.memory_store import ConcurrentModificationError, create_memory_store
+
+LEGACY_MEMORY_KEY = "conversation_memory.json"
+
+logger = logging.getLogger(__name__)
+
+
+def load_legacy_blob(source: str):
+    """
+    The legacy object from s3://bucket/key, the LEGACY_MEMORY_KEY in
+    S3_BUCKET_NAME, or a local file. A missing source raises
+    FileNotFoundError rather than migrating nothing.
+    """
+    if source.startswith("s3://") or source == LEGACY_MEMORY_KEY:
+        from utils.s3_data_access import S3_BUCKET_NAME, load_json_file_from_s3
+
+        if source.startswith("s3://"):
+            bucket, _, key = source[len("s3://"):].partition("/")
+            if not bucket or not key:
+                raise ValueError(f"Expected s3://bucket/key, got {source!r}")
+        else:
+            bucket, key = S3_BUCKET_NAME, source
+        # No default: load_json_file_from_s3 would write it back to S3 for a missing key
+        blob = load_json_file_from_s3(key, bucket=bucket)
+        if blob is None:
+            raise FileNotFoundError(f"Legacy memory blob s3://{bucket}/{key} does not exist")
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            blob = json.load(f)
+    if not isinstance(blob, dict):
+        raise ValueError(f"Legacy memory blob {source!r} is not a JSON object")
+    return blob
+
+
+def migrate(blob, store, overwrite: bool = False, dry_run: bool = False):
+    """Copy every patient record from the blob into the store; returns counts per outcome."""
+    counts = {"migrated": 0, "skipped": 0, "invalid": 0}
+    for raw_id, record in blob.items():
+        try:
+            id_number = int(raw_id)
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping non-numeric patient id {raw_id!r}")
+            counts["invalid"] += 1
+            continue
+        if not isinstance(record, dict):
+            logger.warning(f"Skipping patient {id_number}: record is not an object")
+            counts["invalid"] += 1
+            continue
+
+        _, version = store.load(id_number)
+        if version is not None and not overwrite:
+            counts["skipped"] += 1
+            continue
+        if not dry_run:
+            try:
+                store.save(id_number, record, expected_version=version)
+            except ConcurrentModificationError:
+                logger.warning(f"Patient {id_number} was written during migration, keeping the newer record")
+                counts["skipped"] += 1
+                continue
+        counts["migrated"] += 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--source",
+        default=LEGACY_MEMORY_KEY,
+        help="legacy blob: S3 key, s3://bucket/key, or a local file path (default: %(default)s in S3_BUCKET_NAME)",
+    )
+    parser.add_argument("--backend", help="target store (s3 | postgres | local); defaults to MEMORY_BACKEND")
+    parser.add_argument("--overwrite", action="store_true", help="replace records that already exist in the target")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be migrated without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    blob = load_legacy_blob(args.source)
+    store = create_memory_store(args.backend)
+    counts = migrate(blob, store, overwrite=args.overwrite, dry_run=args.dry_run)
+    print(
+        f"{'Would migrate' if args.dry_run else 'Migrated'} {counts['migrated']} patient(s) "
+        f"to {type(store).__name__}; skipped {counts['skipped']} existing, {counts['invalid']} invalid"
+    )
+
+
+if __name__ == "__main__":
+    main()
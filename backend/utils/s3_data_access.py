@@ -6,12 +6,19 @@ Memory files are stored exclusively in S3, no local fallback.
 import json
 import os
 import boto3
-from typing import Any
+from typing import Any, Optional, Tuple
 from botocore.exceptions import ClientError
 import logging
 
+from utils.tracing import span
+
 logger = logging.getLogger(__name__)
 
+
+class S3PreconditionFailed(Exception):
+    """Raised when a conditional S3 write loses against a concurrent writer."""
+
+
 # Get configuration from environment variables
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "agenticai-medical-appointment-system")
 S3_REGION = os.getenv("S3_REGION", "ap-south-1")
@@ -26,14 +33,16 @@ except Exception as e:
     raise RuntimeError(f"Cannot initialize S3 client. Please check AWS credentials and configuration. Error: {e}")
 
 
-def load_json_file_from_s3(key: str, default: Any = None) -> Any:
-    """Load JSON file from S3"""
+def load_json_file_from_s3(key: str, default: Any = None, bucket: Optional[str] = None) -> Any:
+    """Load JSON file from S3 (from S3_BUCKET_NAME unless another bucket is given)"""
     if not s3_client:
         raise RuntimeError("S3 client is not initialized")
     
     try:
-        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=key)
-        content = response['Body'].read().decode('utf-8')
+        with span("s3.get_object", key=key) as current:
+            response = s3_client.get_object(Bucket=bucket or S3_BUCKET_NAME, Key=key)
+            content = response['Body'].read().decode('utf-8')
+            current.set("bytes", len(content))
         return json.loads(content)
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code', '')
@@ -58,15 +67,66 @@ def write_json_file_to_s3(key: str, payload: Any) -> None:
         raise RuntimeError("S3 client is not initialized")
     
     try:
-        json_str = json.dumps(payload, indent=2, ensure_ascii=False)
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=key,
-            Body=json_str.encode('utf-8'),
-            ContentType='application/json'
-        )
+        body = json.dumps(payload, indent=2, ensure_ascii=False).encode('utf-8')
+        with span("s3.put_object", key=key, bytes=len(body)):
+            s3_client.put_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=key,
+                Body=body,
+                ContentType='application/json'
+            )
         logger.info(f"Successfully wrote {key} to S3")
     except Exception as e:
         logger.error(f"Error writing {key} to S3: {e}")
         raise
 
+
+
+def load_json_object_with_etag(key: str) -> Tuple[Optional[Any], Optional[str]]:
+    """Load a JSON object from S3 together with its ETag. Returns (None, None) if the key does not exist."""
+    if not s3_client:
+        raise RuntimeError("S3 client is not initialized")
+
+    with span("s3.get_object", key=key) as current:
+        try:
+            response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=key)
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code', '')
+            if error_code == 'NoSuchKey':
+                # A patient without memory yet is a normal miss, not a failed request
+                current.set("found", False)
+                return None, None
+            logger.error(f"Error loading {key} from S3: {e}")
+            raise
+        content = response['Body'].read().decode('utf-8')
+        current.set("bytes", len(content))
+    return json.loads(content), response['ETag']
+
+
+def write_json_object_conditional(key: str, payload: Any, etag: Optional[str]) -> str:
+    """
+    Write a JSON object to S3 only if it is unchanged since it was read.
+    etag=None means the object must not exist yet. Returns the new ETag and
+    raises S3PreconditionFailed if another writer got there first.
+    """
+    if not s3_client:
+        raise RuntimeError("S3 client is not initialized")
+
+    condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        body = json.dumps(payload, indent=2, ensure_ascii=False).encode('utf-8')
+        with span("s3.put_object", key=key, bytes=len(body), conditional=True):
+            response = s3_client.put_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=key,
+                Body=body,
+                ContentType='application/json',
+                **condition,
+            )
+        return response['ETag']
+    except ClientError as e:
+        error_code = e.response.get('Error', {}).get('Code', '')
+        if error_code in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            raise S3PreconditionFailed(f"{key} was modified concurrently") from e
+        logger.error(f"Error writing {key} to S3: {e}")
+        raise
@@ -0,0 +1,124 @@
+"""
+Translate LangGraph astream_events into compact, client-facing events.
+
+Each yielded dict has a "type" key:
+    node_start / node_end   a graph node began / finished   {"node": ...}
+    tool_start / tool_end   a toolkit tool ran              {"node", "tool", "input" | "output"}
+    token                   answer text as it is generated  {"node", "content"}
+    final                   the finished graph state        {"content", "messages", "results"}
+
+tool_end carries the tool's typed payload as "result" and final carries every
+payload produced in this turn as "results" (see data_models/tool_results.py).
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from data_models.tool_results import TOOL_RESULTS_KEY
+
+AGENT_NODES = {
+    "supervisor",
+    "doctor_appointment_agent",
+    "lab_diagnostics_agent",
+    "information_node",
+    "booking_node",
+    "lab_booking_node",
+    "lab_availability_and_info_node",
+}
+
+# Nodes whose LLM output is the user-facing answer
+ANSWER_NODES = {
+    "information_node",
+    "booking_node",
+    "lab_booking_node",
+    "lab_availability_and_info_node",
+}
+
+# Supervisor routing summaries are internal and never the answer
+ROUTING_MESSAGE_NAMES = {"supervisor", "top_supervisor", "lab_supervisor"}
+
+TOOL_OUTPUT_PREVIEW_CHARS = 500
+
+
+def _node_path(metadata: Dict[str, Any]):
+    """Graph nodes enclosing an event, outermost first, e.g. ['doctor_appointment_agent', 'information_node', 'agent']."""
+    namespace = metadata.get("langgraph_checkpoint_ns") or ""
+    return [part.split(":", 1)[0] for part in namespace.split("|") if part]
+
+
+def _innermost_agent_node(metadata: Dict[str, Any]) -> Optional[str]:
+    for node in reversed(_node_path(metadata)):
+        if node in AGENT_NODES:
+            return node
+    return metadata.get("langgraph_node")
+
+
+def agent_node_path(metadata: Dict[str, Any]) -> str:
+    """Agent nodes enclosing an LLM call, e.g. 'doctor_appointment_agent/information_node'."""
+    nodes = [node for node in _node_path(metadata) if node in AGENT_NODES]
+    return "/".join(nodes) or metadata.get("langgraph_node") or "unknown"
+
+
+def _final_answer(messages) -> str:
+    for message in reversed(messages or []):
+        if getattr(message, "name", None) in ROUTING_MESSAGE_NAMES:
+            continue
+        if getattr(message, "type", None) == "ai" and getattr(message, "content", ""):
+            return message.content
+    return ""
+
+
+def turn_tool_results(messages) -> List[Dict[str, Any]]:
+    """Typed tool payloads attached to worker replies since the latest user message."""
+    results = []
+    for message in reversed(messages or []):
+        if getattr(message, "type", None) == "human":
+            break
+        if getattr(message, "name", None) in ANSWER_NODES:
+            results[:0] = message.additional_kwargs.get(TOOL_RESULTS_KEY, [])
+    return results
+
+
+async def stream_agent_events(graph, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    async for event in graph.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+        metadata = event.get("metadata") or {}
+
+        if kind in ("on_chain_start", "on_chain_end") and name in AGENT_NODES and metadata.get("langgraph_node") == name:
+            yield {"type": "node_start" if kind == "on_chain_start" else "node_end", "node": name}
+
+        elif kind == "on_tool_start":
+            yield {
+                "type": "tool_start",
+                "node": _innermost_agent_node(metadata),
+                "tool": name,
+                "input": event["data"].get("input"),
+            }
+
+        elif kind == "on_tool_end":
+            output = event["data"].get("output")
+            yield {
+                "type": "tool_end",
+                "node": _innermost_agent_node(metadata),
+                "tool": name,
+                "output": str(getattr(output, "content", output))[:TOOL_OUTPUT_PREVIEW_CHARS],
+                "result": getattr(output, "artifact", None),
+            }
+
+        elif kind == "on_chat_model_stream":
+            node = _innermost_agent_node(metadata)
+            chunk = event["data"].get("chunk")
+            content = getattr(chunk, "content", "")
+            # Router calls only produce structured tool-call chunks, so text content is answer text
+            if node in ANSWER_NODES and isinstance(content, str) and content:
+                yield {"type": "token", "node": node, "content": content}
+
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            state = event["data"].get("output") or {}
+            messages = state.get("messages", [])
+            yield {
+                "type": "final",
+                "content": _final_answer(messages),
+                "messages": messages,
+                "results": turn_tool_results(messages),
+            }
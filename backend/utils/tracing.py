@@ -0,0 +1,394 @@
+"""
+Lightweight OpenTelemetry-style tracing for chat turns.
+
+A span is a timed, named operation with attributes; spans opened inside
+another span (in the same task, or in a thread started with a copied context
+such as asyncio.to_thread and LangChain's executor) become its children, so
+one turn produces one trace:
+
+    turn                                       one per /execute request
+      s3.get_object                            memory load, with payload size
+      node.supervisor.supervisor               graph nodes (@traced)
+        llm.chat                               chat model calls, with token counts
+      node.supervisor.doctor_appointment_agent
+        node.doctor_appointment.information_node
+          llm.chat
+          tool.check_availability_by_doctor    tool runs, with result sizes
+            db.connection                      pooled checkout, with wait time
+              db.query                         each statement, with row count
+
+Finished spans go to a background thread that writes them in batches, so
+exporting never blocks a request. Sampling is decided once per trace at its
+root span; the children of an unsampled root are not exported either.
+Span processors registered with tracer.add_processor() (utils.metrics) see
+every finished span, sampled or not, even when no exporter is configured.
+
+Configuration (environment variables):
+    TRACE_EXPORTER         none (default) | jsonl | otlp
+    TRACE_FILE             JSON-lines output for the jsonl exporter (default traces.jsonl)
+    TRACE_OTLP_ENDPOINT    OTLP/HTTP JSON collector URL (default http://localhost:4318/v1/traces)
+    TRACE_SERVICE_NAME     service.name reported to the collector (default medical-appointment-api)
+    TRACE_SAMPLE_RATIO     share of traces recorded, 0-1 (default 1.0)
+    TRACE_BATCH_SIZE       spans written per batch (default 256)
+    TRACE_MAX_QUEUE        spans waiting for export before new ones are dropped (default 10000)
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "medical-appointment-api")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "10000"))
+
+EXPORTERS = ("none", "jsonl", "otlp")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "sampled")
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any], sampled: bool = True
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.sampled = sampled
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for every span while nothing records them (no exporter and no span processor)."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(
+        self,
+        exporter: str = TRACE_EXPORTER,
+        sample_ratio: float = TRACE_SAMPLE_RATIO,
+        batch_size: int = TRACE_BATCH_SIZE,
+        max_queue: int = TRACE_MAX_QUEUE,
+    ):
+        if exporter not in EXPORTERS:
+            raise ValueError(f"Unknown TRACE_EXPORTER '{exporter}'. Use one of {', '.join(EXPORTERS)}.")
+        self.exporter = exporter
+        self.exporting = exporter != "none"
+        self.sample_ratio = sample_ratio
+        self.batch_size = max(1, batch_size)
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._http: Optional[httpx.Client] = None
+        self._processors: List[Callable[[Span], None]] = []
+        self.stats = {"traces": 0, "spans": 0, "exported": 0, "dropped": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporting or bool(self._processors)
+
+    def add_processor(self, processor: Callable[[Span], None]) -> None:
+        """Call processor(span) on every finished span, sampled or not."""
+        self._processors.append(processor)
+
+    def start_span(self, name: str, parent: Any = None, **attributes: Any):
+        """Open a span under parent (default: the current span); call end_span() on it."""
+        if not self.enabled:
+            return _NOOP
+        parent = _current.get() if parent is None else parent
+        if parent is None or parent is _NOOP:
+            sampled = self.exporting and random.random() < self.sample_ratio
+            if sampled:
+                self.stats["traces"] += 1
+            return Span(name, os.urandom(16).hex(), None, attributes, sampled)
+        return Span(name, parent.trace_id, parent.span_id, attributes, parent.sampled)
+
+    def end_span(self, span: Any, error: Optional[BaseException] = None) -> None:
+        if span is _NOOP:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        for processor in self._processors:
+            try:
+                processor(span)
+            except Exception:
+                logger.exception(f"Span processor failed on {span.name}")
+        if not span.sampled:
+            return
+        self.stats["spans"] += 1
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Time the enclosed block as a child of the current span."""
+        span = self.start_span(name, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current.reset(token)
+            self.end_span(span, e)
+            raise
+        _current.reset(token)
+        self.end_span(span)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                logger.info(f"Trace exporter started ({self.exporter}, sample ratio {self.sample_ratio})")
+
+    def _run(self) -> None:
+        while True:
+            span = self._queue.get()
+            stop = span is None
+            batch = [] if stop else [span]
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self._export(batch)
+                    self.stats["exported"] += len(batch)
+                except Exception:
+                    self.stats["failed"] += len(batch)
+                    logger.exception(f"Failed to export {len(batch)} spans")
+            if stop:
+                return
+
+    def _export(self, batch: List[Span]) -> None:
+        if self.exporter == "jsonl":
+            lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+        elif self.exporter == "otlp":
+            if self._http is None:
+                self._http = httpx.Client(timeout=5.0)
+            self._http.post(TRACE_OTLP_ENDPOINT, json=_otlp_payload(batch)).raise_for_status()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Export every finished span and stop the exporter thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        logger.info(f"Trace exporter stopped: {self.stats}")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(batch: List[Span]) -> Dict[str, Any]:
+    """The OTLP/HTTP JSON body for a batch of spans."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                                "name": span.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [
+                                    {"key": key, "value": _otlp_value(value)}
+                                    for key, value in span.attributes.items()
+                                    if value is not None
+                                ],
+                                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                            }
+                            for span in batch
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes: Any):
+    """Context manager timing a block as a child of the current span."""
+    return tracer.span(name, **attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the current span, if its trace is exported."""
+    current = _current.get()
+    return current.trace_id if getattr(current, "sampled", False) else None
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """Decorator recording every call of a sync or async function as a span."""
+
+    def decorate(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def traced_tool(tool):
+    """A copy of a function-backed tool whose runs are recorded as tool.<name> spans with result sizes."""
+    func = getattr(tool, "func", None)
+    if func is None:
+        return tool
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with tracer.span(f"tool.{tool.name}") as current:
+            result = func(*args, **kwargs)
+            content, artifact = result if tool.response_format == "content_and_artifact" else (result, None)
+            current.set("output_chars", len(str(content)))
+            options = getattr(artifact, "options", None)
+            if options is not None:
+                current.set("options", len(options))
+                current.set("slots", sum(len(option.slots) for option in options))
+            status = getattr(artifact, "status", None)
+            if status is not None:
+                current.set("status", status)
+            return result
+
+    return tool.model_copy(update={"func": run})
+
+
+class LLMSpanTracker(BaseCallbackHandler):
+    """Records every chat model call as an llm.chat span under the node that made it."""
+
+    # Run in the caller's context so the span finds its parent node
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Any] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, invocation_params=None, **kwargs: Any) -> None:
+        if not tracer.enabled:
+            return
+        params = invocation_params or {}
+        current = tracer.start_span(
+            "llm.chat",
+            model=params.get("model") or params.get("model_name"),
+            messages=sum(len(batch) for batch in messages),
+            tools=len(params.get("tools") or []),
+        )
+        with self._lock:
+            self._spans[run_id] = current
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                current.set("input_tokens", usage.get("input_tokens"))
+                current.set("output_tokens", usage.get("output_tokens"))
+                current.set("cached_tokens", (usage.get("input_token_details") or {}).get("cache_read"))
+        tracer.end_span(current)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            current = self._spans.pop(run_id, None)
+        if current is not None:
+            tracer.end_span(current, error)
+
+
+llm_span_tracker = LLMSpanTracker()
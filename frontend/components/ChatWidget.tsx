@@ -23,6 +23,20 @@ interface Message {
   }
 }
 
+// Typed tool payloads returned by the backend in "results" (see backend/data_models/tool_results.py)
+interface ToolResult {
+  type: 'availability' | 'booking' | 'prerequisites'
+  kind?: 'doctor' | 'lab'
+  status?: string
+  detail?: string
+  date?: string
+  booking_reference?: string | null
+  amount?: number | null
+}
+
+// Booking statuses that render a tile; 'confirmed' opens the payment tile, 'paid' shows as booked
+const TILE_STATUSES = ['booked', 'pending', 'cancelled', 'rescheduled', 'confirmed', 'paid']
+
 interface ChatWidgetProps {
   idNumber: number
 }
@@ -59,8 +73,18 @@ export default function ChatWidget({ idNumber }: ChatWidgetProps) {
     setInput('')
     setIsLoading(true)
 
+    // Placeholder assistant message that is filled in as tokens stream in
+    const assistantIndex = messages.length + 1
+    setMessages((prev) => [...prev, { role: 'assistant', content: '', timestamp: new Date() }])
+
+    const updateAssistant = (update: Partial<Message>) => {
+      setMessages((prev) =>
+        prev.map((msg, i) => (i === assistantIndex ? { ...msg, ...update } : msg))
+      )
+    }
+
     try {
-      const response = await fetch(`${BACKEND_URL}/execute`, {
+      const response = await fetch(`${BACKEND_URL}/execute/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -71,80 +95,59 @@ export default function ChatWidget({ idNumber }: ChatWidgetProps) {
         }),
       })
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get response from server')
       }
 
-      const data = await response.json()
-      
-      // Extract the last AI message from the response
-      // Backend returns {"messages": [...]}
+      // Backend streams NDJSON events: node_start/node_end, tool_start/tool_end, token, final, error
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let streamedText = ''
       let assistantMessage = ''
-      let messagesArray: any[] = []
-      
-      if (data.messages && Array.isArray(data.messages)) {
-        messagesArray = data.messages
-      } else if (Array.isArray(data)) {
-        messagesArray = data
-      } else {
-        assistantMessage = 'Unexpected response format from server'
-      }
-      
-      if (messagesArray.length > 0) {
-        // Find the last AI message in the array
-        const lastAIMessage = messagesArray
-          .slice()
-          .reverse()
-          .find((msg: any) => {
-            // Check various possible formats
-            return msg.type === 'ai' || 
-                   msg.role === 'assistant' || 
-                   msg.constructor?.name === 'AIMessage' ||
-                   (typeof msg === 'object' && msg.content && !msg.type) // Fallback for AI messages
-          })
-        
-        if (lastAIMessage) {
-          assistantMessage = lastAIMessage.content || lastAIMessage.text || JSON.stringify(lastAIMessage)
-        } else {
-          // Fallback: get the last message that's not from the user
-          let lastUserMsgIndex = -1
-          for (let i = messagesArray.length - 1; i >= 0; i--) {
-            const msg = messagesArray[i]
-            if (msg.type === 'human' || msg.role === 'user') {
-              lastUserMsgIndex = i
-              break
-            }
-          }
-          if (lastUserMsgIndex >= 0 && lastUserMsgIndex < messagesArray.length - 1) {
-            const lastMsg = messagesArray[messagesArray.length - 1]
-            assistantMessage = lastMsg?.content || lastMsg?.text || JSON.stringify(lastMsg)
-          } else {
-            assistantMessage = 'No response from assistant'
+      let results: ToolResult[] = []
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        const lines = buffer.split('\n')
+        buffer = lines.pop() || ''
+        for (const line of lines) {
+          if (!line.trim()) continue
+          const event = JSON.parse(line)
+
+          if (event.type === 'token') {
+            streamedText += event.content
+            updateAssistant({ content: streamedText })
+          } else if (event.type === 'final') {
+            assistantMessage = event.content || streamedText || 'No response from assistant'
+            results = event.results || []
+          } else if (event.type === 'error') {
+            throw new Error(event.message)
           }
         }
       }
 
-      // Parse message for booking confirmation or payment requests
-      const bookingData = parseBookingMessage(assistantMessage)
-      console.log('🔍 Regular message - Assistant message:', assistantMessage)
-      console.log('🔍 Regular message - Parsed booking data:', bookingData)
+      if (!assistantMessage) {
+        assistantMessage = streamedText || 'No response from assistant'
+      }
 
-      const aiMessage: Message = {
-        role: 'assistant',
+      // Booking confirmation or payment tile from the turn's typed results
+      const bookingData = bookingDataFromResults(results)
+
+      updateAssistant({
         content: assistantMessage,
         timestamp: new Date(),
         bookingData: bookingData,
-      }
-
-      setMessages((prev) => [...prev, aiMessage])
+      })
     } catch (error) {
       console.error('Error sending message:', error)
-      const errorMessage: Message = {
-        role: 'assistant',
+      updateAssistant({
         content: 'Sorry, I encountered an error. Please try again later.',
         timestamp: new Date(),
-      }
-      setMessages((prev) => [...prev, errorMessage])
+      })
     } finally {
       setIsLoading(false)
     }
@@ -157,228 +160,27 @@ export default function ChatWidget({ idNumber }: ChatWidgetProps) {
     }
   }
 
-  const parseBookingMessage = (message: string): Message['bookingData'] | undefined => {
-    const lowerMessage = message.toLowerCase()
-    
-    // Parse BOOKING_CREATED message (confirmation tile) - pending confirmation
-    const bookingCreatedMatch = message.match(/BOOKING_CREATED: Booking (?:reference )?(\w+).*?(?:Doctor|Test): ([^,]+).*?Date: ([^,]+).*?Amount: \$([\d.]+)/i)
-    if (bookingCreatedMatch) {
-      const [, ref, detail, date, amount] = bookingCreatedMatch
-      const isDoctor = lowerMessage.includes('doctor')
-      return {
-        type: 'confirmation',
-        status: 'pending', // Pending confirmation - show buttons
-        bookingReference: ref,
-        bookingType: isDoctor ? 'doctor' : 'lab',
-        bookingDetail: detail.trim(),
-        date: date.trim(),
-        amount: parseFloat(amount),
-      }
+  // Map the typed tool results of a turn to the tile shown under the answer
+  const bookingDataFromResults = (results: ToolResult[] | undefined): Message['bookingData'] | undefined => {
+    const booking = (results || [])
+      .slice()
+      .reverse()
+      .find((result) => result.type === 'booking' && result.status && TILE_STATUSES.includes(result.status))
+    if (!booking) return undefined
+
+    const isPayment = booking.status === 'confirmed'
+    const status = booking.status === 'paid' ? 'booked' : booking.status
+    return {
+      type: isPayment ? 'payment' : 'confirmation',
+      status: isPayment ? undefined : (status as NonNullable<Message['bookingData']>['status']),
+      // Results from before bookings were persisted have no reference; show a local label on the tile
+      bookingReference:
+        booking.booking_reference || `${booking.status!.toUpperCase()}-${Date.now().toString().slice(-8)}`,
+      bookingType: booking.kind,
+      bookingDetail: booking.detail || '',
+      date: booking.date || '',
+      amount: booking.amount ?? 0,
     }
-
-    // Parse successful appointment completion messages (confirmation tile)
-    // Pattern: "Successfully booked Dr. {name} for {date}..."
-    const successBookedMatch = message.match(/Successfully booked Dr\. ([^,]+) for ([^(]+)/i)
-    if (successBookedMatch) {
-      const [, doctorName, date] = successBookedMatch
-      // Extract consultation fee if present
-      const feeMatch = message.match(/Consultation Fee: \$([\d.]+)/i) || message.match(/\$([\d.]+)/)
-      const amount = feeMatch ? parseFloat(feeMatch[1]) : 0
-      
-      // Generate a booking reference from doctor name and date, or extract if present
-      const refMatch = message.match(/(?:Booking|Reference)[\s:]+(\w+)/i)
-      const bookingRef = refMatch ? refMatch[1] : `BOOK-${doctorName.replace(/\s+/g, '').substring(0, 6).toUpperCase()}-${Date.now().toString().slice(-6)}`
-      
-      return {
-        type: 'confirmation',
-        status: 'booked', // Completed booking - no buttons
-        bookingReference: bookingRef,
-        bookingType: 'doctor',
-        bookingDetail: doctorName.trim(),
-        date: date.trim(),
-        amount: amount,
-      }
-    }
-
-    // Pattern: "Successfully cancelled the appointment with Dr. {name} on {date}..."
-    const successCancelledMatch = message.match(/Successfully cancelled (?:the )?appointment (?:with )?Dr\. ([^,]+) on ([^(]+)/i)
-    if (successCancelledMatch) {
-      const [, doctorName, date] = successCancelledMatch
-      const feeMatch = message.match(/\$([\d.]+)/)
-      const amount = feeMatch ? parseFloat(feeMatch[1]) : 0
-      
-      const refMatch = message.match(/(?:Booking|Reference)[\s:]+(\w+)/i)
-      const bookingRef = refMatch ? refMatch[1] : `CANCEL-${doctorName.replace(/\s+/g, '').substring(0, 6).toUpperCase()}-${Date.now().toString().slice(-6)}`
-      
-      return {
-        type: 'confirmation',
-        status: 'cancelled', // Cancelled - no buttons
-        bookingReference: bookingRef,
-        bookingType: 'doctor',
-        bookingDetail: doctorName.trim(),
-        date: date.trim(),
-        amount: amount,
-      }
-    }
-
-    // Pattern: "Successfully rescheduled appointment with Dr. {name} from {old} to {new}..."
-    const successRescheduledMatch = message.match(/Successfully rescheduled appointment with Dr\. ([^,]+) from ([^,]+) to ([^(]+)/i)
-    if (successRescheduledMatch) {
-      const [, doctorName, oldDate, newDate] = successRescheduledMatch
-      const feeMatch = message.match(/Consultation Fee: \$([\d.]+)/i) || message.match(/\$([\d.]+)/)
-      const amount = feeMatch ? parseFloat(feeMatch[1]) : 0
-      
-      const refMatch = message.match(/(?:Booking|Reference)[\s:]+(\w+)/i)
-      const bookingRef = refMatch ? refMatch[1] : `RESCHEDULE-${doctorName.replace(/\s+/g, '').substring(0, 6).toUpperCase()}-${Date.now().toString().slice(-6)}`
-      
-      return {
-        type: 'confirmation',
-        status: 'rescheduled', // Rescheduled - no buttons
-        bookingReference: bookingRef,
-        bookingType: 'doctor',
-        bookingDetail: doctorName.trim(),
-        date: newDate.trim(),
-        amount: amount,
-      }
-    }
-
-    // Pattern: General appointment confirmation messages
-    // Matches: "appointment with Dr. {name} on {date} has been confirmed/booked/completed"
-    if (lowerMessage.includes('appointment') && (lowerMessage.includes('confirmed') || lowerMessage.includes('booked') || lowerMessage.includes('completed') || lowerMessage.includes('successfully'))) {
-      // Skip if it's a cancellation or reschedule (already handled above)
-      if (!lowerMessage.includes('cancelled') && !lowerMessage.includes('rescheduled')) {
-        const doctorMatch = message.match(/Dr\.\s*([^,\n.]+)/i) || message.match(/doctor\s+([^,\n.]+)/i)
-        const dateMatch = message.match(/(\d{2}-\d{2}-\d{4}\s+\d{2}:\d{2})|(\d{2}\/\d{2}\/\d{4}\s+\d{2}:\d{2})|(on\s+[^,\n.]+(?:date|time))/i)
-        const feeMatch = message.match(/\$([\d.]+)/)
-        
-        if (doctorMatch || dateMatch) {
-          const doctorName = doctorMatch ? doctorMatch[1].trim() : 'Doctor Appointment'
-          const date = dateMatch ? (dateMatch[1] || dateMatch[2] || dateMatch[3] || '').trim() : ''
-          const amount = feeMatch ? parseFloat(feeMatch[1]) : 0
-          
-          // Try to extract booking reference if present
-          const refMatch = message.match(/(?:booking|reference|ref)[\s:]+(\w+)/i)
-          const bookingRef = refMatch ? refMatch[1] : `CONF-${Date.now().toString().slice(-8)}`
-          
-          return {
-            type: 'confirmation',
-            status: 'booked', // Completed booking - no buttons
-            bookingReference: bookingRef,
-            bookingType: 'doctor',
-            bookingDetail: doctorName,
-            date: date,
-            amount: amount,
-          }
-        }
-      }
-    }
-
-    // Pattern: General cancellation messages
-    if (lowerMessage.includes('cancelled') || lowerMessage.includes('canceled')) {
-      const doctorMatch = message.match(/Dr\.\s*([^,\n.]+)/i) || message.match(/doctor\s+([^,\n.]+)/i)
-      const dateMatch = message.match(/(\d{2}-\d{2}-\d{4}\s+\d{2}:\d{2})|(\d{2}\/\d{2}\/\d{4}\s+\d{2}:\d{2})|(on\s+[^,\n.]+(?:date|time))/i)
-      
-      if (doctorMatch || dateMatch) {
-        const doctorName = doctorMatch ? doctorMatch[1].trim() : 'Doctor Appointment'
-        const date = dateMatch ? (dateMatch[1] || dateMatch[2] || dateMatch[3] || '').trim() : ''
-        
-        const refMatch = message.match(/(?:booking|reference|ref)[\s:]+(\w+)/i)
-        const bookingRef = refMatch ? refMatch[1] : `CANCEL-${Date.now().toString().slice(-8)}`
-        
-        return {
-          type: 'confirmation',
-          status: 'cancelled', // Cancelled - no buttons
-          bookingReference: bookingRef,
-          bookingType: 'doctor',
-          bookingDetail: doctorName,
-          date: date,
-          amount: 0,
-        }
-      }
-    }
-
-    // Pattern: General reschedule messages
-    if (lowerMessage.includes('rescheduled') || lowerMessage.includes('reschedule')) {
-      const doctorMatch = message.match(/Dr\.\s*([^,\n.]+)/i) || message.match(/doctor\s+([^,\n.]+)/i)
-      const dateMatch = message.match(/(?:to|on)\s+([^,\n.]+(?:date|time)?)/i) || message.match(/(\d{2}-\d{2}-\d{4}\s+\d{2}:\d{2})/i)
-      const feeMatch = message.match(/\$([\d.]+)/)
-      
-      if (doctorMatch) {
-        const doctorName = doctorMatch[1].trim()
-        const date = dateMatch ? dateMatch[1].trim() : ''
-        const amount = feeMatch ? parseFloat(feeMatch[1]) : 0
-        
-        const refMatch = message.match(/(?:booking|reference|ref)[\s:]+(\w+)/i)
-        const bookingRef = refMatch ? refMatch[1] : `RESCHEDULE-${Date.now().toString().slice(-8)}`
-        
-        return {
-          type: 'confirmation',
-          status: 'rescheduled', // Rescheduled - no buttons
-          bookingReference: bookingRef,
-          bookingType: 'doctor',
-          bookingDetail: doctorName,
-          date: date,
-          amount: amount,
-        }
-      }
-    }
-
-    // Parse BOOKING_CONFIRMED message (payment tile) - More flexible matching
-    // Try multiple patterns to catch different backend response formats
-    let bookingRef: string | undefined
-    let amount: number | undefined
-    
-    // Pattern 1: BOOKING_CONFIRMED: Booking <ref>...Amount: $<amount>
-    const pattern1 = message.match(/BOOKING_CONFIRMED: Booking (\w+).*?Amount: \$([\d.]+)/i)
-    if (pattern1) {
-      bookingRef = pattern1[1]
-      amount = parseFloat(pattern1[2])
-    }
-    
-    // Pattern 2: Booking <ref> confirmed...Amount: $<amount> or $<amount> for booking <ref>
-    if (!bookingRef) {
-      const pattern2 = message.match(/Booking (\w+).*?(?:confirmed|proceed).*?Amount: \$([\d.]+)/i) ||
-                     message.match(/Amount: \$([\d.]+).*?Booking (\w+)/i)
-      if (pattern2) {
-        bookingRef = pattern2[1] || pattern2[2]
-        amount = parseFloat(pattern2[2] || pattern2[1])
-      }
-    }
-    
-    // Pattern 3: Look for booking reference and amount anywhere in the message
-    if (!bookingRef) {
-      const refMatch = message.match(/(?:booking|reference)[\s:]+(\w+)/i)
-      const amountMatch = message.match(/\$([\d.]+)/)
-      if (refMatch && amountMatch) {
-        bookingRef = refMatch[1]
-        amount = parseFloat(amountMatch[1])
-      }
-    }
-
-    // If we found a booking reference and amount, and message indicates payment
-    if (bookingRef && amount && (
-      lowerMessage.includes('proceeding to payment') ||
-      lowerMessage.includes('proceed to payment') ||
-      lowerMessage.includes('payment') ||
-      lowerMessage.includes('pay') ||
-      lowerMessage.includes('confirmed')
-    )) {
-      // Try to extract booking details
-      const detailMatch = message.match(/(?:Doctor Appointment|Lab Test|Doctor|Test): ([^,.\n]+)/i)
-      const dateMatch = message.match(/Date: ([^,.\n]+)/i)
-      const isDoctor = lowerMessage.includes('doctor')
-      
-      return {
-        type: 'payment',
-        bookingReference: bookingRef,
-        bookingType: isDoctor ? 'doctor' : 'lab',
-        bookingDetail: detailMatch ? detailMatch[1].trim() : '',
-        date: dateMatch ? dateMatch[1].trim() : '',
-        amount: amount,
-      }
-    }
-
-    return undefined
   }
 
   const handleConfirmBooking = async (bookingReference: string) => {
@@ -434,9 +236,7 @@ export default function ChatWidget({ idNumber }: ChatWidgetProps) {
         }
       }
 
-      const bookingData = parseBookingMessage(assistantMessage)
-      console.log('🔍 Booking confirmation - Assistant message:', assistantMessage)
-      console.log('🔍 Booking confirmation - Parsed booking data:', bookingData)
+      const bookingData = bookingDataFromResults(data.results)
       
       const aiMessage: Message = {
         role: 'assistant',